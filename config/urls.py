@@ -12,6 +12,7 @@ urlpatterns = [
     path('', views.seleccionar_empresa, name='seleccionar_empresa'),
     path('login/', auth_views.LoginView.as_view(template_name='core/login.html'), name='login'),
     path('logout/', views.salir, name='logout'),
+    path('salud/', views.salud, name='salud'),
     path('dashboard/', views.dashboard_analitico, name='dashboard'),
     path('compras/cargar/', views.cargar_compra, name='cargar_compra'),
     path('compras/guardar/', views.guardar_compra, name='guardar_compra'),
@@ -24,6 +25,8 @@ urlpatterns = [
     path('operaciones/devolucion/', views.registrar_devolucion, name='registrar_devolucion'),
     path('sistema/validar-sunat/<int:comprobante_id>/', views.validar_sunat, name='validar_sunat'),
     path('sistema/trazabilidad/', views.lista_comprobantes, name='lista_comprobantes'),
+    path('sistema/comprobantes/registro/', views.exportar_registro, name='exportar_registro'),
+    path('sistema/comprobantes/ple/', views.descargar_ple, name='descargar_ple'),
     path('ventas/configurar-cuotas/<int:cuenta_id>/', views.configurar_cuotas, name='configurar_cuotas'),
     path('sistema/editar-comprobante/<int:pk>/', views.editar_comprobante, name='editar_comprobante'),
     path('finanzas/transferencia/', views.transferir_moneda, name='transferir_moneda'),
@@ -44,6 +47,8 @@ urlpatterns = [
     path('ventas/manual/', views.registrar_venta_manual, name='registrar_venta_manual'),
     path('finanzas/prestamos/pagar/<int:pk>/', views.pagar_prestamo, name='pagar_prestamo'),
     path('finanzas/cronograma/', views.cronograma_vencimientos, name='cronograma_vencimientos'),
+    path('finanzas/flujo-caja/', views.flujo_caja_proyectado, name='flujo_caja_proyectado'),
+    path('finanzas/antiguedad/', views.antiguedad_saldos, name='antiguedad_saldos'),
     path('finanzas/prestamos/cuotas/<int:prestamo_id>/', views.configurar_cuotas_prestamo, name='configurar_cuotas_prestamo'),
     path('finanzas/cuota/pagar/<int:cuota_id>/', views.registrar_pago_cuota, name='registrar_pago_cuota'),
     path('finanzas/gastos/nuevo/', views.registrar_gasto_manual, name='registrar_gasto_manual'),
@@ -54,6 +59,7 @@ urlpatterns = [
     path('sistema/auditoria-retenciones/', views.trazabilidad_retenciones, name='trazabilidad_retenciones'),
     path('impuestos/historial-pagos/', views.lista_pagos_sunat, name='lista_pagos_sunat'),
     path('sistema/notificaciones/', views.lista_notificaciones, name='lista_notificaciones'),
+    path('sistema/buscar/', views.busqueda_global, name='busqueda_global'),
     path('sistema/notificaciones/leer-todas/', views.marcar_notificaciones_leidas, name='marcar_notificaciones_leidas'),
     path('comercial/cotizacion/nueva/', views.registrar_cotizacion, name='registrar_cotizacion'),
     path('comercial/cotizacion/preview-confirm/', views.preview_antes_de_guardar, name='preview_antes_de_guardar'),
@@ -70,6 +76,7 @@ urlpatterns = [
     path('inventario/producto/editar/<int:pk>/', views.editar_producto, name='editar_producto'),
     path('inventario/producto/ajustar/<int:pk>/', views.ajustar_stock, name='ajustar_stock'),
     path('inventario/producto/kardex/<int:pk>/', views.producto_kardex, name='producto_kardex'),
+    path('inventario/valorizacion/', views.valorizacion_inventario, name='valorizacion_inventario'),
     path('mantenimiento/entidades/editar/<int:pk>/', views.editar_entidad, name='editar_entidad'),
     path('mantenimiento/entidades/eliminar/<int:pk>/', views.eliminar_entidad, name='eliminar_entidad'),
     path('mantenimiento/entidades/detalle/<int:pk>/', views.detalle_entidad, name='detalle_entidad'),
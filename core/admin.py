@@ -4,10 +4,11 @@ from .models import (
     Comprobante, ComprobanteDetalle, Prestamo, CategoriaGasto,
     GastoOperativo, CuentaEstado, Cuota, TipoCambioDia, 
     LogAuditoria, Notificacion, MovimientoFinanciero,
-    CertificadoRetencion, RetencionDetalle, Caja, Cuenta_Bancaria
+    CertificadoRetencion, RetencionDetalle, Caja, Cuenta_Bancaria, MovimientoStock
 )
 from django.contrib.auth.admin import UserAdmin 
 from .models import Cotizacion, CotizacionDetalle
+from . import auditoria
 
 # --- 1. CONFIGURACIÓN DE INLINES (Vistas anidadas) ---
 
@@ -67,7 +68,7 @@ class ComprobanteAdmin(admin.ModelAdmin):
 
     def delete_model(self, request, obj):
         # Registrar el borrado antes de que ocurra
-        LogAuditoria.objects.create(
+        auditoria.registrar(
             usuario=request.user,
             empresa=obj.empresa,
             accion='DELETE',
@@ -86,9 +87,28 @@ class ProductoAdmin(admin.ModelAdmin):
     list_display = ('sku', 'nombre_interno', 'stock_actual', 'precio_compra_referencial', 'precio_venta_referencial', 'empresa')
     search_fields = ('sku', 'nombre_interno')
     list_filter = ('empresa', 'categoria')
+    # El stock solo cambia por el libro de movimientos (core/inventario.py)
+    readonly_fields = ('stock_actual', 'costo_promedio', 'valor_inventario')
 
 admin.site.register(CategoriaProducto)
 
+@admin.register(MovimientoStock)
+class MovimientoStockAdmin(admin.ModelAdmin):
+    list_display = ('fecha', 'producto', 'origen', 'cantidad', 'costo_unitario', 'referencia', 'empresa')
+    list_filter = ('empresa', 'origen')
+    search_fields = ('producto__sku', 'producto__nombre_interno', 'referencia')
+    raw_id_fields = ('producto', 'comprobante', 'ajuste')
+
+    # Libro de solo inserción: desde el admin solo se consulta
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 # --- Módulo de Préstamos y Deudas (Cronogramas) ---
 @admin.register(Prestamo)
 class PrestamoAdmin(admin.ModelAdmin):
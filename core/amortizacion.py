@@ -0,0 +1,183 @@
+# core/amortizacion.py
+import datetime
+import decimal
+
+import numpy as np
+
+from .models import Cuota, Prestamo
+
+CENTIMO = decimal.Decimal('0.01')
+
+# Métodos de amortización soportados
+METODO_LINEAL = 'lineal'     # Interés simple (porcentaje_interes sobre el capital) repartido en partes iguales
+METODO_FRANCES = 'frances'   # Cuota fija
+METODO_ALEMAN = 'aleman'     # Amortización de capital fija
+METODO_BULLET = 'bullet'     # Solo intereses y el capital al final
+METODOS = [
+    (METODO_LINEAL, 'Lineal (interés simple)'),
+    (METODO_FRANCES, 'Francés (cuota fija)'),
+    (METODO_ALEMAN, 'Alemán (capital fijo)'),
+    (METODO_BULLET, 'Bullet (capital al vencimiento)'),
+]
+
+DIAS_ANIO = 360  # Convención financiera peruana para la TEA
+
+
+def tasa_periodica(tea_porcentaje, frecuencia_dias):
+    """Convierte una TEA (en %) a la tasa efectiva del periodo: (1 + TEA)^(dias/360) - 1"""
+    tea = np.asarray(tea_porcentaje, dtype=float) / 100.0
+    return np.power(1.0 + tea, np.asarray(frecuencia_dias, dtype=float) / DIAS_ANIO) - 1.0
+
+
+def calcular_cronogramas(capitales, tasas, plazos, metodo=METODO_FRANCES):
+    """
+    Calcula en bloque los cronogramas de muchos préstamos a la vez (what-if).
+
+    capitales, tasas (tasa del periodo, ej. 0.015) y plazos son escalares o vectores de L préstamos.
+    Devuelve un dict de matrices (L, N) con N = plazo máximo: 'cuota', 'capital', 'interes'
+    y 'saldo' (saldo luego de pagar la cuota). Los periodos más allá del plazo de cada préstamo van en cero.
+    Para METODO_LINEAL `tasas` es la tasa total del préstamo (porcentaje_interes / 100).
+    """
+    capitales, tasas, plazos = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(capitales, dtype=float)),
+        np.atleast_1d(np.asarray(tasas, dtype=float)),
+        np.atleast_1d(np.asarray(plazos, dtype=int)),
+    )
+    P = capitales[:, None]
+    r = tasas[:, None]
+    n = plazos[:, None]
+    k = np.arange(1, int(plazos.max()) + 1)[None, :]   # Número de cuota (1..N)
+    activo = k <= n
+
+    if metodo == METODO_FRANCES:
+        sin_tasa = r == 0
+        r_seg = np.where(sin_tasa, 1.0, r)
+        factor = np.power(1.0 + r_seg, n)
+        pago = np.where(sin_tasa, P / n, P * r_seg * factor / (factor - 1.0))
+        # Saldo antes de la cuota k: P(1+r)^(k-1) - A((1+r)^(k-1) - 1)/r
+        crec = np.power(1.0 + r_seg, k - 1)
+        saldo_previo = np.where(sin_tasa, P - (k - 1) * P / n, P * crec - pago * (crec - 1.0) / r_seg)
+        interes = saldo_previo * r
+        capital = pago - interes
+    elif metodo == METODO_ALEMAN:
+        capital = np.broadcast_to(P / n, activo.shape)
+        saldo_previo = P - (k - 1) * P / n
+        interes = saldo_previo * r
+    elif metodo == METODO_BULLET:
+        capital = np.where(k == n, P, 0.0)
+        interes = np.broadcast_to(P * r, activo.shape)
+    elif metodo == METODO_LINEAL:
+        capital = np.broadcast_to(P / n, activo.shape)
+        interes = np.broadcast_to(P * r / n, activo.shape)
+    else:
+        raise ValueError(f"Método de amortización desconocido: {metodo}")
+
+    capital = np.where(activo, capital, 0.0)
+    interes = np.where(activo, interes, 0.0)
+    saldo = np.where(activo, P - np.cumsum(capital, axis=1), 0.0)
+    return {
+        'cuota': capital + interes,
+        'capital': capital,
+        'interes': interes,
+        'saldo': np.maximum(saldo, 0.0),
+    }
+
+
+def comparar_metodos(capital, tea_porcentaje, num_cuotas, frecuencia_dias, porcentaje_simple=None):
+    """
+    Resumen what-if de todos los métodos para un mismo préstamo.
+    Devuelve una lista de dicts con la primera cuota, la última y los totales.
+    """
+    r = float(tasa_periodica(tea_porcentaje, frecuencia_dias))
+    simple = float(porcentaje_simple if porcentaje_simple is not None else tea_porcentaje) / 100.0
+    resumen = []
+    for metodo, etiqueta in METODOS:
+        tasa = simple if metodo == METODO_LINEAL else r
+        c = calcular_cronogramas(float(capital), tasa, num_cuotas, metodo)
+        resumen.append({
+            'metodo': metodo,
+            'etiqueta': etiqueta,
+            'primera_cuota': round(float(c['cuota'][0, 0]), 2),
+            'ultima_cuota': round(float(c['cuota'][0, num_cuotas - 1]), 2),
+            'total_interes': round(float(c['interes'].sum()), 2),
+            'total_pagar': round(float(c['cuota'].sum()), 2),
+        })
+    return resumen
+
+
+def _fechas(fecha_base, num_cuotas, frecuencia_dias):
+    offsets = np.arange(1, num_cuotas + 1) * int(frecuencia_dias)
+    fechas = np.datetime64(fecha_base, 'D') + offsets.astype('timedelta64[D]')
+    return fechas.astype(datetime.date).tolist()
+
+
+def _a_centimos(valores):
+    return [decimal.Decimal(repr(float(v))).quantize(CENTIMO, rounding=decimal.ROUND_HALF_UP) for v in valores]
+
+
+def construir_cuotas(capital, num_cuotas, frecuencia_dias, fecha_base, metodo=METODO_LINEAL,
+                     tasa=0.0, cuenta=None, prestamo=None, interes_total=None):
+    """
+    Arma (sin guardar) las instancias Cuota de un cronograma, ya redondeadas a céntimos.
+    El redondeo sobrante del capital (y del interés, si se conoce `interes_total`)
+    se carga en la última cuota para que la suma cuadre exacto.
+    """
+    if num_cuotas < 1:
+        raise ValueError("El cronograma necesita al menos una cuota.")
+    capital = decimal.Decimal(str(capital))
+    c = calcular_cronogramas(float(capital), tasa, num_cuotas, metodo)
+    # Se redondea la cuota y el interés; el capital es la diferencia (así la cuota francesa queda fija)
+    montos = _a_centimos(c['cuota'][0, :num_cuotas])
+    intereses = _a_centimos(c['interes'][0, :num_cuotas])
+    capitales = [m - i for m, i in zip(montos, intereses)]
+    capitales[-1] += capital - sum(capitales)
+    if interes_total is not None:
+        intereses[-1] += decimal.Decimal(str(interes_total)).quantize(CENTIMO) - sum(intereses)
+
+    cuotas = []
+    for i, (cap, intr, fecha) in enumerate(zip(capitales, intereses, _fechas(fecha_base, num_cuotas, frecuencia_dias)), start=1):
+        monto = cap + intr
+        cuotas.append(Cuota(
+            cuenta=cuenta, prestamo=prestamo, numero_cuota=i,
+            monto=monto, saldo_cuota=monto,  # bulk_create no pasa por Cuota.save()
+            monto_capital=cap, monto_interes=intr,
+            fecha_vencimiento=fecha,
+        ))
+    return cuotas
+
+
+def programar_cuotas_prestamo(prestamo, num_cuotas, frecuencia_dias, metodo=METODO_LINEAL, tea=None):
+    """
+    Reemplaza el cronograma del préstamo. METODO_LINEAL respeta el interés simple
+    del préstamo (porcentaje_interes); el resto usa `tea` (por defecto porcentaje_interes como TEA).
+    Guarda todas las cuotas con un solo bulk_create y deja en monto_interes el interés del cronograma,
+    para que la deuda del préstamo (pagos, flujo de caja) cuadre con sus cuotas.
+    """
+    interes_total = None
+    if metodo == METODO_LINEAL:
+        tasa = float(prestamo.porcentaje_interes) / 100.0
+        interes_total = (prestamo.monto_capital * prestamo.porcentaje_interes / 100).quantize(CENTIMO)
+    else:
+        tea = prestamo.porcentaje_interes if tea is None else tea
+        tasa = float(tasa_periodica(float(tea), frecuencia_dias))
+
+    cuotas = construir_cuotas(
+        prestamo.monto_capital, num_cuotas, frecuencia_dias, prestamo.fecha_prestamo,
+        metodo=metodo, tasa=tasa, prestamo=prestamo, interes_total=interes_total
+    )
+    prestamo.cuotas.all().delete()
+    interes = sum(c.monto_interes for c in cuotas)
+    if interes != prestamo.monto_interes:
+        Prestamo.objects.filter(pk=prestamo.pk).update(monto_interes=interes)
+        prestamo.monto_interes = interes
+    return Cuota.objects.bulk_create(cuotas)
+
+
+def programar_cuotas_cuenta(cuenta, num_cuotas, frecuencia_dias, fecha_base=None):
+    """Fracciona la deuda de una factura en partes iguales (sin intereses) con un solo bulk_create."""
+    cuotas = construir_cuotas(
+        cuenta.monto_total, num_cuotas, frecuencia_dias, fecha_base or datetime.date.today(),
+        cuenta=cuenta
+    )
+    cuenta.cuotas.all().delete()
+    return Cuota.objects.bulk_create(cuotas)
@@ -0,0 +1,137 @@
+# core/archivo_auditoria.py
+"""
+Archivo mensual del log de auditoría.
+
+LogAuditoria solo crece: los meses cerrados se pasan a un JSONL comprimido en media/auditoria/ (una fila
+ArchivoAuditoria por empresa y mes) y se borran de la tabla, así la tabla y su índice (empresa, fecha_hora)
+solo cargan los meses recientes. Se archiva con manage.py archivar_auditoria; los registros sin empresa
+(empresa_id None) se archivan aparte, con su propio ArchivoAuditoria sin empresa.
+
+Los meses archivados se siguen consultando: cargar_periodo() lee el archivo solo cuando alguien pide ese
+mes (y guarda en memoria los últimos leídos) y buscar() recorre los archivos uno a uno, sin abrirlos todos.
+"""
+import datetime
+import gzip
+import json
+from functools import lru_cache
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import ArchivoAuditoria, LogAuditoria, Usuario
+from .registros import rango_periodo
+
+CAMPOS = (
+    'id_log', 'usuario_id', 'empresa_id', 'accion', 'tabla_afectada', 'referencia_id', 'motivo_cambio', 'fecha_hora'
+)
+
+
+def _rango(periodo):
+    """'AAAA-MM' -> [inicio, fin) como datetimes de la zona horaria del sistema (usa el índice de fecha_hora)."""
+    desde, hasta = rango_periodo(periodo)
+    inicio = timezone.make_aware(datetime.datetime.combine(desde, datetime.time.min))
+    fin = timezone.make_aware(datetime.datetime.combine(hasta + datetime.timedelta(days=1), datetime.time.min))
+    return inicio, fin
+
+
+def inicio_zona_caliente(meses, hoy=None):
+    """Primer día de los `meses` más recientes (incluido el actual) que se quedan en la tabla."""
+    hoy = hoy or timezone.localdate()
+    anio, mes = divmod(hoy.year * 12 + hoy.month - 1 - (meses - 1), 12)
+    return datetime.date(anio, mes + 1, 1)
+
+
+def periodos_archivables(emp_id, corte):
+    """['AAAA-MM', ...] con registros anteriores a `corte` (fecha), del más antiguo al más reciente."""
+    limite = timezone.make_aware(datetime.datetime.combine(corte, datetime.time.min))
+    meses = (
+        LogAuditoria.objects.filter(empresa_id=emp_id, fecha_hora__lt=limite)
+        .annotate(mes=TruncMonth('fecha_hora')).values_list('mes', flat=True).distinct()
+    )
+    return sorted({f"{mes:%Y-%m}" for mes in meses})
+
+
+def _serializar(fila):
+    return {**fila, 'fecha_hora': fila['fecha_hora'].isoformat()}
+
+
+def _leer_archivo(archivo):
+    with archivo.archivo.open('rb') as f, gzip.open(f, 'rt', encoding='utf-8') as lineas:
+        return [json.loads(linea) for linea in lineas]
+
+
+def archivar_periodo(emp_id, periodo):
+    """
+    Pasa el mes de la empresa al archivo y lo borra de la tabla. Devuelve cuántos registros archivó.
+    Si el mes ya tenía archivo (registros que llegaron después) se reescribe con todos.
+    """
+    inicio, fin = _rango(periodo)
+    logs = LogAuditoria.objects.filter(empresa_id=emp_id, fecha_hora__gte=inicio, fecha_hora__lt=fin)
+    filas = list(logs.order_by('-fecha_hora', '-id_log').values(*CAMPOS))
+    if not filas:
+        return 0
+
+    with transaction.atomic():
+        archivo = ArchivoAuditoria.objects.select_for_update().filter(empresa_id=emp_id, periodo=periodo).first()
+        filas_archivo = [_serializar(fila) for fila in filas]
+        if archivo is None:
+            archivo = ArchivoAuditoria(empresa_id=emp_id, periodo=periodo)
+        else:
+            filas_archivo += _leer_archivo(archivo)
+            filas_archivo.sort(key=lambda fila: (fila['fecha_hora'], fila['id_log']), reverse=True)
+            # El archivo anterior se borra recién cuando el nuevo quedó confirmado
+            transaction.on_commit(lambda anterior=archivo.archivo.name: archivo.archivo.storage.delete(anterior))
+
+        contenido = '\n'.join(json.dumps(fila, ensure_ascii=False) for fila in filas_archivo)
+        archivo.filas = len(filas_archivo)
+        archivo.archivo.save(
+            f"{emp_id or 'sin_empresa'}/{periodo}.jsonl.gz", ContentFile(gzip.compress(contenido.encode('utf-8'))), save=False
+        )
+        archivo.save()
+        # Solo lo que se escribió en el archivo: lo que llegue al mes mientras tanto tiene un id mayor
+        # (sin un IN con miles de parámetros; LogAuditoria no tiene dependientes)
+        logs.filter(id_log__lte=max(fila['id_log'] for fila in filas)).delete()
+    return len(filas)
+
+
+@lru_cache(maxsize=12)
+def _filas_periodo(archivo_id, version):
+    # `version` (fecha_archivo) deja fuera de uso lo leído antes de reescribir el archivo
+    return tuple(_leer_archivo(ArchivoAuditoria.objects.get(pk=archivo_id)))
+
+
+def cargar_periodo(archivo):
+    """Registros archivados del mes como LogAuditoria (sin guardar), del más reciente al más antiguo."""
+    filas = _filas_periodo(archivo.pk, archivo.fecha_archivo)
+    usuarios = Usuario.objects.in_bulk({fila['usuario_id'] for fila in filas})
+    logs = []
+    for fila in filas:
+        log = LogAuditoria(**{**fila, 'fecha_hora': datetime.datetime.fromisoformat(fila['fecha_hora'])})
+        if fila['usuario_id'] in usuarios:
+            log.usuario = usuarios[fila['usuario_id']]
+        logs.append(log)
+    return logs
+
+
+def coincide(log, texto):
+    """Mismo criterio que el filtro de la tabla: `texto` en el detalle o en la tabla afectada."""
+    texto = texto.lower()
+    return texto in log.motivo_cambio.lower() or texto in log.tabla_afectada.lower()
+
+
+def buscar(emp_id, texto, desde=None, hasta=None):
+    """
+    Registros archivados cuyo detalle o tabla contiene `texto`, mes por mes desde el más reciente.
+    Es un generador: solo abre los archivos que se llegan a recorrer.
+    """
+    archivos = ArchivoAuditoria.objects.filter(empresa_id=emp_id)
+    if desde:
+        archivos = archivos.filter(periodo__gte=desde)
+    if hasta:
+        archivos = archivos.filter(periodo__lte=hasta)
+    for archivo in archivos.order_by('-periodo'):
+        for log in cargar_periodo(archivo):
+            if coincide(log, texto):
+                yield log
@@ -0,0 +1,48 @@
+# core/auditoria.py
+"""
+Buffer del log de auditoría: un solo INSERT (bulk_create) por request.
+
+Dentro de agrupando() (lo abre AuditoriaMiddleware para cada request) registrar() no escribe: pasa la
+entrada al buffer con transaction.on_commit, así que solo entra lo que realmente se confirmó (si la
+transacción o el savepoint se revierte, la entrada se descarta con él; sin transacción, entra en el acto).
+Al salir se escribe todo el buffer con un bulk_create. Fuera de un request (comandos, shell) se guarda
+al momento, como antes.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+
+from .models import LogAuditoria
+
+_buffer = ContextVar('buffer_auditoria', default=None)
+
+
+def registrar(**campos):
+    """Crea una entrada de LogAuditoria (mismos campos que LogAuditoria.objects.create)."""
+    log = LogAuditoria(**campos)
+    buffer = _buffer.get()
+    if buffer is None:
+        log.save()
+        return log
+    transaction.on_commit(lambda: buffer.append(log))
+    return log
+
+
+def volcar(buffer):
+    """Escribe el buffer en un solo INSERT (fecha_hora, auto_now_add, queda con la hora del volcado)."""
+    if buffer:
+        LogAuditoria.objects.bulk_create(buffer)
+        buffer.clear()
+
+
+@contextmanager
+def agrupando():
+    """Acumula las entradas confirmadas dentro del bloque y las escribe juntas al salir."""
+    buffer = []
+    token = _buffer.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _buffer.reset(token)
+        volcar(buffer)
@@ -0,0 +1,223 @@
+# core/busqueda.py
+"""
+Búsqueda global indexada (comprobantes, entidades, productos, cotizaciones y movimientos).
+
+Cada objeto buscable tiene una fila en IndiceBusqueda, mantenida por las señales de core/signals.py.
+El texto se indexa con FTS5 en SQLite (tabla virtual core_busqueda_fts, sincronizada por triggers)
+y con un índice GIN sobre to_tsvector('simple', texto) en PostgreSQL (ver migración 0033).
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.urls import reverse
+
+from .models import Comprobante, Cotizacion, Entidad, IndiceBusqueda, MovimientoFinanciero, Producto
+
+TABLA_FTS = 'core_busqueda_fts'
+LIMITE = 30
+
+# tipo -> (etiqueta, icono, nombre de la url de detalle o None)
+TIPOS = {
+    'comprobante': ('Comprobante', 'fa-file-invoice', 'ver_comprobante_detalle'),
+    'entidad': ('Entidad', 'fa-address-book', 'detalle_entidad'),
+    'producto': ('Producto', 'fa-box', 'producto_kardex'),
+    'cotizacion': ('Cotización', 'fa-file-signature', 'ver_cotizacion_guardada'),
+    'movimiento': ('Movimiento', 'fa-money-bill-transfer', None),
+}
+
+# Campos que alimentan el índice; si un save() toca solo otros campos (ej. stock_actual) no se reindexa
+CAMPOS_INDEXADOS = {
+    Comprobante: {'serie', 'numero', 'entidad', 'operacion', 'total', 'moneda'},
+    Entidad: {'nombre_razon_social', 'numero_documento'},
+    Producto: {'nombre_interno', 'sku', 'nombres_alternativos'},
+    Cotizacion: {'numero', 'nombre_cliente', 'ruc_dni_cliente'},
+    MovimientoFinanciero: {'referencia', 'tipo', 'monto', 'moneda'},
+}
+
+TIPO_POR_MODELO = {
+    Comprobante: 'comprobante', Entidad: 'entidad', Producto: 'producto',
+    Cotizacion: 'cotizacion', MovimientoFinanciero: 'movimiento',
+}
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes, igual para lo indexado y lo buscado (PostgreSQL 'simple' no quita tildes)."""
+    texto = unicodedata.normalize('NFKD', str(texto or '')).encode('ascii', 'ignore').decode()
+    return texto.lower()
+
+
+def terminos(consulta):
+    """Palabras de la consulta, sin operadores: el usuario no puede romper la sintaxis de MATCH/tsquery."""
+    return re.findall(r'[a-z0-9]+', normalizar(consulta))[:8]
+
+
+def documento(instancia):
+    """
+    (empresa_id, tipo, titulo, detalle, texto) del objeto, o None si el modelo no se indexa.
+    Se decide por el nombre del modelo (la migración 0039 guarda su propia copia de esta función).
+    """
+    modelo = instancia._meta.model_name
+    if modelo == 'comprobante':
+        codigo = f"{instancia.serie}-{instancia.numero}"
+        entidad = instancia.entidad
+        return (
+            instancia.empresa_id, 'comprobante', codigo,
+            f"{instancia.operacion} • {entidad.nombre_razon_social} • {instancia.moneda} {instancia.total}",
+            f"{codigo} {instancia.serie}{instancia.numero} {entidad.nombre_razon_social} {entidad.numero_documento}",
+        )
+    if modelo == 'entidad':
+        return (
+            instancia.empresa_id, 'entidad', instancia.nombre_razon_social,
+            f"{instancia.tipo_documento} {instancia.numero_documento}",
+            f"{instancia.nombre_razon_social} {instancia.numero_documento}",
+        )
+    if modelo == 'producto':
+        alias = ' '.join(str(a) for a in (instancia.nombres_alternativos or []))
+        return (
+            instancia.empresa_id, 'producto', instancia.nombre_interno, f"SKU {instancia.sku}",
+            f"{instancia.nombre_interno} {instancia.sku} {alias}",
+        )
+    if modelo == 'cotizacion':
+        return (
+            instancia.empresa_id, 'cotizacion', instancia.numero,
+            f"{instancia.nombre_cliente} • {instancia.moneda} {instancia.total}",
+            f"{instancia.numero} {instancia.nombre_cliente} {instancia.ruc_dni_cliente}",
+        )
+    if modelo == 'movimientofinanciero':
+        return (
+            instancia.empresa_id, 'movimiento', instancia.referencia[:255],
+            f"{instancia.tipo} • {instancia.moneda} {instancia.monto}",
+            instancia.referencia,
+        )
+    return None
+
+
+def _fila(instancia):
+    doc = documento(instancia)
+    if doc is None:
+        return None
+    empresa_id, tipo, titulo, detalle, texto = doc
+    return IndiceBusqueda(
+        empresa_id=empresa_id, tipo=tipo, objeto_id=instancia.pk,
+        titulo=titulo[:255], detalle=detalle[:255], texto=normalizar(texto)
+    )
+
+
+def indexar(instancia, update_fields=None):
+    """Alta o actualización de un objeto en el índice (llamado desde post_save)."""
+    campos = CAMPOS_INDEXADOS.get(type(instancia))
+    if campos is None or (update_fields and not campos.intersection(update_fields)):
+        return
+    fila = _fila(instancia)
+    anterior = None
+    if isinstance(instancia, Entidad):
+        anterior = IndiceBusqueda.objects.filter(tipo=fila.tipo, objeto_id=fila.objeto_id).values_list('texto', flat=True).first()
+    IndiceBusqueda.objects.update_or_create(
+        tipo=fila.tipo, objeto_id=fila.objeto_id,
+        defaults={'empresa_id': fila.empresa_id, 'titulo': fila.titulo, 'detalle': fila.detalle, 'texto': fila.texto}
+    )
+    # Los comprobantes llevan el nombre y documento de su entidad: si cambiaron, se reindexan
+    if anterior is not None and anterior != fila.texto:
+        reindexar_comprobantes(instancia)
+
+
+def reindexar_comprobantes(entidad, lote=2000):
+    """Rehace las filas del índice de los comprobantes de la entidad (bulk_update en lotes)."""
+    comprobantes = Comprobante.objects.filter(entidad=entidad).select_related('entidad')
+    filas = [_fila(c) for c in comprobantes.iterator(chunk_size=lote)]
+    ids = dict(
+        IndiceBusqueda.objects.filter(tipo='comprobante', objeto_id__in=[f.objeto_id for f in filas])
+        .values_list('objeto_id', 'id')
+    )
+    for fila in filas:
+        fila.id = ids.get(fila.objeto_id)
+    IndiceBusqueda.objects.bulk_update([f for f in filas if f.id], ['titulo', 'detalle', 'texto'], batch_size=lote)
+    IndiceBusqueda.objects.bulk_create([f for f in filas if not f.id], batch_size=lote)
+
+
+def desindexar(instancia):
+    """Baja del índice (llamado desde post_delete)."""
+    tipo = TIPO_POR_MODELO.get(type(instancia))
+    if tipo:
+        IndiceBusqueda.objects.filter(tipo=tipo, objeto_id=instancia.pk).delete()
+
+
+def reindexar(empresa_id=None, lote=2000):
+    """Reconstruye el índice completo (o de una empresa) con bulk_create. Devuelve el total indexado."""
+    borrar = IndiceBusqueda.objects.all()
+    if empresa_id:
+        borrar = borrar.filter(empresa_id=empresa_id)
+    borrar.delete()
+
+    total = 0
+    for modelo in CAMPOS_INDEXADOS:
+        qs = modelo.objects.all()
+        if empresa_id:
+            qs = qs.filter(empresa_id=empresa_id)
+        if modelo is Comprobante:
+            qs = qs.select_related('entidad')
+        filas = []
+        for obj in qs.iterator(chunk_size=lote):
+            filas.append(_fila(obj))
+            if len(filas) >= lote:
+                IndiceBusqueda.objects.bulk_create(filas)
+                total += len(filas)
+                filas = []
+        IndiceBusqueda.objects.bulk_create(filas)
+        total += len(filas)
+    return total
+
+
+def _ids_rankeados(emp_id, palabras, limite):
+    """ids de IndiceBusqueda ordenados por relevancia, según el motor de base de datos."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            # Prefijo por palabra y la empresa como filtro de columna dentro del propio índice FTS5.
+            # Las palabras más largas (más selectivas) van primero y la empresa al final: FTS5 recorre
+            # menos posiciones que si empieza por una lista enorme (ej. 'f001' o el id de la empresa).
+            orden = sorted(palabras, key=len, reverse=True)
+            match = ' AND '.join(f'texto : "{p}"*' for p in orden) + f' AND empresa_id : "{int(emp_id)}"'
+            cursor.execute(
+                f"SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s ORDER BY bm25({TABLA_FTS}) LIMIT %s",
+                [match, limite]
+            )
+        elif connection.vendor == 'postgresql':
+            consulta = ' & '.join(f"{p}:*" for p in palabras)
+            cursor.execute(
+                "SELECT id FROM core_indicebusqueda "
+                "WHERE empresa_id = %s AND to_tsvector('simple', texto) @@ to_tsquery('simple', %s) "
+                "ORDER BY ts_rank(to_tsvector('simple', texto), to_tsquery('simple', %s)) DESC LIMIT %s",
+                [emp_id, consulta, consulta, limite]
+            )
+        else:
+            qs = IndiceBusqueda.objects.filter(empresa_id=emp_id)
+            for p in palabras:
+                qs = qs.filter(texto__contains=p)
+            return list(qs.values_list('id', flat=True)[:limite])
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def buscar(emp_id, consulta, limite=LIMITE):
+    """Resultados rankeados de la empresa: lista de dicts con tipo, etiqueta, icono, titulo, detalle y url."""
+    palabras = terminos(consulta)
+    if not emp_id or not palabras:
+        return []
+    ids = _ids_rankeados(emp_id, palabras, limite)
+    filas = IndiceBusqueda.objects.in_bulk(ids)
+
+    resultados = []
+    for i in ids:
+        fila = filas.get(i)
+        if fila is None:
+            continue
+        etiqueta, icono, url_name = TIPOS[fila.tipo]
+        resultados.append({
+            'tipo': fila.tipo,
+            'etiqueta': etiqueta,
+            'icono': icono,
+            'titulo': fila.titulo,
+            'detalle': fila.detalle,
+            'url': reverse(url_name, args=[fila.objeto_id]) if url_name else reverse('lista_movimientos'),
+        })
+    return resultados
@@ -1,5 +1,8 @@
 # core/context_processors.py
-from .models import Notificacion
+from functools import lru_cache
+
+from .permisos import permisos_de
+from .services import resumen_notificaciones
 
 def global_context(request):
     # Valores por defecto
@@ -10,14 +13,15 @@ def global_context(request):
     }
 
     if request.user.is_authenticated:
-        # 1. Notificaciones
+        # 1. Notificaciones: funciones que el template llama solo si muestra la campanita,
+        # y que leen del cache (core/services.py) una vez por request
         emp_id = request.session.get('empresa_id')
         if emp_id:
-            context['n_count'] = Notificacion.objects.filter(empresa_id=emp_id, leida=False).count()
-            context['n_alertas'] = Notificacion.objects.filter(empresa_id=emp_id, leida=False)[:5]
-        
-        # 2. Permisos del Rol (Para ocultar botones)
-        if hasattr(request.user, 'rol') and request.user.rol:
-            context['user_permisos'] = request.user.rol.permisos
-            
-    return context
\ No newline at end of file
+            resumen = lru_cache(maxsize=None)(lambda: resumen_notificaciones(emp_id))
+            context['n_count'] = lambda: resumen()['total']
+            context['n_alertas'] = lambda: resumen()['recientes']
+
+        # 2. Permisos del Rol (Para ocultar botones): {{ user_permisos.es_admin }}, {{ user_permisos.ver_x }}
+        context['user_permisos'] = lambda: permisos_de(request.user)
+
+    return context
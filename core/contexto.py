@@ -0,0 +1,37 @@
+# core/contexto.py
+"""
+Usuario y empresa "actuales" para las señales de auditoría, en contextvars.
+
+Una ContextVar es propia de cada request aunque varios compartan el hilo (ASGI, vistas async: asgiref
+copia el contexto al pasar entre código sync y async), y actuando_como() la restaura al salir, así nada
+queda pegado para el siguiente request del worker. AuditoriaMiddleware la abre en cada request; los
+comandos y tareas en segundo plano que guardan modelos auditados la abren a mano:
+
+    with actuando_como(usuario, empresa):
+        ...
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_usuario_actual = ContextVar('usuario_actual', default=None)
+_empresa_actual = ContextVar('empresa_actual', default=None)
+
+
+def get_current_user():
+    return _usuario_actual.get()
+
+
+def get_current_empresa():
+    return _empresa_actual.get()
+
+
+@contextmanager
+def actuando_como(usuario, empresa=None):
+    """Atribuye al usuario (y empresa) lo que se guarde dentro del bloque; al salir vuelve lo anterior."""
+    token_usuario = _usuario_actual.set(usuario)
+    token_empresa = _empresa_actual.set(empresa)
+    try:
+        yield
+    finally:
+        _empresa_actual.reset(token_empresa)
+        _usuario_actual.reset(token_usuario)
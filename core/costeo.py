@@ -0,0 +1,81 @@
+# core/costeo.py
+"""
+Kardex valorizado por costo promedio ponderado.
+
+Cada Producto guarda su costo_promedio (S/ por unidad) y valor_inventario (S/): lectura O(1) del costo y
+del valor. Las funciones de este módulo son las reglas del promedio y solo modifican la instancia (un
+Producto o un Estado) en memoria; las aplica inventario.registrar_movimiento con la fila del producto
+bloqueada, y core/saldos.py las repite sobre el libro MovimientoStock para el valor a una fecha o para
+recalcular_costos().
+"""
+import decimal
+
+CERO = decimal.Decimal('0.00')
+CENTIMO = decimal.Decimal('0.01')
+DIEZMILESIMO = decimal.Decimal('0.0001')
+UNO = decimal.Decimal('1')
+
+
+def _valor(monto):
+    return monto.quantize(CENTIMO)
+
+
+def _costo(monto):
+    return monto.quantize(DIEZMILESIMO)
+
+
+def factor_pen(moneda, tipo_cambio):
+    """Multiplicador a soles de un monto del comprobante (1 si ya está en PEN)."""
+    return decimal.Decimal(tipo_cambio) if moneda != 'PEN' else UNO
+
+
+def registrar_entrada(producto, cantidad, costo_unitario):
+    """Compra (o devolución) de `cantidad` unidades a `costo_unitario` S/: recalcula el promedio."""
+    if producto.stock_actual <= 0:
+        # Sin existencias (o con stock negativo por ventas sin compra) el costo arranca de nuevo
+        producto.stock_actual += cantidad
+        producto.valor_inventario = _valor(max(producto.stock_actual, CERO) * costo_unitario)
+        producto.costo_promedio = _costo(costo_unitario)
+        return
+    producto.stock_actual += cantidad
+    producto.valor_inventario = _valor(producto.valor_inventario + cantidad * costo_unitario)
+    if producto.stock_actual > 0:
+        producto.costo_promedio = _costo(producto.valor_inventario / producto.stock_actual)
+
+
+def registrar_salida(producto, cantidad):
+    """Venta o merma al costo promedio vigente (el promedio no cambia). Devuelve el costo de lo vendido."""
+    costo_salida = _valor(cantidad * producto.costo_promedio)
+    producto.stock_actual -= cantidad
+    if producto.stock_actual > 0:
+        producto.valor_inventario = _valor(producto.valor_inventario - costo_salida)
+    else:
+        producto.valor_inventario = CERO
+    return costo_salida
+
+
+def revertir_entrada(producto, cantidad, costo_unitario):
+    """Deshace una compra (edición o borrado del comprobante) retirando su valor original."""
+    producto.stock_actual -= cantidad
+    if producto.stock_actual > 0:
+        producto.valor_inventario = _valor(max(producto.valor_inventario - cantidad * costo_unitario, CERO))
+        producto.costo_promedio = _costo(producto.valor_inventario / producto.stock_actual)
+    else:
+        producto.valor_inventario = CERO
+
+
+def registrar_costo_adicional(producto, monto):
+    """Flete u otro costo en S/ que se carga al valor de las existencias (sin existencias no se capitaliza)."""
+    if producto.stock_actual > 0:
+        producto.valor_inventario = _valor(producto.valor_inventario + monto)
+        producto.costo_promedio = _costo(producto.valor_inventario / producto.stock_actual)
+
+
+class Estado:
+    """Mismos atributos que Producto para repetir el libro con las funciones de movimiento (core/saldos.py)."""
+    __slots__ = ('stock_actual', 'costo_promedio', 'valor_inventario')
+
+    def __init__(self, stock_actual=CERO, costo_promedio=CERO, valor_inventario=CERO):
+        self.stock_actual = stock_actual
+        self.costo_promedio = costo_promedio
+        self.valor_inventario = valor_inventario
@@ -0,0 +1,173 @@
+# core/cuotas.py
+import datetime
+import decimal
+
+from django.db.models import Q
+
+from .models import Cuota
+
+CENTIMO = decimal.Decimal('0.01')
+CERO = decimal.Decimal('0.00')
+
+# Estrategias de reparto de un pago entre cuotas pendientes
+ESTRATEGIA_ANTIGUEDAD = 'antiguedad'        # La más antigua primero (Efecto Dominó)
+ESTRATEGIA_PRORRATA = 'prorrata'            # Proporcional al saldo de cada cuota
+ESTRATEGIA_INTERES_PRIMERO = 'interes'      # Préstamos: primero intereses, luego capital
+ESTRATEGIAS = [ESTRATEGIA_ANTIGUEDAD, ESTRATEGIA_PRORRATA, ESTRATEGIA_INTERES_PRIMERO]
+
+
+def _a_decimal(valor):
+    return decimal.Decimal(str(valor or 0))
+
+
+def _interes_pendiente(cuota, ratio_interes):
+    """
+    Parte del saldo de la cuota que corresponde a intereses.
+    Usa el desglose del cronograma (monto_interes) y, si la cuota no lo tiene,
+    la proporción de interés del préstamo. Lo ya abonado se considera aplicado primero al interés.
+    """
+    interes_cuota = cuota.monto_interes or (cuota.monto * ratio_interes).quantize(CENTIMO)
+    abonado = cuota.monto - cuota.saldo_cuota
+    return min(max(interes_cuota - abonado, CERO), cuota.saldo_cuota)
+
+
+def _repartir_en_orden(monto, topes):
+    """Llena cada tope en el orden recibido hasta agotar el monto."""
+    aplicados = []
+    for tope in topes:
+        parte = min(monto, tope)
+        aplicados.append(parte)
+        monto -= parte
+    return aplicados, monto
+
+
+def _repartir_prorrata(monto, saldos):
+    """
+    Reparte el monto en proporción a cada saldo, truncando a céntimos.
+    Los céntimos sobrantes se asignan uno a uno empezando por la más antigua.
+    """
+    total = sum(saldos, CERO)
+    if monto >= total:
+        return list(saldos), monto - total
+
+    aplicados = [
+        (monto * s / total).quantize(CENTIMO, rounding=decimal.ROUND_DOWN) if total > 0 else CERO
+        for s in saldos
+    ]
+    sobrante = monto - sum(aplicados, CERO)
+    i = 0
+    while sobrante > 0:
+        pos = i % len(saldos)
+        hueco = saldos[pos] - aplicados[pos]
+        if hueco > 0:
+            extra = min(CENTIMO, hueco, sobrante)
+            aplicados[pos] += extra
+            sobrante -= extra
+        i += 1
+    return aplicados, sobrante
+
+
+def calcular_asignacion(monto, cuotas, estrategia=ESTRATEGIA_ANTIGUEDAD, ratio_interes=CERO):
+    """
+    Calcula en memoria cuánto del pago va a cada cuota, sin tocar la BD.
+    `cuotas` debe venir ordenada por fecha de vencimiento.
+    Devuelve (montos_aplicados, monto_sobrante).
+    """
+    monto = _a_decimal(monto).quantize(CENTIMO)
+    saldos = [c.saldo_cuota for c in cuotas]
+
+    if estrategia == ESTRATEGIA_PRORRATA:
+        return _repartir_prorrata(monto, saldos)
+
+    if estrategia == ESTRATEGIA_INTERES_PRIMERO:
+        intereses = [_interes_pendiente(c, ratio_interes) for c in cuotas]
+        capitales = [s - i for s, i in zip(saldos, intereses)]
+        # 1. Primera pasada: intereses de todas las cuotas
+        a_interes, monto = _repartir_en_orden(monto, intereses)
+        # 2. Segunda pasada: capital con lo que sobre
+        a_capital, monto = _repartir_en_orden(monto, capitales)
+        return [i + c for i, c in zip(a_interes, a_capital)], monto
+
+    if estrategia not in ESTRATEGIAS:
+        raise ValueError(f"Estrategia de reparto desconocida: {estrategia}")
+
+    return _repartir_en_orden(monto, saldos)
+
+
+def asignar_pago_cuotas(monto_a_pagar, cuenta=None, prestamo=None,
+                        estrategia=ESTRATEGIA_ANTIGUEDAD, fecha_pago=None):
+    """
+    Reparte un pago entre las cuotas pendientes de una Factura (cuenta) o de un Préstamo.
+    Calcula toda la cascada en memoria y guarda las cuotas afectadas con un solo bulk_update.
+
+    Devuelve (asignaciones, monto_sobrante). Cada asignación es un dict con el
+    antes/después de la cuota, para dejar rastro en la auditoría.
+    """
+    fecha_pago = fecha_pago or datetime.date.today()
+    origen = cuenta if cuenta else prestamo
+
+    cuotas = list(
+        origen.cuotas.filter(pagada=False)
+        .only('id', 'cuenta', 'prestamo', 'numero_cuota', 'monto', 'monto_interes',
+              'saldo_cuota', 'fecha_vencimiento', 'pagada', 'fecha_pago')
+        .order_by('fecha_vencimiento', 'numero_cuota')
+    )
+    for c in cuotas:
+        if c.saldo_cuota is None:
+            c.saldo_cuota = c.monto
+
+    ratio_interes = CERO
+    if prestamo and estrategia == ESTRATEGIA_INTERES_PRIMERO:
+        deuda_total = prestamo.monto_capital + prestamo.monto_interes
+        if deuda_total > 0:
+            ratio_interes = _a_decimal(prestamo.monto_interes) / deuda_total
+
+    aplicados, sobrante = calcular_asignacion(monto_a_pagar, cuotas, estrategia, ratio_interes)
+
+    asignaciones = []
+    cambiadas = []
+    for cuota, aplicado in zip(cuotas, aplicados):
+        if aplicado <= 0:
+            continue
+        saldo_anterior = cuota.saldo_cuota
+        cuota.saldo_cuota = saldo_anterior - aplicado
+        if cuota.saldo_cuota <= 0:
+            cuota.saldo_cuota = CERO
+            cuota.pagada = True
+            cuota.fecha_pago = fecha_pago
+        cambiadas.append(cuota)
+        asignaciones.append({
+            'cuota_id': cuota.id,
+            'numero_cuota': cuota.numero_cuota,
+            'fecha_vencimiento': cuota.fecha_vencimiento,
+            'saldo_anterior': saldo_anterior,
+            'monto_aplicado': aplicado,
+            'saldo_nuevo': cuota.saldo_cuota,
+            'pagada': cuota.pagada,
+        })
+
+    if cambiadas:
+        Cuota.objects.bulk_update(cambiadas, ['saldo_cuota', 'pagada', 'fecha_pago'])
+
+    return asignaciones, sobrante
+
+
+def resumen_asignacion(asignaciones):
+    """Texto corto para el Log de Auditoría: 'Cuota 1: 100.00 | Cuota 2: 50.00'"""
+    return " | ".join(f"Cuota {a['numero_cuota']}: {a['monto_aplicado']:.2f}" for a in asignaciones)
+
+
+def cuotas_pendientes(emp_id, desde=None, hasta=None):
+    """
+    Todas las cuotas sin pagar de la empresa (facturas y préstamos) en una sola consulta ordenada.
+    Trae con select_related todo lo que pinta el cronograma (comprobante, entidad, préstamo),
+    así cada fila no dispara consultas extra. El filtro pagada=False usa el índice parcial de Cuota.
+    """
+    qs = Cuota.objects.filter(pagada=False).filter(
+        Q(cuenta__comprobante__empresa_id=emp_id) | Q(prestamo__empresa_id=emp_id)
+    )
+    if desde:
+        qs = qs.filter(fecha_vencimiento__gte=desde)
+    if hasta:
+        qs = qs.filter(fecha_vencimiento__lte=hasta)
+    return qs.select_related('cuenta__comprobante__entidad', 'prestamo').order_by('fecha_vencimiento', 'id')
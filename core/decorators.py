@@ -1,11 +1,49 @@
 # core/decorators.py
+from functools import wraps
+
 from django.core.exceptions import PermissionDenied
 
+from .permisos import permisos_de
+from .replicas import alias_para, leyendo_de
+
 def admin_required(view_func):
     def _wrapped_view_func(request, *args, **kwargs):
-        # Verificamos si el rol del usuario es Admin
-        if request.user.is_authenticated and request.user.rol and request.user.rol.nombre == 'Admin':
+        # Verificamos si el rol del usuario es Admin (desde el cache de permisos, sin consultar el rol)
+        if permisos_de(request.user).es_admin:
             return view_func(request, *args, **kwargs)
         else:
             raise PermissionDenied # Lanza un error 403
-    return _wrapped_view_func
\ No newline at end of file
+    return _wrapped_view_func
+
+
+def permiso_requerido(permiso):
+    """Como admin_required, para una clave de Rol.permisos (el admin siempre pasa)."""
+    def decorador(view_func):
+        @wraps(view_func)
+        def _wrapped_view_func(request, *args, **kwargs):
+            if permisos_de(request.user).tiene(permiso):
+                return view_func(request, *args, **kwargs)
+            raise PermissionDenied
+        return _wrapped_view_func
+    return decorador
+
+
+def usar_replica(view_func):
+    """Vista de solo lectura: sus consultas van a la réplica de reportes si está disponible (core/replicas.py)."""
+    @wraps(view_func)
+    def _wrapped_view_func(request, *args, **kwargs):
+        alias = alias_para(request)
+        if alias is None:
+            return view_func(request, *args, **kwargs)
+        with leyendo_de(alias):
+            response = view_func(request, *args, **kwargs)
+        if response.streaming:
+            # Las exportaciones consultan mientras se envían: el generador también lee de la réplica
+            response.streaming_content = _leyendo(alias, response.streaming_content)
+        return response
+    return _wrapped_view_func
+
+
+def _leyendo(alias, contenido):
+    with leyendo_de(alias):
+        yield from contenido
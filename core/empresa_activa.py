@@ -0,0 +1,53 @@
+# core/empresa_activa.py
+"""
+Empresa activa del request (request.empresa) sin ir a la base de datos en cada vista.
+
+La fila Empresa y los ids de empresas_permitidas de cada usuario se guardan en el cache de Django;
+las señales de core/signals.py borran la entrada cuando la empresa se guarda o elimina y cuando cambian
+las empresas permitidas del usuario. Con varios workers, CACHES debe ser compartido (Redis/Memcached)
+para que la invalidación llegue a todos; con el LocMemCache por defecto, TTL acota lo que dura un dato viejo.
+"""
+from django.core.cache import cache
+
+from .models import Empresa
+
+TTL = 300
+
+
+def _clave_empresa(emp_id):
+    return f"empresa:{emp_id}"
+
+
+def _clave_permitidas(usuario_id):
+    return f"empresas_permitidas:{usuario_id}"
+
+
+def obtener_empresa(emp_id):
+    """Empresa desde el cache (una consulta solo la primera vez). None si no existe."""
+    clave = _clave_empresa(emp_id)
+    empresa = cache.get(clave)
+    if empresa is None:
+        empresa = Empresa.objects.filter(id=emp_id).first()
+        if empresa is not None:
+            cache.set(clave, empresa, TTL)
+    return empresa
+
+
+def empresas_permitidas_ids(usuario):
+    return cache.get_or_set(
+        _clave_permitidas(usuario.pk),
+        lambda: set(usuario.empresas_permitidas.values_list('id', flat=True)),
+        TTL
+    )
+
+
+def puede_usar(usuario, emp_id):
+    return usuario.is_superuser or int(emp_id) in empresas_permitidas_ids(usuario)
+
+
+def invalidar_empresa(emp_id):
+    cache.delete(_clave_empresa(emp_id))
+
+
+def invalidar_permitidas(usuario_id):
+    cache.delete(_clave_permitidas(usuario_id))
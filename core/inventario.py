@@ -0,0 +1,193 @@
+# core/inventario.py
+"""
+Único punto de escritura del stock.
+
+registrar_movimiento() agrega una fila al libro MovimientoStock y aplica el cambio a Producto con
+UPDATE ... SET stock_actual = stock_actual + x (expresión F), así dos ventas simultáneas no se pisan
+como pasaba con leer, sumar y hacer producto.save(). El costo promedio (core/costeo.py) se recalcula
+con la fila del producto bloqueada (select_for_update) dentro de la misma transacción.
+
+El libro permite reconstruir stock_actual (conciliar_stock) y el stock, costo y valor a cualquier fecha
+(core/saldos.py): cada fila guarda el costo unitario con que se aplicó y los fletes quedan como filas
+COSTO_ADICIONAL sin cantidad, así aplicar_movimiento() repite el costo promedio fila por fila.
+Como el UPDATE no pasa por Producto.save(), cada movimiento se anota en el log de auditoría aquí mismo.
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import auditoria, costeo
+from .contexto import get_current_user
+from .models import MovimientoStock, Producto, SaldoInventarioMensual
+
+CERO = costeo.CERO
+
+# Entradas que recalculan el promedio con su propio costo; las reversiones de compra retiran ese costo
+ENTRADAS = {'COMPRA', 'SALDO_INICIAL'}
+REVERSIONES_DE_ENTRADA = {'ANULA_COMPRA'}
+# Costo sin unidades (fletes): cantidad 0 y en costo_unitario el monto total en S/
+COSTO_ADICIONAL = 'COSTO_ADICIONAL'
+
+
+def _auditar(producto, accion_detalle):
+    """Entrada en el log de auditoría (como hace la señal de post_save) si hay un usuario actual."""
+    usuario = get_current_user()
+    if usuario and usuario.is_authenticated:
+        auditoria.registrar(
+            usuario=usuario, empresa_id=producto.empresa_id, accion='UPDATE', tabla_afectada='Producto',
+            referencia_id=producto.pk, motivo_cambio=f"[STOCK] {producto.nombre_interno} ({producto.sku}): {accion_detalle}"
+        )
+
+
+def _valorizar(producto, cantidad, origen, costo_unitario):
+    """Aplica el movimiento al costo promedio (sobre la instancia) y devuelve el costo unitario usado."""
+    if origen in REVERSIONES_DE_ENTRADA:
+        costeo.revertir_entrada(producto, -cantidad, costo_unitario)
+        return costo_unitario
+    if cantidad > 0:
+        costo = costo_unitario if origen in ENTRADAS and costo_unitario is not None else producto.costo_promedio
+        costeo.registrar_entrada(producto, cantidad, costo)
+        return costo
+    costo = producto.costo_promedio
+    costeo.registrar_salida(producto, -cantidad)
+    return costo
+
+
+def aplicar_movimiento(estado, origen, cantidad, costo_unitario):
+    """
+    Aplica una fila del libro a `estado` (Producto o costeo.Estado) con el costo que quedó anotado.
+    Es la misma regla que registrar_movimiento, para repetir el costo promedio desde el libro.
+    """
+    if origen == COSTO_ADICIONAL:
+        costeo.registrar_costo_adicional(estado, costo_unitario)
+        return costo_unitario
+    return _valorizar(estado, cantidad, origen, costo_unitario)
+
+
+def _invalidar_fotos(empresa_id, fecha):
+    """
+    Un movimiento con fecha dentro de un mes ya fotografiado (reversión con la fecha del documento,
+    compra o venta atrasada) deja vieja esa foto y las siguientes: se borran todas las de la empresa
+    desde esa fecha (una foto parcial diría cero para los productos que le falten). saldos_a_fecha
+    parte entonces de la foto anterior; generar_saldos_inventario las vuelve a crear.
+    """
+    SaldoInventarioMensual.objects.filter(empresa_id=empresa_id, fecha_corte__gte=fecha).delete()
+
+
+@transaction.atomic
+def registrar_movimiento(producto, cantidad, origen, fecha=None, costo_unitario=None,
+                         comprobante=None, ajuste=None, referencia=''):
+    """
+    Registra `cantidad` (con signo: + entra, - sale) del producto y actualiza stock, costo promedio
+    y valor. La instancia recibida queda sincronizada con la base de datos. Devuelve el MovimientoStock.
+    """
+    if isinstance(fecha, str):
+        fecha = datetime.date.fromisoformat(fecha)
+    actual = Producto.objects.select_for_update().only(
+        'stock_actual', 'costo_promedio', 'valor_inventario'
+    ).get(pk=producto.pk)
+    antes = actual.stock_actual
+    costo = aplicar_movimiento(actual, origen, cantidad, costo_unitario)
+
+    movimiento = MovimientoStock.objects.create(
+        empresa_id=producto.empresa_id, producto_id=producto.pk, fecha=fecha or timezone.localdate(),
+        origen=origen, cantidad=cantidad, costo_unitario=costo.quantize(costeo.DIEZMILESIMO),
+        comprobante=comprobante, ajuste=ajuste, referencia=referencia[:255]
+    )
+    _invalidar_fotos(producto.empresa_id, movimiento.fecha)
+    Producto.objects.filter(pk=producto.pk).update(
+        stock_actual=F('stock_actual') + cantidad,
+        costo_promedio=actual.costo_promedio, valor_inventario=actual.valor_inventario,
+    )
+    producto.refresh_from_db(fields=['stock_actual', 'costo_promedio', 'valor_inventario'])
+    _auditar(producto, (
+        f"{movimiento.get_origen_display()} {cantidad:+} -> stock {antes} a {producto.stock_actual}"
+        + (f" ({referencia})" if referencia else '')
+    ))
+    return movimiento
+
+
+@transaction.atomic
+def registrar_costo_adicional(producto, monto, costo_referencial=CERO, fecha=None, comprobante=None, referencia=''):
+    """
+    Flete u otro costo en S/ cargado al valor de las existencias (costo en destino), con la fila del
+    producto bloqueada como en registrar_movimiento: una compra simultánea no pisa el costo promedio.
+    Queda en el libro como COSTO_ADICIONAL. `costo_referencial` se suma a precio_compra_referencial
+    (S/ por unidad). Devuelve el MovimientoStock.
+    """
+    if isinstance(fecha, str):
+        fecha = datetime.date.fromisoformat(fecha)
+    actual = Producto.objects.select_for_update().only(
+        'stock_actual', 'costo_promedio', 'valor_inventario'
+    ).get(pk=producto.pk)
+    aplicar_movimiento(actual, COSTO_ADICIONAL, CERO, monto)
+    movimiento = MovimientoStock.objects.create(
+        empresa_id=producto.empresa_id, producto_id=producto.pk, fecha=fecha or timezone.localdate(),
+        origen=COSTO_ADICIONAL, cantidad=CERO, costo_unitario=monto.quantize(costeo.DIEZMILESIMO),
+        comprobante=comprobante, referencia=referencia[:255]
+    )
+    _invalidar_fotos(producto.empresa_id, movimiento.fecha)
+    Producto.objects.filter(pk=producto.pk).update(
+        costo_promedio=actual.costo_promedio, valor_inventario=actual.valor_inventario,
+        precio_compra_referencial=F('precio_compra_referencial') + costo_referencial,
+    )
+    producto.refresh_from_db(fields=['stock_actual', 'costo_promedio', 'valor_inventario', 'precio_compra_referencial'])
+    _auditar(producto, f"Costo adicional S/ {monto.quantize(costeo.CENTIMO)} -> costo promedio {producto.costo_promedio}")
+    return movimiento
+
+
+def registrar_comprobante(comprobante, detalle, revertir=False):
+    """Movimiento de una línea de compra/venta (o su reversión al editar/borrar el comprobante)."""
+    compra = comprobante.operacion == 'Compra'
+    cantidad = detalle.cantidad if compra != revertir else -detalle.cantidad
+    if revertir:
+        origen = 'ANULA_COMPRA' if compra else 'ANULA_VENTA'
+    else:
+        origen = 'COMPRA' if compra else 'VENTA'
+    # La reversión lleva la fecha del documento: el stock a una fecha pasada queda como si no hubiera existido
+    return registrar_movimiento(
+        detalle.producto, cantidad, origen, fecha=comprobante.fecha_emision, comprobante=comprobante,
+        costo_unitario=detalle.precio_unitario * costeo.factor_pen(comprobante.moneda, comprobante.tipo_cambio),
+        referencia=comprobante.codigo_factura,
+    )
+
+
+def stock_segun_libro(emp_id=None, producto_id=None, hasta=None):
+    """{producto_id: stock} sumando el libro (opcionalmente hasta una fecha) en una consulta agrupada."""
+    movimientos = MovimientoStock.objects.all()
+    if emp_id:
+        movimientos = movimientos.filter(empresa_id=emp_id)
+    if producto_id:
+        movimientos = movimientos.filter(producto_id=producto_id)
+    if hasta:
+        movimientos = movimientos.filter(fecha__lte=hasta)
+    return dict(movimientos.values('producto_id').annotate(s=Sum('cantidad')).values_list('producto_id', 's'))
+
+
+def diferencias_stock(emp_id=None):
+    """
+    Productos cuyo stock_actual no coincide con el libro: [(producto_id, stock_actual, stock_libro)].
+    Una consulta agrupada sobre el libro y otra sobre productos; se compara en Decimal.
+    """
+    libro = stock_segun_libro(emp_id)
+    productos = Producto.objects.all() if not emp_id else Producto.objects.filter(empresa_id=emp_id)
+    diferencias = []
+    for producto_id, stock in productos.order_by('id').values_list('id', 'stock_actual').iterator(chunk_size=2000):
+        en_libro = (libro.get(producto_id) or CERO).quantize(costeo.CENTIMO)
+        if stock != en_libro:
+            diferencias.append((producto_id, stock, en_libro))
+    return diferencias
+
+
+def conciliar_stock(emp_id=None):
+    """Reescribe stock_actual con la suma del libro. Devuelve [(producto_id, antes, después)] corregidos."""
+    corregidos = []
+    for producto_id, antes, despues in diferencias_stock(emp_id):
+        # El valor sigue al stock corregido, al costo promedio vigente
+        Producto.objects.filter(pk=producto_id).update(
+            stock_actual=despues, valor_inventario=F('costo_promedio') * max(despues, CERO)
+        )
+        corregidos.append((producto_id, antes, despues))
+    return corregidos
@@ -0,0 +1,90 @@
+# core/kardex.py
+"""
+Kardex de un producto calculado en la base de datos sobre el libro MovimientoStock.
+
+El libro es la fuente única del stock (core/inventario.py): compras, ventas, ajustes, devoluciones,
+saldos iniciales y reversiones. El saldo acumulado es un SUM(cantidad) OVER (ORDER BY fecha, id) y
+cada página trae solo sus filas (LIMIT/OFFSET sobre el resultado ya acumulado) junto con documento,
+entidad y usuario en la misma consulta, así que un producto con decenas de miles de movimientos no se
+carga en Python. El saldo final coincide con Producto.stock_actual (ver inventario.diferencias_stock).
+"""
+import decimal
+
+from django.db.models import F, Sum, Window
+
+from .models import MovimientoStock
+
+POR_PAGINA = 50
+CENTIMO = decimal.Decimal('0.01')
+CERO = decimal.Decimal('0.00')
+ORIGENES = dict(MovimientoStock.ORIGEN_CHOICES)
+REVERSIONES = {'ANULA_COMPRA', 'ANULA_VENTA'}
+
+
+def _decimal(valor):
+    return decimal.Decimal(str(valor if valor is not None else 0)).quantize(CENTIMO)
+
+
+def _descripcion(mov):
+    """(documento, entidad, motivo) del movimiento para la tabla del kardex."""
+    if mov.ajuste_id:
+        return 'AJUSTE MANUAL', f"Usuario: {mov.ajuste.usuario.username}", mov.ajuste.motivo
+    if mov.comprobante_id:
+        comprobante = mov.comprobante
+        motivo = ORIGENES[mov.origen] if mov.origen in REVERSIONES else ''
+        return f"{comprobante.serie}-{comprobante.numero}", comprobante.entidad.nombre_razon_social, motivo
+    # Saldo inicial, devoluciones o documentos ya borrados: lo que quedó anotado en el libro
+    return ORIGENES[mov.origen].upper(), '', mov.referencia
+
+
+class Kardex:
+    """
+    Movimientos del producto, lo más reciente primero, con el saldo después de cada movimiento.
+
+    Se comporta como una secuencia para django.core.paginator.Paginator: count() es un COUNT indexado
+    (producto, fecha, id) y cada slice ejecuta la consulta con ventana con LIMIT/OFFSET.
+    """
+
+    def __init__(self, producto_id, emp_id):
+        # Los fletes (COSTO_ADICIONAL) no mueven unidades: cambian el costo, no el saldo del kardex
+        self.movimientos = MovimientoStock.objects.filter(producto_id=producto_id, empresa_id=emp_id).exclude(
+            origen='COSTO_ADICIONAL'
+        )
+
+    def count(self):
+        return self.movimientos.count()
+
+    def __len__(self):
+        return self.count()
+
+    def _consulta(self):
+        # La ventana se evalúa sobre todo el producto antes del LIMIT: el saldo no depende de la página
+        return (
+            self.movimientos
+            .select_related('comprobante__entidad', 'ajuste__usuario')
+            .annotate(saldo=Window(Sum('cantidad'), order_by=[F('fecha').asc(), F('id').asc()]))
+            .order_by('-fecha', '-id')
+        )
+
+    def filas(self, desde=0, hasta=None):
+        for mov in self._consulta()[desde:hasta]:
+            documento, entidad, motivo = _descripcion(mov)
+            yield {
+                'fecha': mov.fecha,
+                'documento': documento,
+                'entidad': entidad,
+                'motivo': motivo,
+                'origen': mov.origen,
+                'tipo': 'Entrada' if mov.cantidad >= 0 else 'Salida',
+                'cantidad': abs(mov.cantidad),
+                'precio': mov.costo_unitario,
+                'saldo_despues': _decimal(mov.saldo),
+            }
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return list(self.filas(indice.start or 0, indice.stop))
+        return list(self.filas(indice, indice + 1))[0]
+
+    def __iter__(self):
+        return self.filas()
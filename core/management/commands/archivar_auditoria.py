@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.archivo_auditoria import archivar_periodo, inicio_zona_caliente, periodos_archivables
+from core.models import Empresa
+
+
+class Command(BaseCommand):
+    help = (
+        "Archiva los meses cerrados del log de auditoría en media/auditoria/ (JSONL comprimido) y los borra "
+        "de la tabla. Los meses archivados se siguen viendo desde el Log de Auditoría. Sin --empresa también "
+        "archiva los registros sin empresa."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help="Solo esta empresa (por defecto, todas).")
+        parser.add_argument('--meses', type=int, default=3, help="Meses recientes (incluido el actual) que se quedan en la tabla.")
+        parser.add_argument('--dry-run', action='store_true', help="Solo lista los meses que se archivarían.")
+
+    def handle(self, *args, **opts):
+        if opts['meses'] < 1:
+            raise CommandError("--meses debe ser al menos 1 (el mes en curso nunca se archiva).")
+        corte = inicio_zona_caliente(opts['meses'])
+
+        if opts['empresa']:
+            empresas = [opts['empresa']]
+        else:
+            # None: registros del log sin empresa (el FK es opcional), que si no crecerían sin límite
+            empresas = [*Empresa.objects.values_list('id', flat=True), None]
+        for emp_id in empresas:
+            nombre = f"Empresa {emp_id}" if emp_id else "Sin empresa"
+            for periodo in periodos_archivables(emp_id, corte):
+                if opts['dry_run']:
+                    self.stdout.write(f"{nombre}: {periodo} (pendiente)")
+                    continue
+                t0 = time.perf_counter()
+                filas = archivar_periodo(emp_id, periodo)
+                self.stdout.write(f"{nombre}: {periodo} -> {filas} registros archivados en {time.perf_counter() - t0:.1f} s")
@@ -0,0 +1,68 @@
+# core/management/commands/benchmark_antiguedad.py
+import datetime
+import decimal
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.antiguedad import reporte_antiguedad
+from core.models import Comprobante, CuentaEstado, Empresa, Entidad
+
+
+class Command(BaseCommand):
+    help = "Mide el reporte de antigüedad de saldos con muchos documentos abiertos (datos temporales, se revierten)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documentos', type=int, default=100_000)
+        parser.add_argument('--entidades', type=int, default=500)
+        parser.add_argument('--repeticiones', type=int, default=5)
+
+    def handle(self, *args, **opts):
+        n, e = opts['documentos'], opts['entidades']
+        hoy = datetime.date.today()
+        rng = np.random.default_rng(7)
+
+        with transaction.atomic():
+            empresa = Empresa.objects.create(nombre='BENCHMARK', ruc='99999999999')
+            entidades = Entidad.objects.bulk_create([
+                Entidad(empresa=empresa, tipo_entidad='Cliente', tipo_documento='RUC',
+                        numero_documento=f"20{i:09d}", nombre_razon_social=f"CLIENTE {i}")
+                for i in range(e)
+            ])
+            usd = rng.random(n) < 0.2
+            totales = rng.uniform(10, 5000, n).round(2)
+            atraso = rng.integers(-60, 240, n)
+            quien = rng.integers(0, e, n)
+
+            t0 = time.perf_counter()
+            comprobantes = Comprobante.objects.bulk_create([
+                Comprobante(
+                    empresa=empresa, entidad=entidades[int(quien[i])], tipo_documento='Factura', operacion='Venta',
+                    serie='F001', numero=str(i), fecha_emision=hoy, moneda='USD' if usd[i] else 'PEN',
+                    tipo_cambio=decimal.Decimal('3.750') if usd[i] else decimal.Decimal('1.000'),
+                    subtotal=0, igv=0, total=decimal.Decimal(str(totales[i]))
+                )
+                for i in range(n)
+            ], batch_size=5000)
+            CuentaEstado.objects.bulk_create([
+                CuentaEstado(
+                    comprobante=c, monto_total=c.total, saldo_pendiente=c.total,
+                    fecha_vencimiento=hoy - datetime.timedelta(days=int(atraso[i]))
+                )
+                for i, c in enumerate(comprobantes)
+            ], batch_size=5000)
+            self.stdout.write(f"Datos: {n} documentos / {e} entidades en {time.perf_counter() - t0:.1f} s")
+
+            tiempos = []
+            for _ in range(opts['repeticiones']):
+                t0 = time.perf_counter()
+                r = reporte_antiguedad(empresa.id, 'Venta', hoy=hoy)
+                tiempos.append(time.perf_counter() - t0)
+
+            self.stdout.write(
+                f"  reporte_antiguedad: mín {min(tiempos) * 1000:.1f} ms | máx {max(tiempos) * 1000:.1f} ms "
+                f"({len(r['filas'])} entidades, total S/ {r['total']['total']:,.2f})"
+            )
+            transaction.set_rollback(True)
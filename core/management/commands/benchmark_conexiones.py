@@ -0,0 +1,102 @@
+# core/management/commands/benchmark_conexiones.py
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Levanta gunicorn con varios workers contra cada DATABASE_URL indicada y mide latencia y throughput "
+        "de requests concurrentes (por defecto /salud/, una consulta por request)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--bd', action='append',
+            help="DATABASE_URL a comparar (repetible). Por defecto, SQLite local. Ej: postgres://u:c@localhost/contabilidad"
+        )
+        parser.add_argument('--conn-max-age', type=int, nargs='+', default=[0, 60],
+                            help="Valores de DB_CONN_MAX_AGE a comparar (0 = conexión nueva por request).")
+        parser.add_argument('--pool', action='store_true', help="Agrega una corrida con DB_POOL=1 (solo PostgreSQL + psycopg 3).")
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--concurrencia', type=int, default=16)
+        parser.add_argument('--peticiones', type=int, default=2000)
+        parser.add_argument('--ruta', default='/salud/')
+        parser.add_argument('--puerto', type=int, default=8765)
+
+    def handle(self, *args, **opts):
+        urls = opts['bd'] or [f"sqlite:///{settings.BASE_DIR / 'db.sqlite3'}"]
+        for url in urls:
+            perfiles = [{'DB_CONN_MAX_AGE': str(edad)} for edad in opts['conn_max_age']]
+            if opts['pool'] and url.startswith(('postgres', 'postgresql')):
+                perfiles.append({'DB_POOL': '1'})
+            for perfil in perfiles:
+                etiqueta = ' '.join(f"{k}={v}" for k, v in perfil.items())
+                self.stdout.write(f"{url.split('@')[-1]} [{etiqueta}]")
+                self._corrida(url, perfil, opts)
+
+    def _corrida(self, url, perfil, opts):
+        # El perfil de la corrida manda sobre lo que haya en el entorno
+        entorno = {k: v for k, v in os.environ.items() if k not in ('DB_POOL', 'DB_CONN_MAX_AGE')}
+        entorno.update(DATABASE_URL=url, **perfil)
+        direccion = f"127.0.0.1:{opts['puerto']}"
+        servidor = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'config.wsgi:application',
+             '--workers', str(opts['workers']), '--bind', direccion, '--log-level', 'warning'],
+            cwd=settings.BASE_DIR, env=entorno,
+        )
+        destino = f"http://{direccion}{opts['ruta']}"
+        try:
+            self._esperar(servidor, destino)
+            # Calentamiento: cada worker abre su conexión antes de medir
+            self._disparar(destino, opts['concurrencia'], opts['workers'] * 10)
+
+            t0 = time.perf_counter()
+            tiempos, errores = self._disparar(destino, opts['concurrencia'], opts['peticiones'])
+            total = time.perf_counter() - t0
+        finally:
+            servidor.terminate()
+            servidor.wait(timeout=10)
+
+        ms = np.array(tiempos) * 1000
+        if not len(ms):
+            raise CommandError("Ningún request respondió correctamente.")
+        self.stdout.write(
+            f"  {len(ms) / total:8.0f} req/s | p50 {np.percentile(ms, 50):6.1f} ms | "
+            f"p95 {np.percentile(ms, 95):6.1f} ms | p99 {np.percentile(ms, 99):6.1f} ms | errores {errores}"
+        )
+
+    def _esperar(self, servidor, destino, limite=20):
+        fin = time.monotonic() + limite
+        while time.monotonic() < fin:
+            if servidor.poll() is not None:
+                raise CommandError("gunicorn terminó al arrancar (¿está instalado? ¿DATABASE_URL válida?).")
+            try:
+                urllib.request.urlopen(destino, timeout=2).read()
+                return
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.2)
+        raise CommandError(f"gunicorn no respondió en {limite} s.")
+
+    @staticmethod
+    def _disparar(destino, concurrencia, n):
+        def uno(_):
+            t0 = time.perf_counter()
+            try:
+                urllib.request.urlopen(destino, timeout=30).read()
+            except (urllib.error.URLError, ConnectionError):
+                return None
+            return time.perf_counter() - t0
+
+        with ThreadPoolExecutor(concurrencia) as pool:
+            resultados = list(pool.map(uno, range(n)))
+        tiempos = [r for r in resultados if r is not None]
+        return tiempos, len(resultados) - len(tiempos)
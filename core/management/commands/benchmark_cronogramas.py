@@ -0,0 +1,87 @@
+# core/management/commands/benchmark_cronogramas.py
+import datetime
+import decimal
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.amortizacion import (
+    METODOS, calcular_cronogramas, construir_cuotas, tasa_periodica
+)
+from core.models import Cuota, Empresa, Prestamo
+
+
+class Command(BaseCommand):
+    help = "Mide la generación de cronogramas de amortización para miles de préstamos a la vez."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prestamos', type=int, default=5000)
+        parser.add_argument('--cuotas', type=int, default=24)
+        parser.add_argument('--frecuencia', type=int, default=30)
+        parser.add_argument('--persistir', action='store_true',
+                            help="Además guarda las cuotas con bulk_create (dentro de una transacción que se revierte).")
+
+    def handle(self, *args, **opts):
+        L, N, freq = opts['prestamos'], opts['cuotas'], opts['frecuencia']
+        rng = np.random.default_rng(7)
+        capitales = rng.uniform(1_000, 200_000, L).round(2)
+        teas = rng.uniform(8, 45, L).round(2)
+        plazos = rng.integers(N // 2 or 1, N + 1, L)
+        tasas = tasa_periodica(teas, freq)
+
+        self.stdout.write(f"Préstamos: {L} | Cuotas máx.: {N} | Frecuencia: {freq} días")
+
+        # 1. Cálculo vectorizado (what-if de todos los métodos)
+        for metodo, etiqueta in METODOS:
+            # El método lineal usa la tasa total del préstamo, no la del periodo
+            tasa = teas / 100.0 if metodo == 'lineal' else tasas
+            t0 = time.perf_counter()
+            c = calcular_cronogramas(capitales, tasa, plazos, metodo)
+            dt = time.perf_counter() - t0
+            self.stdout.write(
+                f"  {etiqueta:<35} {dt * 1000:8.1f} ms  "
+                f"({int(plazos.sum())} cuotas, interés total {c['interes'].sum():,.2f})"
+            )
+
+        # 2. Referencia: bucle en Python puro, cuota por cuota (método francés)
+        t0 = time.perf_counter()
+        for P, r, n in zip(capitales.tolist(), tasas.tolist(), plazos.tolist()):
+            pago = P * r / (1 - (1 + r) ** -n)
+            saldo = P
+            for _ in range(n):
+                interes = saldo * r
+                saldo -= pago - interes
+        dt_py = time.perf_counter() - t0
+        self.stdout.write(f"  {'Bucle Python (francés)':<35} {dt_py * 1000:8.1f} ms")
+
+        if opts['persistir']:
+            self._persistir(capitales, teas, plazos, freq)
+
+    def _persistir(self, capitales, teas, plazos, freq):
+        hoy = datetime.date.today()
+        with transaction.atomic():
+            empresa = Empresa.objects.create(nombre='BENCHMARK', ruc='99999999999')
+            prestamos = Prestamo.objects.bulk_create([
+                Prestamo(
+                    empresa=empresa, prestamista=f"Banco {i}", monto_capital=decimal.Decimal(str(cap)),
+                    porcentaje_interes=decimal.Decimal(str(tea)), monto_interes=0,
+                    fecha_prestamo=hoy, fecha_vencimiento=hoy + datetime.timedelta(days=freq * int(n))
+                )
+                for i, (cap, tea, n) in enumerate(zip(capitales.tolist(), teas.tolist(), plazos.tolist()))
+            ])
+
+            t0 = time.perf_counter()
+            cuotas = []
+            for p, n, r in zip(prestamos, plazos.tolist(), tasa_periodica(teas, freq).tolist()):
+                cuotas.extend(construir_cuotas(p.monto_capital, n, freq, hoy, metodo='frances', tasa=r, prestamo=p))
+            t1 = time.perf_counter()
+            Cuota.objects.bulk_create(cuotas, batch_size=2000)
+            t2 = time.perf_counter()
+
+            self.stdout.write(
+                f"  Persistencia: armado {(t1 - t0) * 1000:.1f} ms + bulk_create {(t2 - t1) * 1000:.1f} ms "
+                f"para {len(cuotas)} cuotas"
+            )
+            transaction.set_rollback(True)
@@ -0,0 +1,78 @@
+# core/management/commands/benchmark_kardex.py
+import datetime
+import decimal
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from core.kardex import Kardex, POR_PAGINA
+from core.models import Comprobante, ComprobanteDetalle, Empresa, Entidad, MovimientoStock, Producto
+
+
+class Command(BaseCommand):
+    help = "Mide la primera y la última página del kardex de un producto con muchos movimientos (datos temporales, se revierten)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--movimientos', type=int, default=50_000)
+        parser.add_argument('--repeticiones', type=int, default=5)
+
+    def handle(self, *args, **opts):
+        n = opts['movimientos']
+        rng = np.random.default_rng(7)
+        inicio = datetime.date(2020, 1, 1)
+
+        with transaction.atomic():
+            empresa = Empresa.objects.create(nombre='BENCHMARK', ruc='99999999999')
+            entidad = Entidad.objects.create(
+                empresa=empresa, tipo_entidad='Cliente', tipo_documento='RUC',
+                numero_documento='20000000000', nombre_razon_social='CLIENTE BENCHMARK'
+            )
+            producto = Producto.objects.create(empresa=empresa, sku='BENCH', nombre_interno='PRODUCTO BENCHMARK')
+            compra = rng.random(n) < 0.5
+            dias = np.sort(rng.integers(0, 2000, n))
+
+            t0 = time.perf_counter()
+            comprobantes = Comprobante.objects.bulk_create([
+                Comprobante(
+                    empresa=empresa, entidad=entidad, tipo_documento='Factura',
+                    operacion='Compra' if compra[i] else 'Venta', serie='F001', numero=str(i),
+                    fecha_emision=inicio + datetime.timedelta(days=int(dias[i])),
+                    subtotal=0, igv=0, total=decimal.Decimal('10.00')
+                )
+                for i in range(n)
+            ], batch_size=5000)
+            ComprobanteDetalle.objects.bulk_create([
+                ComprobanteDetalle(
+                    comprobante=c, producto=producto, cantidad=decimal.Decimal('1.00'),
+                    precio_unitario=decimal.Decimal('10.00'), subtotal_linea=decimal.Decimal('10.00')
+                )
+                for c in comprobantes
+            ], batch_size=5000)
+            # El kardex se lee del libro: una fila por comprobante, como las deja registrar_comprobante
+            cantidades = np.where(compra, 1, -1)
+            MovimientoStock.objects.bulk_create([
+                MovimientoStock(
+                    empresa=empresa, producto=producto, fecha=c.fecha_emision, comprobante=c,
+                    origen='COMPRA' if compra[i] else 'VENTA', cantidad=decimal.Decimal(int(cantidades[i])),
+                    costo_unitario=decimal.Decimal('10.00'), referencia=f"F001-{i}"
+                )
+                for i, c in enumerate(comprobantes)
+            ], batch_size=5000)
+            Producto.objects.filter(pk=producto.pk).update(stock_actual=int(cantidades.sum()))
+            self.stdout.write(f"Datos: {n} movimientos en {time.perf_counter() - t0:.1f} s")
+
+            paginator = Paginator(Kardex(producto.id, empresa.id), POR_PAGINA)
+            for etiqueta, numero in (('primera página', 1), ('última página', paginator.num_pages)):
+                tiempos = []
+                for _ in range(opts['repeticiones']):
+                    t0 = time.perf_counter()
+                    filas = list(paginator.page(numero))
+                    tiempos.append(time.perf_counter() - t0)
+                saldo = filas[0]['saldo_despues'] if filas else '-'
+                self.stdout.write(
+                    f"  {etiqueta}: mín {min(tiempos) * 1000:.1f} ms | máx {max(tiempos) * 1000:.1f} ms (saldo {saldo})"
+                )
+            transaction.set_rollback(True)
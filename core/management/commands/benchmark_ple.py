@@ -0,0 +1,71 @@
+# core/management/commands/benchmark_ple.py
+import datetime
+import decimal
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Comprobante, Empresa, Entidad
+from core.ple import escribir_zip_ple
+from core.registros import rango_periodo
+
+
+class Command(BaseCommand):
+    help = "Mide la generación del zip PLE con muchas líneas en un mes (datos temporales, se revierten)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lineas', type=int, default=100_000)
+        parser.add_argument('--chunk', type=int, default=2000)
+        parser.add_argument('--memoria', action='store_true',
+                            help="Mide el pico de memoria con tracemalloc (hace la generación bastante más lenta).")
+
+    def handle(self, *args, **opts):
+        n = opts['lineas']
+        desde, hasta = rango_periodo('2026-01')
+        rng = np.random.default_rng(7)
+
+        with transaction.atomic():
+            empresa = Empresa.objects.create(nombre='BENCHMARK', ruc='99999999999')
+            entidades = Entidad.objects.bulk_create([
+                Entidad(empresa=empresa, tipo_entidad='Ambos', tipo_documento='RUC',
+                        numero_documento=f"20{i:09d}", nombre_razon_social=f"SOCIO COMERCIAL {i} S.A.C.")
+                for i in range(300)
+            ])
+            dias = rng.integers(0, 31, n)
+            totales = rng.uniform(10, 9000, n).round(2)
+            t0 = time.perf_counter()
+            Comprobante.objects.bulk_create([
+                Comprobante(
+                    empresa=empresa, entidad=entidades[i % 300], tipo_documento='Factura',
+                    operacion='Venta' if i % 3 else 'Compra', serie='F001', numero=str(i),
+                    fecha_emision=desde + datetime.timedelta(days=int(dias[i])),
+                    moneda='USD' if i % 5 == 0 else 'PEN',
+                    tipo_cambio=decimal.Decimal('3.750') if i % 5 == 0 else decimal.Decimal('1.000'),
+                    subtotal=decimal.Decimal(str(round(totales[i] / 1.18, 2))),
+                    igv=decimal.Decimal(str(round(totales[i] - round(totales[i] / 1.18, 2), 2))),
+                    total=decimal.Decimal(str(totales[i])),
+                )
+                for i in range(n)
+            ], batch_size=5000)
+            self.stdout.write(f"Datos: {n} comprobantes en {time.perf_counter() - t0:.1f} s")
+
+            if opts['memoria']:
+                tracemalloc.start()
+            t0 = time.perf_counter()
+            with tempfile.TemporaryFile() as archivo:
+                resumen = escribir_zip_ple(empresa.id, desde, hasta, archivo, chunk_size=opts['chunk'])
+                tamano = archivo.tell()
+            dt = time.perf_counter() - t0
+            pico = tracemalloc.get_traced_memory()[1] if opts['memoria'] else None
+            tracemalloc.stop()
+
+            for nombre, lineas in resumen.items():
+                self.stdout.write(f"  {nombre}: {lineas} líneas")
+            self.stdout.write(f"  Zip: {tamano / 1024:.0f} KB en {dt:.2f} s ({n / dt:,.0f} líneas/s)")
+            if pico is not None:
+                self.stdout.write(f"  Pico de memoria Python: {pico / 1024 / 1024:.1f} MB")
+            transaction.set_rollback(True)
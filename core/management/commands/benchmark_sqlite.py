@@ -0,0 +1,141 @@
+# core/management/commands/benchmark_sqlite.py
+import datetime
+import decimal
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, transaction
+
+from core.antiguedad import reporte_antiguedad
+from core.igv import resumen_mensual
+from core.models import Comprobante, CuentaEstado, Empresa, Entidad
+
+PERFILES = {'por defecto': '0', 'optimizado': '1'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara SQLite por defecto vs SQLITE_OPTIMIZADO=1: N procesos registran comprobantes mientras otros "
+        "leen los reportes del dashboard sobre el mismo archivo (temporal)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escritores', type=int, default=4)
+        parser.add_argument('--lectores', type=int, default=4)
+        parser.add_argument('--segundos', type=float, default=10)
+        parser.add_argument('--precarga', type=int, default=5000, help="Comprobantes iniciales para que las lecturas pesen.")
+        # Uso interno: cada proceso hijo corre un rol y devuelve su resultado en JSON
+        parser.add_argument('--rol', choices=['preparar', 'escritor', 'lector'], help="(interno)")
+        parser.add_argument('--semilla', type=int, default=0, help="(interno)")
+
+    def handle(self, *args, **opts):
+        if opts['rol']:
+            return self._rol(opts)
+        if settings.DATABASES['default']['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError("Este benchmark es solo para SQLite.")
+
+        for nombre, valor in PERFILES.items():
+            with tempfile.TemporaryDirectory() as carpeta:
+                entorno = {
+                    **os.environ, 'SQLITE_OPTIMIZADO': valor,
+                    'DATABASE_URL': f"sqlite:///{Path(carpeta) / 'bench.sqlite3'}",
+                }
+                self._hijo(entorno, 'preparar', opts)
+                procesos = [self._lanzar(entorno, 'escritor', opts, i) for i in range(opts['escritores'])]
+                procesos += [self._lanzar(entorno, 'lector', opts, i) for i in range(opts['lectores'])]
+                resultados = [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in procesos]
+            self._reportar(nombre, resultados, opts['segundos'])
+
+    # --- Proceso principal ---
+
+    def _argumentos(self, rol, opts, semilla=0):
+        return [
+            sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark_sqlite', '--rol', rol,
+            '--segundos', str(opts['segundos']), '--precarga', str(opts['precarga']), '--semilla', str(semilla),
+        ]
+
+    def _hijo(self, entorno, rol, opts):
+        subprocess.run(self._argumentos(rol, opts), env=entorno, check=True, stdout=subprocess.DEVNULL)
+
+    def _lanzar(self, entorno, rol, opts, semilla):
+        return subprocess.Popen(self._argumentos(rol, opts, semilla), env=entorno, stdout=subprocess.PIPE, text=True)
+
+    def _reportar(self, nombre, resultados, segundos):
+        escrituras = [r for r in resultados if r['rol'] == 'escritor']
+        lecturas = [r for r in resultados if r['rol'] == 'lector']
+        ok = sum(r['ok'] for r in escrituras)
+        bloqueos = sum(r['bloqueos'] for r in escrituras + lecturas)
+        lat = sorted(t for r in escrituras for t in r['ms'])
+        p95 = lat[int(len(lat) * 0.95)] if lat else 0
+        self.stdout.write(
+            f"{nombre:12} | escrituras {ok / segundos:7.1f}/s (p95 {p95:6.1f} ms) | "
+            f"lecturas dashboard {sum(r['ok'] for r in lecturas) / segundos:6.1f}/s | 'database is locked': {bloqueos}"
+        )
+
+    # --- Procesos hijos ---
+
+    def _rol(self, opts):
+        if opts['rol'] == 'preparar':
+            call_command('migrate', verbosity=0)
+            return self._preparar(opts['precarga'])
+        empresa = Empresa.objects.get(ruc='99999999999')
+        fin = time.monotonic() + opts['segundos']
+        trabajo = self._escribir if opts['rol'] == 'escritor' else self._leer
+        ok, bloqueos, tiempos, n = 0, 0, [], 0
+        while time.monotonic() < fin:
+            t0 = time.perf_counter()
+            try:
+                trabajo(empresa, opts['semilla'], n)
+            except OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                bloqueos += 1
+            else:
+                ok += 1
+                tiempos.append((time.perf_counter() - t0) * 1000)
+            n += 1
+        self.stdout.write(json.dumps({'rol': opts['rol'], 'ok': ok, 'bloqueos': bloqueos, 'ms': tiempos}))
+
+    def _preparar(self, precarga):
+        empresa = Empresa.objects.create(nombre='BENCHMARK', ruc='99999999999')
+        entidad = Entidad.objects.create(
+            empresa=empresa, tipo_entidad='Cliente', tipo_documento='RUC',
+            numero_documento='20000000000', nombre_razon_social='CLIENTE BENCHMARK'
+        )
+        hoy = datetime.date.today()
+        Comprobante.objects.bulk_create([
+            Comprobante(
+                empresa=empresa, entidad=entidad, tipo_documento='Factura', operacion='Venta' if i % 3 else 'Compra',
+                serie='F001', numero=f"P{i}", fecha_emision=hoy - datetime.timedelta(days=i % 365),
+                moneda='PEN', tipo_cambio=decimal.Decimal('1.000'), subtotal=decimal.Decimal('100.00'),
+                igv=decimal.Decimal('18.00'), total=decimal.Decimal('118.00'),
+            ) for i in range(precarga)
+        ], batch_size=1000)
+
+    @staticmethod
+    def _escribir(empresa, semilla, n):
+        with transaction.atomic():
+            entidad = Entidad.objects.filter(empresa=empresa).first()
+            comprobante = Comprobante.objects.create(
+                empresa=empresa, entidad=entidad, tipo_documento='Factura', operacion='Venta',
+                serie=f"B{semilla:03d}", numero=str(n), fecha_emision=datetime.date.today(),
+                moneda='PEN', tipo_cambio=decimal.Decimal('1.000'), subtotal=decimal.Decimal('100.00'),
+                igv=decimal.Decimal('18.00'), total=decimal.Decimal('118.00'),
+            )
+            CuentaEstado.objects.create(
+                comprobante=comprobante, monto_total=comprobante.total, saldo_pendiente=comprobante.total,
+                fecha_vencimiento=comprobante.fecha_emision + datetime.timedelta(days=30)
+            )
+
+    @staticmethod
+    def _leer(empresa, semilla, n):
+        resumen_mensual(empresa.id)
+        reporte_antiguedad(empresa.id)
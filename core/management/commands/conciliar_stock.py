@@ -0,0 +1,25 @@
+# core/management/commands/conciliar_stock.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.inventario import conciliar_stock, diferencias_stock
+
+
+class Command(BaseCommand):
+    help = "Compara Producto.stock_actual con el libro MovimientoStock y lo reconstruye desde el libro."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help="Solo esta empresa (por defecto, todas).")
+        parser.add_argument('--revisar', action='store_true', help="Solo listar las diferencias, sin corregir.")
+
+    def handle(self, *args, **opts):
+        if opts['revisar']:
+            filas = diferencias_stock(opts['empresa'])
+        else:
+            with transaction.atomic():
+                filas = conciliar_stock(opts['empresa'])
+
+        for producto_id, stock, libro in filas:
+            self.stdout.write(f"  Producto {producto_id}: stock_actual {stock} | libro {libro}")
+        accion = "con diferencias" if opts['revisar'] else "corregidos"
+        self.stdout.write(f"{len(filas)} productos {accion}.")
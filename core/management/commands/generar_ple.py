@@ -0,0 +1,31 @@
+# core/management/commands/generar_ple.py
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Empresa
+from core.ple import escribir_zip_ple
+from core.registros import rango_periodo
+
+
+class Command(BaseCommand):
+    help = "Genera el zip con los libros PLE 8.1 (Compras) y 14.1 (Ventas) de una empresa para un periodo."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, required=True)
+        parser.add_argument('--periodo', required=True, help="AAAA-MM")
+        parser.add_argument('--salida', default='.', help="Carpeta donde dejar el zip.")
+
+    def handle(self, *args, **opts):
+        try:
+            desde, hasta = rango_periodo(opts['periodo'])
+        except ValueError:
+            raise CommandError("Periodo inválido (use AAAA-MM).")
+        if not Empresa.objects.filter(id=opts['empresa']).exists():
+            raise CommandError(f"No existe la empresa {opts['empresa']}.")
+
+        ruta = os.path.join(opts['salida'], f"PLE_{opts['empresa']}_{desde:%Y%m}.zip")
+        resumen = escribir_zip_ple(opts['empresa'], desde, hasta, ruta)
+        for nombre, lineas in resumen.items():
+            self.stdout.write(f"  {nombre}: {lineas} líneas")
+        self.stdout.write(self.style.SUCCESS(f"Zip generado: {ruta}"))
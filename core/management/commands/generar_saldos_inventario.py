@@ -0,0 +1,35 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Empresa
+from core.saldos import generar_saldos
+
+
+class Command(BaseCommand):
+    help = "Genera las fotos mensuales de stock y costo (SaldoInventarioMensual) desde el libro de movimientos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help="Solo esta empresa (por defecto, todas).")
+        parser.add_argument('--desde', help="Primer periodo AAAA-MM (por defecto, el mes anterior).")
+        parser.add_argument('--hasta', help="Último periodo AAAA-MM (por defecto, igual a --desde).")
+
+    def handle(self, *args, **opts):
+        anterior = timezone.localdate().replace(day=1) - datetime.timedelta(days=1)
+        desde = opts['desde'] or f"{anterior:%Y-%m}"
+        hasta = opts['hasta'] or desde
+        if hasta < desde:
+            raise CommandError("--hasta no puede ser anterior a --desde.")
+
+        empresas = [opts['empresa']] if opts['empresa'] else Empresa.objects.values_list('id', flat=True)
+        for emp_id in empresas:
+            t0 = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    filas = generar_saldos(emp_id, desde, hasta)
+            except ValueError:
+                raise CommandError("Periodo inválido: use AAAA-MM.")
+            self.stdout.write(f"Empresa {emp_id}: {filas} saldos de {desde} a {hasta} en {time.perf_counter() - t0:.1f} s")
@@ -0,0 +1,24 @@
+# core/management/commands/recalcular_costos.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.saldos import recalcular_costos, valorizacion_almacen
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el costo promedio ponderado y el valor del inventario desde el libro de movimientos (MovimientoStock)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help="Solo esta empresa (por defecto, todas).")
+
+    def handle(self, *args, **opts):
+        t0 = time.perf_counter()
+        with transaction.atomic():
+            total = recalcular_costos(emp_id=opts['empresa'])
+        self.stdout.write(f"Recalculados {total} productos en {time.perf_counter() - t0:.1f} s")
+
+        if opts['empresa']:
+            reporte = valorizacion_almacen(opts['empresa'])
+            self.stdout.write(f"  Inventario valorizado: S/ {reporte['total']:,.2f} ({len(reporte['filas'])} productos)")
@@ -0,0 +1,26 @@
+# core/management/commands/reindexar_busqueda.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.busqueda import buscar, reindexar
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de búsqueda global (tras cargas masivas con bulk_create, que no disparan señales)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help="Solo esta empresa (por defecto, todas).")
+        parser.add_argument('--probar', help="Consulta de prueba para medir el tiempo de búsqueda al terminar.")
+
+    def handle(self, *args, **opts):
+        t0 = time.perf_counter()
+        with transaction.atomic():
+            total = reindexar(empresa_id=opts['empresa'])
+        self.stdout.write(f"Indexados {total} objetos en {time.perf_counter() - t0:.1f} s")
+
+        if opts['probar'] and opts['empresa']:
+            t0 = time.perf_counter()
+            resultados = buscar(opts['empresa'], opts['probar'])
+            self.stdout.write(f"  '{opts['probar']}': {len(resultados)} resultados en {(time.perf_counter() - t0) * 1000:.1f} ms")
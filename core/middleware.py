@@ -1,41 +1,101 @@
 # core/middleware.py
-import threading
+import logging
+
+from django.conf import settings
 from django.shortcuts import redirect
 from django.urls import reverse
 
-# --- LÓGICA PARA EL MONITOR GLOBAL ---
-_thread_locals = threading.local()
+from . import auditoria
+from .contexto import actuando_como
+from .empresa_activa import obtener_empresa, puede_usar
+from .replicas import marcar_escritura, replica_disponible
 
-def get_current_user():
-    return getattr(_thread_locals, 'user', None)
+logger = logging.getLogger(__name__)
 
+# --- LÓGICA PARA EL MONITOR GLOBAL ---
 class AuditoriaMiddleware:
+    """
+    Deja al usuario y la empresa del request como "actuales" para las señales (core/contexto.py) y los
+    suelta al terminar. Va después de EmpresaContextMiddleware para tener request.empresa.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Las entradas del log se acumulan y se escriben juntas al terminar el request (core/auditoria.py)
+        with actuando_como(request.user, getattr(request, 'empresa', None)), auditoria.agrupando():
+            response = self.get_response(request)
+        return response
+
+class ReplicaMiddleware:
+    """Tras un POST/PUT/DELETE la sesión lee del primario un momento (lee lo que acaba de escribir)."""
+    METODOS_SEGUROS = {'GET', 'HEAD', 'OPTIONS', 'TRACE'}
+
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        _thread_locals.user = request.user
         response = self.get_response(request)
+        if request.method not in self.METODOS_SEGUROS and replica_disponible() and request.user.is_authenticated:
+            marcar_escritura(request)
         return response
 
-# --- TU LÓGICA DE SELECCIÓN DE EMPRESA (MANTENIDA) ---
+class MetricasSesionMiddleware:
+    """
+    Bytes y tiempo de lectura/escritura de la sesión por request (core/sesiones.py), en la cabecera
+    Server-Timing y en el log. Va antes de SessionMiddleware para ver la sesión ya guardada.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.alerta_bytes = getattr(settings, 'SESION_ALERTA_BYTES', 16 * 1024)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        metricas = getattr(getattr(request, 'session', None), 'metricas', None)
+        if not metricas or not request.session.accessed:
+            return response
+
+        response.headers['Server-Timing'] = (
+            f'sesion-lectura;dur={metricas["lectura_ms"]:.2f};desc="{metricas["lectura_bytes"]} B", '
+            f'sesion-escritura;dur={metricas["escritura_ms"]:.2f};desc="{metricas["escritura_bytes"]} B"'
+        )
+        logger.debug(
+            "sesion %s lectura %d B %.2f ms escritura %d B %.2f ms", request.path,
+            metricas['lectura_bytes'], metricas['lectura_ms'], metricas['escritura_bytes'], metricas['escritura_ms']
+        )
+        if max(metricas['lectura_bytes'], metricas['escritura_bytes']) > self.alerta_bytes:
+            pesadas = list(request.session.tamanos_por_clave().items())[:3]
+            logger.warning("sesion %s pesa %d B; claves más grandes: %s", request.path,
+                           max(metricas['lectura_bytes'], metricas['escritura_bytes']), pesadas)
+        return response
+
+# --- EMPRESA ACTIVA (request.empresa) ---
 class EmpresaContextMiddleware:
+    """
+    Resuelve una vez por request la empresa de la sesión y la deja en request.empresa (desde el cache,
+    ver core/empresa_activa.py). Si el usuario no tiene permiso sobre esa empresa, se quita de la sesión.
+    Sin empresa válida, los usuarios autenticados van a seleccionar_empresa salvo en las rutas exentas.
+    """
     def __init__(self, get_response):
         self.get_response = get_response
+        # Se calculan una sola vez al arrancar el worker. seleccionar_empresa es '/': va aparte,
+        # como prefijo dejaría pasar cualquier ruta
+        self.exempt_exactas = {reverse('seleccionar_empresa')}
+        self.exempt_prefijos = (reverse('admin:index'), '/login/', '/logout/', '/static/', reverse('salud'))
 
     def __call__(self, request):
-        exempt_urls = [
-            reverse('admin:index'),
-            reverse('seleccionar_empresa'),
-            '/login/',
-            '/logout/',
-            '/static/',
-        ]
+        request.empresa = None
 
         if request.user.is_authenticated:
-            if not request.session.get('empresa_id') and request.path not in exempt_urls:
-                if not any(request.path.startswith(url) for url in exempt_urls):
+            emp_id = request.session.get('empresa_id')
+            if emp_id and puede_usar(request.user, emp_id):
+                request.empresa = obtener_empresa(emp_id)
+            if request.empresa is None:
+                if emp_id:
+                    request.session.pop('empresa_id', None)
+                    request.session.pop('empresa_nombre', None)
+                if request.path not in self.exempt_exactas and not request.path.startswith(self.exempt_prefijos):
                     return redirect('seleccionar_empresa')
 
         response = self.get_response(request)
-        return response
\ No newline at end of file
+        return response
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 17:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_cuota_saldo_cuota'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cuota',
+            name='monto_capital',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='cuota',
+            name='monto_interes',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_cuota_monto_capital_cuota_monto_interes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cuota',
+            index=models.Index(condition=models.Q(('pagada', False)), fields=['fecha_vencimiento', 'id'], name='cuota_pendiente_venc_idx'),
+        ),
+    ]
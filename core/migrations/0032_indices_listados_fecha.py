@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_cuota_pendiente_venc_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comprobante',
+            index=models.Index(fields=['empresa', '-fecha_emision', '-id'], name='comprobante_emp_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cotizacion',
+            index=models.Index(fields=['empresa', '-fecha', '-id'], name='cotizacion_emp_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gastooperativo',
+            index=models.Index(fields=['empresa', '-fecha', '-id'], name='gasto_emp_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logauditoria',
+            index=models.Index(fields=['empresa', '-fecha_hora', '-id_log'], name='log_emp_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientofinanciero',
+            index=models.Index(fields=['empresa', '-fecha', '-id'], name='movimiento_emp_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['empresa', '-fecha', '-id'], name='notificacion_emp_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Índice de texto completo sobre core_indicebusqueda según el motor:
+#   SQLite: tabla FTS5 de contenido externo + triggers que la mantienen al día
+#   PostgreSQL: índice GIN sobre to_tsvector('simple', texto)
+SQLITE_CREAR = [
+    """CREATE VIRTUAL TABLE core_busqueda_fts USING fts5(
+        empresa_id, texto, content='core_indicebusqueda', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER core_busqueda_ai AFTER INSERT ON core_indicebusqueda BEGIN
+        INSERT INTO core_busqueda_fts(rowid, empresa_id, texto) VALUES (new.id, new.empresa_id, new.texto);
+    END""",
+    """CREATE TRIGGER core_busqueda_ad AFTER DELETE ON core_indicebusqueda BEGIN
+        INSERT INTO core_busqueda_fts(core_busqueda_fts, rowid, empresa_id, texto)
+        VALUES ('delete', old.id, old.empresa_id, old.texto);
+    END""",
+    """CREATE TRIGGER core_busqueda_au AFTER UPDATE ON core_indicebusqueda BEGIN
+        INSERT INTO core_busqueda_fts(core_busqueda_fts, rowid, empresa_id, texto)
+        VALUES ('delete', old.id, old.empresa_id, old.texto);
+        INSERT INTO core_busqueda_fts(rowid, empresa_id, texto) VALUES (new.id, new.empresa_id, new.texto);
+    END""",
+]
+SQLITE_BORRAR = [
+    "DROP TRIGGER IF EXISTS core_busqueda_ai",
+    "DROP TRIGGER IF EXISTS core_busqueda_ad",
+    "DROP TRIGGER IF EXISTS core_busqueda_au",
+    "DROP TABLE IF EXISTS core_busqueda_fts",
+]
+POSTGRES_CREAR = [
+    "CREATE INDEX core_busqueda_tsv_idx ON core_indicebusqueda USING GIN (to_tsvector('simple', texto))",
+]
+POSTGRES_BORRAR = ["DROP INDEX IF EXISTS core_busqueda_tsv_idx"]
+
+
+def _ejecutar(schema_editor, por_motor):
+    for sql in por_motor.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def crear_indice_texto(apps, schema_editor):
+    _ejecutar(schema_editor, {'sqlite': SQLITE_CREAR, 'postgresql': POSTGRES_CREAR})
+
+
+def borrar_indice_texto(apps, schema_editor):
+    _ejecutar(schema_editor, {'sqlite': SQLITE_BORRAR, 'postgresql': POSTGRES_BORRAR})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_indices_listados_fecha'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndiceBusqueda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=20)),
+                ('objeto_id', models.IntegerField()),
+                ('titulo', models.CharField(max_length=255)),
+                ('detalle', models.CharField(blank=True, max_length=255)),
+                ('texto', models.TextField()),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.empresa')),
+            ],
+            options={
+                'unique_together': {('tipo', 'objeto_id')},
+            },
+        ),
+        migrations.RunPython(crear_indice_texto, borrar_indice_texto),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:22
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def costo_inicial(apps, schema_editor):
+    # Punto de partida: el último precio de compra. `manage.py recalcular_costos` lo rehace desde el historial.
+    Producto = apps.get_model('core', 'Producto')
+    Producto.objects.update(costo_promedio=F('precio_compra_referencial'))
+    Producto.objects.filter(stock_actual__gt=0).update(valor_inventario=F('stock_actual') * F('precio_compra_referencial'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0033_indice_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='costo_promedio',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='valor_inventario',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.RunPython(costo_inicial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+LOTE = 2000
+
+
+def poblar_libro(apps, schema_editor):
+    """
+    Pasa el historial existente (detalles de comprobantes y ajustes) al libro de movimientos y agrega
+    un SALDO_INICIAL por producto con la diferencia no documentada (ej. devoluciones), de modo que
+    la suma del libro coincida con stock_actual desde el primer día.
+    """
+    Producto = apps.get_model('core', 'Producto')
+    ComprobanteDetalle = apps.get_model('core', 'ComprobanteDetalle')
+    AjusteStock = apps.get_model('core', 'AjusteStock')
+    MovimientoStock = apps.get_model('core', 'MovimientoStock')
+
+    sumas, primeras, filas = {}, {}, []
+
+    def agregar(producto_id, empresa_id, fecha, **campos):
+        sumas[producto_id] = sumas.get(producto_id, 0) + campos['cantidad']
+        primeras[producto_id] = min(primeras.get(producto_id, fecha), fecha)
+        filas.append(MovimientoStock(producto_id=producto_id, empresa_id=empresa_id, fecha=fecha, **campos))
+        if len(filas) >= LOTE:
+            MovimientoStock.objects.bulk_create(filas)
+            filas.clear()
+
+    detalles = ComprobanteDetalle.objects.filter(producto__isnull=False).order_by('id').values_list(
+        'producto_id', 'comprobante__empresa_id', 'comprobante__fecha_emision', 'comprobante_id',
+        'comprobante__operacion', 'comprobante__serie', 'comprobante__numero', 'cantidad'
+    )
+    for producto_id, empresa_id, fecha, comprobante_id, operacion, serie, numero, cantidad in detalles.iterator(chunk_size=LOTE):
+        compra = operacion == 'Compra'
+        agregar(
+            producto_id, empresa_id, fecha, origen='COMPRA' if compra else 'VENTA',
+            cantidad=cantidad if compra else -cantidad, comprobante_id=comprobante_id, referencia=f"{serie}-{numero}"
+        )
+
+    ajustes = AjusteStock.objects.order_by('id').values_list('id', 'producto_id', 'empresa_id', 'fecha', 'tipo', 'cantidad', 'motivo')
+    for ajuste_id, producto_id, empresa_id, fecha, tipo, cantidad, motivo in ajustes.iterator(chunk_size=LOTE):
+        agregar(
+            producto_id, empresa_id, timezone.localdate(fecha), origen='AJUSTE',
+            cantidad=cantidad if tipo == 'Ingreso' else -cantidad, ajuste_id=ajuste_id, referencia=motivo[:255]
+        )
+
+    hoy = timezone.localdate()
+    for producto_id, empresa_id, stock in Producto.objects.values_list('id', 'empresa_id', 'stock_actual').iterator(chunk_size=LOTE):
+        diferencia = stock - sumas.get(producto_id, 0)
+        if diferencia:
+            agregar(
+                producto_id, empresa_id, primeras.get(producto_id, hoy), origen='SALDO_INICIAL',
+                cantidad=diferencia, referencia='Diferencia no documentada al crear el libro'
+            )
+    MovimientoStock.objects.bulk_create(filas)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0034_producto_costo_promedio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('origen', models.CharField(choices=[('SALDO_INICIAL', 'Saldo Inicial'), ('COMPRA', 'Compra'), ('VENTA', 'Venta'), ('AJUSTE', 'Ajuste Manual'), ('DEVOLUCION', 'Devolución de Cliente'), ('ANULA_COMPRA', 'Reversión de Compra'), ('ANULA_VENTA', 'Reversión de Venta')], max_length=15)),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('costo_unitario', models.DecimalField(decimal_places=4, default=0, max_digits=14)),
+                ('referencia', models.CharField(blank=True, default='', max_length=255)),
+                ('ajuste', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.ajustestock')),
+                ('comprobante', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.comprobante')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.empresa')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos_stock', to='core.producto')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Stock',
+                'verbose_name_plural': 'Movimientos de Stock',
+                'indexes': [models.Index(fields=['producto', 'fecha', 'id'], name='movstock_prod_fecha_idx'), models.Index(fields=['empresa', 'fecha'], name='movstock_emp_fecha_idx')],
+            },
+        ),
+        migrations.RunPython(poblar_libro, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0035_movimiento_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoInventarioMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.CharField(max_length=7)),
+                ('fecha_corte', models.DateField()),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('costo_promedio', models.DecimalField(decimal_places=4, max_digits=14)),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.empresa')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos_mensuales', to='core.producto')),
+            ],
+            options={
+                'verbose_name': 'Saldo de Inventario Mensual',
+                'verbose_name_plural': 'Saldos de Inventario Mensuales',
+                'indexes': [models.Index(fields=['empresa', 'fecha_corte'], name='saldoinv_emp_corte_idx')],
+                'unique_together': {('producto', 'fecha_corte')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:38
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def contar_no_leidas(apps, schema_editor):
+    Empresa = apps.get_model('core', 'Empresa')
+    conteos = Empresa.objects.annotate(n=Count('notificacion', filter=Q(notificacion__leida=False)))
+    for empresa_id, n in conteos.values_list('id', 'n'):
+        if n:
+            Empresa.objects.filter(id=empresa_id).update(notificaciones_no_leidas=n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0036_saldo_inventario_mensual'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empresa',
+            name='notificaciones_no_leidas',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(contar_no_leidas, migrations.RunPython.noop),
+    ]
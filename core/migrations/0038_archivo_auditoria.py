@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0037_notificaciones_no_leidas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoAuditoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.CharField(max_length=7)),
+                ('archivo', models.FileField(upload_to='auditoria/')),
+                ('filas', models.PositiveIntegerField(default=0)),
+                ('fecha_archivo', models.DateTimeField(auto_now=True)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.empresa')),
+            ],
+            options={
+                'verbose_name': 'Archivo de Auditoría',
+                'verbose_name_plural': 'Archivos de Auditoría',
+                'ordering': ['-periodo'],
+                'unique_together': {('empresa', 'periodo')},
+            },
+        ),
+    ]
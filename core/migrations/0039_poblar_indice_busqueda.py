@@ -0,0 +1,83 @@
+import unicodedata
+
+from django.db import migrations
+
+LOTE = 2000
+MODELOS = ('Comprobante', 'Entidad', 'Producto', 'Cotizacion', 'MovimientoFinanciero')
+
+
+# Copia de core/busqueda.py tal como estaba al crear el índice: la migración no depende del código vivo
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', str(texto or '')).encode('ascii', 'ignore').decode()
+    return texto.lower()
+
+
+def documento(instancia):
+    """(empresa_id, tipo, titulo, detalle, texto) del objeto histórico."""
+    modelo = instancia._meta.model_name
+    if modelo == 'comprobante':
+        codigo = f"{instancia.serie}-{instancia.numero}"
+        entidad = instancia.entidad
+        return (
+            instancia.empresa_id, 'comprobante', codigo,
+            f"{instancia.operacion} • {entidad.nombre_razon_social} • {instancia.moneda} {instancia.total}",
+            f"{codigo} {instancia.serie}{instancia.numero} {entidad.nombre_razon_social} {entidad.numero_documento}",
+        )
+    if modelo == 'entidad':
+        return (
+            instancia.empresa_id, 'entidad', instancia.nombre_razon_social,
+            f"{instancia.tipo_documento} {instancia.numero_documento}",
+            f"{instancia.nombre_razon_social} {instancia.numero_documento}",
+        )
+    if modelo == 'producto':
+        alias = ' '.join(str(a) for a in (instancia.nombres_alternativos or []))
+        return (
+            instancia.empresa_id, 'producto', instancia.nombre_interno, f"SKU {instancia.sku}",
+            f"{instancia.nombre_interno} {instancia.sku} {alias}",
+        )
+    if modelo == 'cotizacion':
+        return (
+            instancia.empresa_id, 'cotizacion', instancia.numero,
+            f"{instancia.nombre_cliente} • {instancia.moneda} {instancia.total}",
+            f"{instancia.numero} {instancia.nombre_cliente} {instancia.ruc_dni_cliente}",
+        )
+    return (
+        instancia.empresa_id, 'movimiento', instancia.referencia[:255],
+        f"{instancia.tipo} • {instancia.moneda} {instancia.monto}",
+        instancia.referencia,
+    )
+
+
+def poblar_indice(apps, schema_editor):
+    """
+    Indexa lo que ya existía al crear el índice (0033 solo creó la tabla y los triggers). Los objetos
+    indexados después por las señales se conservan: ignore_conflicts sobre (tipo, objeto_id).
+    """
+    IndiceBusqueda = apps.get_model('core', 'IndiceBusqueda')
+    for nombre in MODELOS:
+        qs = apps.get_model('core', nombre).objects.order_by('pk')
+        if nombre == 'Comprobante':
+            qs = qs.select_related('entidad')
+        filas = []
+        for obj in qs.iterator(chunk_size=LOTE):
+            empresa_id, tipo, titulo, detalle, texto = documento(obj)
+            filas.append(IndiceBusqueda(
+                empresa_id=empresa_id, tipo=tipo, objeto_id=obj.pk,
+                titulo=titulo[:255], detalle=detalle[:255], texto=normalizar(texto)
+            ))
+            if len(filas) >= LOTE:
+                IndiceBusqueda.objects.bulk_create(filas, ignore_conflicts=True)
+                filas = []
+        IndiceBusqueda.objects.bulk_create(filas, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0038_archivo_auditoria'),
+    ]
+
+    operations = [
+        migrations.RunPython(poblar_indice, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,153 @@
+import decimal
+
+from django.db import migrations, models
+
+LOTE = 2000
+CERO = decimal.Decimal('0.00')
+CENTIMO = decimal.Decimal('0.01')
+DIEZMILESIMO = decimal.Decimal('0.0001')
+
+
+# Copia de las reglas del costo promedio (core/costeo.py e inventario.aplicar_movimiento) tal como estaban
+# al crear la migración: lo que hace no cambia con el código vivo
+
+def factor_pen(moneda, tipo_cambio):
+    return decimal.Decimal(tipo_cambio) if moneda != 'PEN' else decimal.Decimal('1')
+
+
+class Estado:
+    """Stock, costo promedio y valor de un producto mientras se repite su libro."""
+
+    def __init__(self):
+        self.stock = CERO
+        self.costo = CERO
+        self.valor = CERO
+
+    def _promediar(self):
+        if self.stock > 0:
+            self.costo = (self.valor / self.stock).quantize(DIEZMILESIMO)
+
+    def aplicar(self, origen, cantidad, costo_unitario):
+        """Aplica una fila del libro y devuelve el costo unitario usado."""
+        if origen == 'COSTO_ADICIONAL':
+            # Sin existencias el flete no se capitaliza
+            if self.stock > 0:
+                self.valor = (self.valor + costo_unitario).quantize(CENTIMO)
+                self._promediar()
+            return costo_unitario
+        if origen == 'ANULA_COMPRA':
+            # Retira el valor original de la compra
+            self.stock += cantidad
+            if self.stock > 0:
+                self.valor = max(self.valor + cantidad * costo_unitario, CERO).quantize(CENTIMO)
+                self._promediar()
+            else:
+                self.valor = CERO
+            return costo_unitario
+        if cantidad > 0:
+            costo = costo_unitario if origen in ('COMPRA', 'SALDO_INICIAL') else self.costo
+            if self.stock <= 0:
+                # Sin existencias el costo arranca de nuevo
+                self.stock += cantidad
+                self.valor = (max(self.stock, CERO) * costo).quantize(CENTIMO)
+                self.costo = costo.quantize(DIEZMILESIMO)
+            else:
+                self.stock += cantidad
+                self.valor = (self.valor + cantidad * costo).quantize(CENTIMO)
+                self._promediar()
+            return costo
+        # Salida al costo promedio vigente
+        costo = self.costo
+        self.stock += cantidad
+        self.valor = (self.valor + (cantidad * costo).quantize(CENTIMO)) if self.stock > 0 else CERO
+        return costo
+
+
+def completar_costos(apps, schema_editor):
+    """
+    Deja el libro listo para valorizar a una fecha (core/saldos.py):
+
+    1. Un COSTO_ADICIONAL por cada flete ya registrado y línea de su compra, prorrateado por el valor
+       de la línea como lo hacía registrar_flete, con la fecha del flete.
+    2. El costo unitario de las filas que 0035 pasó al libro sin costo: las compras con el precio de su
+       línea en soles y el resto con el promedio que resulta de repetir el libro en orden (fecha, id).
+       Los saldos iniciales sin costo toman el promedio de ese momento o, sin existencias, el vigente.
+    3. Se borran las fotos mensuales, calculadas con el costo de los documentos: se vuelven a generar
+       con manage.py generar_saldos_inventario.
+    """
+    Comprobante = apps.get_model('core', 'Comprobante')
+    ComprobanteDetalle = apps.get_model('core', 'ComprobanteDetalle')
+    MovimientoStock = apps.get_model('core', 'MovimientoStock')
+    Producto = apps.get_model('core', 'Producto')
+    SaldoInventarioMensual = apps.get_model('core', 'SaldoInventarioMensual')
+
+    fletes = Comprobante.objects.filter(es_flete=True, comprobante_asociado__isnull=False).exclude(
+        movimientostock__origen='COSTO_ADICIONAL'
+    ).select_related('comprobante_asociado')
+    filas = []
+    for flete in fletes.iterator(chunk_size=LOTE):
+        compra = flete.comprobante_asociado
+        if not compra.subtotal:
+            continue
+        base = flete.subtotal * factor_pen(flete.moneda, flete.tipo_cambio)
+        detalles = ComprobanteDetalle.objects.filter(comprobante=compra, producto__isnull=False).order_by('id')
+        for producto_id, subtotal_linea in detalles.values_list('producto_id', 'subtotal_linea'):
+            filas.append(MovimientoStock(
+                empresa_id=flete.empresa_id, producto_id=producto_id, fecha=flete.fecha_emision,
+                origen='COSTO_ADICIONAL', cantidad=CERO, comprobante_id=flete.pk,
+                costo_unitario=(base * subtotal_linea / compra.subtotal).quantize(DIEZMILESIMO),
+                referencia=f"Flete {flete.serie}-{flete.numero}"[:255],
+            ))
+        if len(filas) >= LOTE:
+            MovimientoStock.objects.bulk_create(filas)
+            filas = []
+    MovimientoStock.objects.bulk_create(filas)
+
+    # Costo en soles de cada línea de compra, en el orden en que 0035 creó sus filas
+    precios = {}
+    lineas = ComprobanteDetalle.objects.filter(producto__isnull=False, comprobante__operacion='Compra').order_by('id')
+    for comprobante_id, producto_id, precio, moneda, tc in lineas.values_list(
+        'comprobante_id', 'producto_id', 'precio_unitario', 'comprobante__moneda', 'comprobante__tipo_cambio'
+    ).iterator(chunk_size=LOTE):
+        precios.setdefault((comprobante_id, producto_id), []).append(precio * factor_pen(moneda, tc))
+
+    vigentes = dict(Producto.objects.values_list('id', 'costo_promedio'))
+    movimientos = MovimientoStock.objects.order_by('producto_id', 'fecha', 'id').only(
+        'id', 'producto_id', 'origen', 'cantidad', 'costo_unitario', 'comprobante_id'
+    )
+    cambios, producto_actual, estado = [], None, None
+    for mov in movimientos.iterator(chunk_size=LOTE):
+        if mov.producto_id != producto_actual:
+            producto_actual, estado = mov.producto_id, Estado()
+        sin_costo = not mov.costo_unitario
+        costo = mov.costo_unitario
+        if sin_costo and mov.origen == 'COMPRA' and precios.get((mov.comprobante_id, mov.producto_id)):
+            costo = precios[mov.comprobante_id, mov.producto_id].pop(0)
+        elif sin_costo and mov.origen == 'SALDO_INICIAL':
+            costo = estado.costo if estado.stock > 0 else vigentes.get(mov.producto_id, CERO)
+        usado = estado.aplicar(mov.origen, mov.cantidad, costo)
+        if sin_costo and usado:
+            mov.costo_unitario = usado.quantize(DIEZMILESIMO)
+            cambios.append(mov)
+        if len(cambios) >= LOTE:
+            MovimientoStock.objects.bulk_update(cambios, ['costo_unitario'])
+            cambios = []
+    MovimientoStock.objects.bulk_update(cambios, ['costo_unitario'])
+
+    SaldoInventarioMensual.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0039_poblar_indice_busqueda'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movimientostock',
+            name='origen',
+            field=models.CharField(choices=[('SALDO_INICIAL', 'Saldo Inicial'), ('COMPRA', 'Compra'), ('VENTA', 'Venta'), ('AJUSTE', 'Ajuste Manual'), ('DEVOLUCION', 'Devolución de Cliente'), ('ANULA_COMPRA', 'Reversión de Compra'), ('ANULA_VENTA', 'Reversión de Venta'), ('COSTO_ADICIONAL', 'Costo Adicional (flete)')], max_length=15),
+        ),
+        migrations.RunPython(completar_costos, migrations.RunPython.noop),
+    ]
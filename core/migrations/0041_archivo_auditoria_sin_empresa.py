@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0040_libro_costos'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivoauditoria',
+            name='empresa',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.empresa'),
+        ),
+    ]
@@ -14,6 +14,8 @@ class Empresa(models.Model):
     direccion = models.TextField(null=True, blank=True)
     telefono = models.CharField(max_length=20, null=True, blank=True)
     correo = models.EmailField(null=True, blank=True)
+    # Contador desnormalizado de la campanita: lo mantienen crear_notificacion_interna y marcar_leidas (core/services.py)
+    notificaciones_no_leidas = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.nombre
@@ -102,6 +104,9 @@ class Producto(models.Model):
     stock_actual = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     precio_compra_referencial = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
     precio_venta_referencial = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    # Kardex valorizado (core/costeo.py): costo promedio ponderado en S/ y valor de las existencias
+    costo_promedio = models.DecimalField(max_digits=14, decimal_places=4, default=0)
+    valor_inventario = models.DecimalField(max_digits=14, decimal_places=2, default=0)
 
     def __str__(self): return self.nombre_interno
 
@@ -152,6 +157,9 @@ class Comprobante(models.Model):
     es_flete = models.BooleanField(default=False)
     comprobante_asociado = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['empresa', '-fecha_emision', '-id'], name='comprobante_emp_fecha_idx')]
+
     @property
     def codigo_factura(self):
         return f"{self.serie}-{self.numero}"
@@ -169,6 +177,72 @@ class ComprobanteDetalle(models.Model):
     subtotal_linea = models.DecimalField(max_digits=12, decimal_places=2)
 
 
+class MovimientoStock(models.Model):
+    """
+    Libro de movimientos de stock (solo inserción): una fila por cada cambio de Producto.stock_actual.
+    Se escribe únicamente desde core/inventario.py; las correcciones son filas nuevas, nunca ediciones.
+    """
+    ORIGEN_CHOICES = [
+        ('SALDO_INICIAL', 'Saldo Inicial'),
+        ('COMPRA', 'Compra'),
+        ('VENTA', 'Venta'),
+        ('AJUSTE', 'Ajuste Manual'),
+        ('DEVOLUCION', 'Devolución de Cliente'),
+        ('ANULA_COMPRA', 'Reversión de Compra'),
+        ('ANULA_VENTA', 'Reversión de Venta'),
+        ('COSTO_ADICIONAL', 'Costo Adicional (flete)'),
+    ]
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='movimientos_stock')
+    fecha = models.DateField() # Fecha del documento (o del ajuste)
+    creado = models.DateTimeField(auto_now_add=True)
+    origen = models.CharField(max_length=15, choices=ORIGEN_CHOICES)
+    cantidad = models.DecimalField(max_digits=12, decimal_places=2) # Con signo: + entra, - sale
+    costo_unitario = models.DecimalField(max_digits=14, decimal_places=4, default=0) # S/ por unidad (en COSTO_ADICIONAL, el monto total)
+    comprobante = models.ForeignKey(Comprobante, on_delete=models.SET_NULL, null=True, blank=True)
+    ajuste = models.ForeignKey(AjusteStock, on_delete=models.SET_NULL, null=True, blank=True)
+    referencia = models.CharField(max_length=255, blank=True, default='')
+
+    class Meta:
+        verbose_name = "Movimiento de Stock"
+        verbose_name_plural = "Movimientos de Stock"
+        indexes = [
+            models.Index(fields=['producto', 'fecha', 'id'], name='movstock_prod_fecha_idx'),
+            models.Index(fields=['empresa', 'fecha'], name='movstock_emp_fecha_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValueError("MovimientoStock es de solo inserción: registre un movimiento nuevo.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("MovimientoStock es de solo inserción: registre un movimiento nuevo.")
+
+    def __str__(self):
+        return f"{self.get_origen_display()} {self.producto_id}: {self.cantidad}"
+
+
+class SaldoInventarioMensual(models.Model):
+    """Foto del inventario al cierre de cada mes (manage.py generar_saldos_inventario)."""
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='saldos_mensuales')
+    periodo = models.CharField(max_length=7) # Ej: 2025-12
+    fecha_corte = models.DateField() # Último día del periodo
+    cantidad = models.DecimalField(max_digits=12, decimal_places=2)
+    costo_promedio = models.DecimalField(max_digits=14, decimal_places=4) # S/
+    valor = models.DecimalField(max_digits=14, decimal_places=2) # S/
+
+    class Meta:
+        unique_together = ('producto', 'fecha_corte')
+        indexes = [models.Index(fields=['empresa', 'fecha_corte'], name='saldoinv_emp_corte_idx')]
+        verbose_name = "Saldo de Inventario Mensual"
+        verbose_name_plural = "Saldos de Inventario Mensuales"
+
+    def __str__(self):
+        return f"{self.periodo} - {self.producto_id}: {self.cantidad}"
+
 
 class CategoriaGasto(models.Model):
     nombre = models.CharField(max_length=100)
@@ -183,6 +257,9 @@ class GastoOperativo(models.Model):
     moneda = models.CharField(max_length=3, default='PEN')
     fecha = models.DateField()
 
+    class Meta:
+        indexes = [models.Index(fields=['empresa', '-fecha', '-id'], name='gasto_emp_fecha_idx')]
+
     def __str__(self):
         return f"Gasto: {self.descripcion[:30]} - {self.monto}"
 
@@ -216,8 +293,21 @@ class Prestamo(models.Model):
         capital = decimal.Decimal(str(self.monto_capital))
         interes = decimal.Decimal(str(self.porcentaje_interes))
         
-        # Calcular el interés (RF-11)
-        self.monto_interes = (capital * interes) / 100
+        # Calcular el interés (RF-11) solo si el préstamo es nuevo o cambió capital o tasa: en otro caso se
+        # respeta el interés del cronograma (amortizacion.programar_cuotas_prestamo lo reemplaza por el de la
+        # TEA en los métodos no lineales), también en un save() completo como el del admin
+        update_fields = kwargs.get('update_fields')
+        if self._state.adding or self.monto_interes is None:
+            recalcular = True
+        elif update_fields is not None:
+            recalcular = bool({'monto_capital', 'porcentaje_interes'} & set(update_fields))
+        else:
+            guardado = Prestamo.objects.filter(pk=self.pk).values_list('monto_capital', 'porcentaje_interes').first()
+            recalcular = guardado != (capital, interes)
+        if recalcular:
+            self.monto_interes = (capital * interes) / 100
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'monto_interes'}
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -257,8 +347,30 @@ class LogAuditoria(models.Model):
     motivo_cambio = models.TextField() # Obligatorio para borrados
     fecha_hora = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['empresa', '-fecha_hora', '-id_log'], name='log_emp_fecha_idx')]
+
     def __str__(self):
         return f"{self.accion} en {self.tabla_afectada} por {self.usuario.username}"
+
+
+class ArchivoAuditoria(models.Model):
+    """Mes del log de auditoría ya archivado en JSONL comprimido (manage.py archivar_auditoria)."""
+    # Sin empresa: los registros del log que no tienen empresa (acciones fuera de una empresa activa)
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, null=True, blank=True)
+    periodo = models.CharField(max_length=7) # Ej: 2025-09
+    archivo = models.FileField(upload_to='auditoria/')
+    filas = models.PositiveIntegerField(default=0)
+    fecha_archivo = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('empresa', 'periodo')
+        ordering = ['-periodo']
+        verbose_name = "Archivo de Auditoría"
+        verbose_name_plural = "Archivos de Auditoría"
+
+    def __str__(self):
+        return f"Auditoría {self.periodo} - {self.filas} registros"
     
 
 class MovimientoFinanciero(models.Model):
@@ -284,6 +396,7 @@ class MovimientoFinanciero(models.Model):
     class Meta:
         verbose_name = "Movimiento Financiero"
         verbose_name_plural = "Movimientos Financieros"
+        indexes = [models.Index(fields=['empresa', '-fecha', '-id'], name='movimiento_emp_fecha_idx')]
 
     def __str__(self):
         return f"{self.tipo} ({self.moneda}): {self.monto} - {self.referencia}"
@@ -301,6 +414,9 @@ class Cuota(models.Model):
     pagada = models.BooleanField(default=False)
     fecha_pago = models.DateField(null=True, blank=True)
     saldo_cuota = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    # Desglose de la cuota según el cronograma de amortización (core.amortizacion)
+    monto_capital = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    monto_interes = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 
     def save(self, *args, **kwargs):
             if self.saldo_cuota is None:
@@ -311,6 +427,10 @@ class Cuota(models.Model):
         verbose_name = "Cuota de Pago/Cobro"
         verbose_name_plural = "Cuotas de Pago/Cobro"
         ordering = ['fecha_vencimiento'] # Orden automático por fecha
+        indexes = [
+            # Índice parcial: solo las cuotas abiertas, así el cronograma no recorre el histórico pagado
+            models.Index(fields=['fecha_vencimiento', 'id'], name='cuota_pendiente_venc_idx', condition=models.Q(pagada=False)),
+        ]
 
     def __str__(self):
         origen = self.cuenta.comprobante.codigo_factura if self.cuenta else f"Préstamo {self.prestamo.prestamista}"
@@ -328,6 +448,7 @@ class Notificacion(models.Model):
 
     class Meta:
         ordering = ['-fecha'] # Las más recientes primero
+        indexes = [models.Index(fields=['empresa', '-fecha', '-id'], name='notificacion_emp_fecha_idx')]
 
     def __str__(self):
         return f"{self.tipo} - {self.mensaje[:30]}"
@@ -502,6 +623,7 @@ class Cotizacion(models.Model):
     class Meta:
         verbose_name = "Cotización"
         verbose_name_plural = "Cotizaciones"
+        indexes = [models.Index(fields=['empresa', '-fecha', '-id'], name='cotizacion_emp_fecha_idx')]
 
 class CotizacionDetalle(models.Model):
     cotizacion = models.ForeignKey(Cotizacion, on_delete=models.CASCADE, related_name='detalles')
@@ -518,3 +640,19 @@ class CotizacionDetalle(models.Model):
     def __str__(self):
         return f"{self.cantidad} x {self.descripcion_libre[:30]}"
     
+
+# Índice de búsqueda global (ver core/busqueda.py). Una fila por objeto buscable;
+# el texto se indexa en FTS5 (SQLite) o con tsvector + GIN (PostgreSQL).
+class IndiceBusqueda(models.Model):
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
+    tipo = models.CharField(max_length=20)  # 'comprobante', 'entidad', 'producto', 'cotizacion', 'movimiento'
+    objeto_id = models.IntegerField()
+    titulo = models.CharField(max_length=255)
+    detalle = models.CharField(max_length=255, blank=True)
+    texto = models.TextField()
+
+    class Meta:
+        unique_together = ('tipo', 'objeto_id')
+
+    def __str__(self):
+        return f"{self.tipo} #{self.objeto_id}: {self.titulo}"
@@ -0,0 +1,131 @@
+# core/paginacion.py
+import base64
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+POR_PAGINA = 50
+
+
+def _codificar(fecha, pk):
+    crudo = f"{fecha.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip('=')
+
+
+def _decodificar(token, campo):
+    """Token -> (fecha, pk). Un token inválido o manipulado simplemente vuelve a la primera página."""
+    try:
+        crudo = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        fecha, pk = crudo.rsplit('|', 1)
+        return campo.to_python(fecha), int(pk)
+    except (ValueError, ValidationError):
+        return None
+
+
+class PaginaKeyset:
+    """Página de resultados con tokens de siguiente/anterior (iterable desde el template)."""
+
+    def __init__(self, items, siguiente=None, anterior=None):
+        self.items = items
+        self.siguiente = siguiente
+        self.anterior = anterior
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    @property
+    def tiene_otras(self):
+        return bool(self.siguiente or self.anterior)
+
+
+def paginar_keyset(queryset, campo_fecha, despues=None, antes=None, por_pagina=POR_PAGINA):
+    """
+    Paginación por cursor sobre (campo_fecha, pk) descendente, lo más reciente primero.
+
+    En vez de OFFSET, cada página lee un rango acotado del índice (empresa, fecha, id):
+      - `despues`: token de la última fila vista -> página siguiente (más antigua)
+      - `antes`: token de la primera fila vista -> página anterior (más reciente)
+    Se pide una fila de más para saber si hay otra página sin hacer COUNT.
+    """
+    modelo = queryset.model
+    pk = modelo._meta.pk.name
+    campo = modelo._meta.get_field(campo_fecha)
+    hacia_atras = False
+
+    cursor = _decodificar(antes, campo) if antes else None
+    if cursor:
+        fecha, id_ = cursor
+        queryset = queryset.filter(
+            Q(**{f"{campo_fecha}__gt": fecha}) | Q(**{campo_fecha: fecha, f"{pk}__gt": id_})
+        ).order_by(campo_fecha, pk)
+        hacia_atras = True
+    else:
+        cursor = _decodificar(despues, campo) if despues else None
+        if cursor:
+            fecha, id_ = cursor
+            queryset = queryset.filter(
+                Q(**{f"{campo_fecha}__lt": fecha}) | Q(**{campo_fecha: fecha, f"{pk}__lt": id_})
+            )
+        queryset = queryset.order_by(f"-{campo_fecha}", f"-{pk}")
+
+    filas = list(queryset[:por_pagina + 1])
+    hay_mas = len(filas) > por_pagina
+    filas = filas[:por_pagina]
+    if hacia_atras:
+        filas.reverse()
+    return _pagina(filas, campo_fecha, pk, cursor, hacia_atras, hay_mas)
+
+
+def paginar_lista(filas, campo_fecha, despues=None, antes=None, por_pagina=POR_PAGINA):
+    """
+    Lo mismo que paginar_keyset sobre una lista de instancias ya ordenada de la más reciente a la más
+    antigua (p. ej. un mes del log de auditoría leído de su archivo). Los tokens son intercambiables.
+    """
+    if not filas:
+        return PaginaKeyset([])
+    modelo = type(filas[0])
+    pk = modelo._meta.pk.name
+    campo = modelo._meta.get_field(campo_fecha)
+    clave = lambda obj: (getattr(obj, campo_fecha), getattr(obj, pk))
+    hacia_atras = False
+
+    cursor = _decodificar(antes, campo) if antes else None
+    if cursor:
+        previas = [obj for obj in filas if clave(obj) > cursor]
+        hay_mas = len(previas) > por_pagina
+        filas = previas[-por_pagina:]
+        hacia_atras = True
+    else:
+        cursor = _decodificar(despues, campo) if despues else None
+        if cursor:
+            filas = [obj for obj in filas if clave(obj) < cursor]
+        hay_mas = len(filas) > por_pagina
+        filas = filas[:por_pagina]
+    return _pagina(filas, campo_fecha, pk, cursor, hacia_atras, hay_mas)
+
+
+def _pagina(filas, campo_fecha, pk, cursor, hacia_atras, hay_mas):
+    if not filas:
+        return PaginaKeyset(filas)
+
+    token = lambda obj: _codificar(getattr(obj, campo_fecha), getattr(obj, pk))
+    # Hacia adelante: hay anterior si vinimos de un cursor. Hacia atrás: hay siguiente siempre.
+    siguiente = token(filas[-1]) if (hay_mas or hacia_atras) else None
+    anterior = token(filas[0]) if (cursor and not hacia_atras) or (hacia_atras and hay_mas) else None
+    return PaginaKeyset(filas, siguiente=siguiente, anterior=anterior)
+
+
+def paginar_request(request, queryset, campo_fecha, por_pagina=POR_PAGINA):
+    """Atajo para las vistas de listado: lee ?despues= / ?antes= de la URL (acepta queryset o lista)."""
+    paginar = paginar_lista if isinstance(queryset, list) else paginar_keyset
+    return paginar(
+        queryset, campo_fecha,
+        despues=request.GET.get('despues'), antes=request.GET.get('antes'),
+        por_pagina=por_pagina
+    )
@@ -0,0 +1,110 @@
+# core/permisos.py
+"""
+Rol y permisos del usuario cargados una vez y guardados en el cache.
+
+permisos_de(usuario) devuelve un objeto Permisos inmutable: `es_admin`, `tiene('clave')` (alias has_perm)
+y acceso por atributo a las claves del JSON de Rol.permisos (`permisos.ver_utilidad`, también desde los
+templates). El cache se invalida por versión: guardar un Rol sube la versión global y guardar un Usuario
+sube la suya, así las entradas viejas simplemente dejan de leerse (las señales están en core/signals.py).
+
+La invalidación solo llega a todos los workers con un cache compartido (REDIS_URL): con LocMem cada
+proceso tiene sus propias versiones, así que ahí las entradas duran PERMISOS_TTL (30 s por defecto) y un
+cambio de rol tarda a lo más eso en verse en los demás workers.
+"""
+import time
+from types import MappingProxyType
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Usuario
+
+ROL_ADMIN = 'Admin'
+VERSION_ROLES = 'permisos:version_roles'
+
+
+def _version_usuario(usuario_id):
+    return f"permisos:version_usuario:{usuario_id}"
+
+
+class Permisos:
+    """Rol y permisos de un usuario. Inmutable: se comparte entre requests desde el cache."""
+    __slots__ = ('usuario_id', 'rol', 'es_admin', 'permisos')
+
+    def __init__(self, usuario_id=None, rol=None, permisos=None):
+        for campo, valor in (
+            ('usuario_id', usuario_id), ('rol', rol), ('es_admin', rol == ROL_ADMIN),
+            ('permisos', MappingProxyType(dict(permisos or {}))),
+        ):
+            object.__setattr__(self, campo, valor)
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError("Permisos es inmutable")
+
+    def __reduce__(self):
+        return (Permisos, (self.usuario_id, self.rol, dict(self.permisos)))
+
+    def tiene(self, permiso):
+        """El admin puede todo; el resto, lo que su rol tenga en verdadero."""
+        return self.es_admin or bool(self.permisos.get(permiso))
+
+    has_perm = tiene
+
+    def __getattr__(self, permiso):
+        # Solo se llama para nombres que no son atributos: {{ user_permisos.ver_utilidad }}
+        if permiso.startswith('_'):
+            raise AttributeError(permiso)
+        return self.tiene(permiso)
+
+
+SIN_PERMISOS = Permisos()
+
+
+def _cargar(usuario_id):
+    fila = Usuario.objects.filter(pk=usuario_id).values_list('rol__nombre', 'rol__permisos').first()
+    rol, permisos = fila if fila else (None, None)
+    return Permisos(usuario_id, rol, permisos)
+
+
+def _versiones(usuario_id):
+    claves = [VERSION_ROLES, _version_usuario(usuario_id)]
+    versiones = cache.get_many(claves)
+    for clave in claves:
+        if clave not in versiones:
+            # Nunca creada o descartada por el cache (culling, LRU): se estrena una versión que ninguna
+            # entrada usó, para no volver a leer permisos guardados antes del último cambio
+            cache.add(clave, time.time_ns(), None)
+            versiones[clave] = cache.get(clave)
+    return versiones[claves[0]], versiones[claves[1]]
+
+
+def permisos_de(usuario):
+    """Permisos del usuario: memoizados en la instancia (un request) y en el cache (entre requests)."""
+    if not getattr(usuario, 'is_authenticated', False):
+        return SIN_PERMISOS
+    permisos = getattr(usuario, '_permisos', None)
+    if permisos is None:
+        version_roles, version_usuario = _versiones(usuario.pk)
+        clave = f"permisos:{usuario.pk}:{version_roles}:{version_usuario}"
+        permisos = cache.get(clave)
+        if permisos is None:
+            permisos = _cargar(usuario.pk)
+            cache.set(clave, permisos, settings.PERMISOS_TTL)
+        usuario._permisos = permisos
+    return permisos
+
+
+def _subir_version(clave):
+    try:
+        cache.incr(clave)
+    except ValueError:
+        # Sin versión en el cache: cualquier versión nueva deja fuera las entradas anteriores
+        cache.set(clave, time.time_ns(), None)
+
+
+def invalidar_roles():
+    _subir_version(VERSION_ROLES)
+
+
+def invalidar_usuario(usuario_id):
+    _subir_version(_version_usuario(usuario_id))
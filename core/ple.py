@@ -0,0 +1,108 @@
+# core/ple.py
+"""
+Libros electrónicos SUNAT (PLE): Registro de Compras 8.1 y Registro de Ventas e Ingresos 14.1.
+
+Cada libro es un .txt delimitado por '|' con una línea por comprobante del periodo. Las líneas se generan
+con un queryset values_list recorrido con .iterator(chunk_size) y se escriben directo dentro del zip,
+así 100k+ líneas al mes no se acumulan en memoria.
+"""
+import decimal
+import zipfile
+
+from django.db.models import OuterRef, Subquery
+
+from .models import Comprobante, CuentaEstado, Empresa
+
+LIBRO_COMPRAS = '080100'
+LIBRO_VENTAS = '140100'
+LIBROS = {LIBRO_COMPRAS: 'Compra', LIBRO_VENTAS: 'Venta'}
+LOTE = 2000
+CODIFICACION = 'latin-1'  # El validador PLE trabaja con ANSI
+
+# Tabla 10 (tipo de comprobante) y Tabla 2 (tipo de documento de identidad)
+TIPO_COMPROBANTE = {'Factura': '01', 'Boleta': '03', 'Recibo': '12', 'Otros': '00'}
+TIPO_IDENTIDAD = {'RUC': '6', 'DNI': '1'}
+
+CERO = '0.00'
+CENTIMO = decimal.Decimal('0.01')
+
+
+def nombre_archivo(ruc, desde, libro, con_datos=True):
+    """LE + RUC + AAAAMM00 + libro + 00 + operación(1) + contenido(1/0) + moneda PEN(1) + generado por PLE(1)."""
+    return f"LE{ruc}{desde:%Y%m}00{libro}001{1 if con_datos else 0}11.txt"
+
+
+def _comprobantes(emp_id, operacion, desde, hasta):
+    vencimiento = CuentaEstado.objects.filter(comprobante=OuterRef('pk')).order_by('id').values('fecha_vencimiento')[:1]
+    return (
+        Comprobante.objects.filter(empresa_id=emp_id, operacion=operacion, fecha_emision__range=(desde, hasta))
+        .annotate(fecha_vencimiento=Subquery(vencimiento))
+        .order_by('fecha_emision', 'id')
+        .values_list(
+            'id', 'fecha_emision', 'fecha_vencimiento', 'tipo_documento', 'serie', 'numero',
+            'entidad__tipo_documento', 'entidad__numero_documento', 'entidad__nombre_razon_social',
+            'moneda', 'tipo_cambio', 'subtotal', 'igv', 'total',
+        )
+    )
+
+
+def _limpiar(texto):
+    """Sin separadores ni saltos de línea dentro de un campo."""
+    return ' '.join(str(texto or '').replace('|', ' ').split()).upper()
+
+
+def _monto(valor, factor):
+    return f"{(valor * factor).quantize(CENTIMO)}"
+
+
+def lineas_ple(emp_id, libro, desde, hasta, chunk_size=LOTE):
+    """Genera las líneas (str, con '|' final y salto de línea) del libro para el periodo."""
+    periodo = f"{desde:%Y%m}00"
+    ventas = libro == LIBRO_VENTAS
+    filas = _comprobantes(emp_id, LIBROS[libro], desde, hasta).iterator(chunk_size=chunk_size)
+
+    for correlativo, (cuo, emision, vence, tipo_doc, serie, numero, tipo_ident, ruc, razon,
+                      moneda, tc, subtotal, igv, total) in enumerate(filas, start=1):
+        # Los importes del libro van en soles; la moneda y el TC originales quedan informados
+        factor = tc if moneda != 'PEN' else decimal.Decimal('1')
+        comun = [
+            periodo, str(cuo), f"M{correlativo}", emision.strftime('%d/%m/%Y'),
+            vence.strftime('%d/%m/%Y') if vence else '', TIPO_COMPROBANTE.get(tipo_doc, '00'), _limpiar(serie),
+        ]
+        proveedor_cliente = [TIPO_IDENTIDAD.get(tipo_ident, '0'), ruc, _limpiar(razon)[:100]]
+        moneda_tc = [moneda, f"{tc:.3f}"]
+        doc_modificado = ['', '', '', '']
+
+        if ventas:
+            campos = comun + [_limpiar(numero), ''] + proveedor_cliente + [
+                CERO, _monto(subtotal, factor), CERO, _monto(igv, factor), CERO, CERO, CERO, CERO,  # 13-20
+                CERO, CERO, CERO, CERO, _monto(total, factor),                                        # 21-25
+            ] + moneda_tc + doc_modificado + ['', '', '', '1']                                        # 26-35
+        else:
+            campos = comun + ['', _limpiar(numero), ''] + proveedor_cliente + [
+                _monto(subtotal, factor), _monto(igv, factor), CERO, CERO, CERO, CERO, CERO,          # 14-20
+                CERO, CERO, CERO, _monto(total, factor),                                              # 21-24
+            ] + moneda_tc + doc_modificado + ['']                                                     # 25-31
+            # 32-42: detracción (2), marca retención, clasificación (Tabla 30), contrato, errores (4), medio de pago, estado
+            campos += ['', '', '', '1', '', '', '', '', '', '', '1']
+        yield '|'.join(campos) + '|\r\n'
+
+
+def escribir_zip_ple(emp_id, desde, hasta, destino, libros=(LIBRO_COMPRAS, LIBRO_VENTAS), chunk_size=LOTE):
+    """
+    Escribe los libros del periodo dentro de un zip (`destino`: ruta o archivo binario).
+    Devuelve {nombre_de_archivo: número de líneas}.
+    """
+    ruc = Empresa.objects.values_list('ruc', flat=True).get(id=emp_id)
+    resumen = {}
+    with zipfile.ZipFile(destino, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for libro in libros:
+            con_datos = _comprobantes(emp_id, LIBROS[libro], desde, hasta).exists()
+            nombre = nombre_archivo(ruc, desde, libro, con_datos)
+            lineas = 0
+            with zf.open(nombre, 'w', force_zip64=True) as txt:
+                for linea in lineas_ple(emp_id, libro, desde, hasta, chunk_size=chunk_size):
+                    txt.write(linea.encode(CODIFICACION, errors='replace'))
+                    lineas += 1
+            resumen[nombre] = lineas
+    return resumen
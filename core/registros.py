@@ -0,0 +1,146 @@
+# core/registros.py
+"""
+Registro de Compras / Registro de Ventas del periodo, exportable en CSV o XLSX.
+
+Las filas salen de un solo queryset con values_list (entidad por JOIN, total de líneas por Subquery)
+recorrido con .iterator(chunk_size): la memoria no crece con el número de comprobantes.
+"""
+import calendar
+import csv
+import datetime
+import decimal
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.db.models import DecimalField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Comprobante, ComprobanteDetalle
+
+CENTIMO = decimal.Decimal('0.01')
+LOTE = 2000
+
+COLUMNAS = [
+    'Fecha Emisión', 'Tipo Doc.', 'Serie', 'Número', 'RUC/DNI', 'Razón Social', 'Moneda', 'Tipo de Cambio',
+    'Base Imponible', 'IGV', 'Total', 'Total Líneas', 'Base Imponible PEN', 'IGV PEN', 'Total PEN', 'Estado SUNAT',
+]
+
+
+def rango_periodo(periodo):
+    """'AAAA-MM' -> (primer día, último día). ValueError si el periodo no es válido."""
+    anio, mes = (int(p) for p in periodo.split('-'))
+    return datetime.date(anio, mes, 1), datetime.date(anio, mes, calendar.monthrange(anio, mes)[1])
+
+
+def comprobantes_periodo(emp_id, operacion, desde, hasta):
+    """Comprobantes del periodo como tuplas planas, en el orden de COLUMNAS (sin los montos PEN)."""
+    total_lineas = (
+        ComprobanteDetalle.objects.filter(comprobante=OuterRef('pk'))
+        .values('comprobante').annotate(s=Sum('subtotal_linea')).values('s')
+    )
+    return (
+        Comprobante.objects.filter(
+            empresa_id=emp_id, operacion=operacion, fecha_emision__range=(desde, hasta)
+        )
+        .annotate(total_lineas=Coalesce(
+            Subquery(total_lineas, output_field=DecimalField(max_digits=14, decimal_places=2)),
+            decimal.Decimal('0.00'), output_field=DecimalField(max_digits=14, decimal_places=2)
+        ))
+        .order_by('fecha_emision', 'id')
+        .values_list(
+            'fecha_emision', 'tipo_documento', 'serie', 'numero',
+            'entidad__numero_documento', 'entidad__nombre_razon_social',
+            'moneda', 'tipo_cambio', 'subtotal', 'igv', 'total', 'total_lineas', 'estado_sunat',
+        )
+    )
+
+
+def filas_registro(emp_id, operacion, desde, hasta, chunk_size=LOTE):
+    """Generador de filas (listas de str) con los equivalentes en soles calculados al vuelo."""
+    for (fecha, tipo_doc, serie, numero, ruc, razon, moneda, tc,
+         subtotal, igv, total, total_lineas, estado) in comprobantes_periodo(emp_id, operacion, desde, hasta).iterator(chunk_size=chunk_size):
+        factor = tc if moneda != 'PEN' else decimal.Decimal('1')
+        yield [
+            fecha.strftime('%d/%m/%Y'), tipo_doc, serie, numero, ruc, razon, moneda, f"{tc:.3f}",
+            f"{subtotal:.2f}", f"{igv:.2f}", f"{total:.2f}", f"{decimal.Decimal(total_lineas):.2f}",
+            f"{(subtotal * factor).quantize(CENTIMO)}", f"{(igv * factor).quantize(CENTIMO)}",
+            f"{(total * factor).quantize(CENTIMO)}", estado,
+        ]
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve la línea en vez de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def stream_csv(filas):
+    """Líneas CSV (con BOM para Excel) listas para StreamingHttpResponse."""
+    writer = csv.writer(_Eco())
+    yield '\ufeff' + writer.writerow(COLUMNAS)
+    for fila in filas:
+        yield writer.writerow(fila)
+
+
+# --- XLSX mínimo sin dependencias (SpreadsheetML con celdas inlineStr) ---
+_XLSX_ESTATICOS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Registro" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+# Columnas numéricas (índices en COLUMNAS) que se escriben como número y no como texto
+_NUMERICAS = {7, 8, 9, 10, 11, 12, 13, 14}
+
+
+def _fila_xml(fila, numericas=_NUMERICAS):
+    celdas = []
+    for i, valor in enumerate(fila):
+        if i in numericas:
+            celdas.append(f'<c t="n"><v>{valor}</v></c>')
+        else:
+            celdas.append(f'<c t="inlineStr"><is><t>{escape(str(valor))}</t></is></c>')
+    return f"<row>{''.join(celdas)}</row>"
+
+
+def escribir_xlsx(filas, destino):
+    """
+    Escribe el libro en `destino` (ruta o archivo binario). La hoja se escribe fila a fila
+    directamente dentro del zip, así el libro nunca está completo en memoria.
+    """
+    with zipfile.ZipFile(destino, 'w', zipfile.ZIP_DEFLATED) as libro:
+        for nombre, contenido in _XLSX_ESTATICOS.items():
+            libro.writestr(nombre, contenido)
+        with libro.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as hoja:
+            hoja.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            hoja.write(_fila_xml(COLUMNAS, numericas=()).encode())
+            for fila in filas:
+                hoja.write(_fila_xml(fila).encode())
+            hoja.write(b'</sheetData></worksheet>')
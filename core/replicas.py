@@ -0,0 +1,80 @@
+# core/replicas.py
+"""
+Lecturas de reportes contra una réplica (alias 'reporting').
+
+Las vistas pesadas de solo lectura se marcan con @usar_replica (core/decorators.py): mientras corren,
+RouterReplica manda las lecturas al alias de reportes y todas las escrituras a 'default'.
+Se lee del primario cuando:
+  - no hay alias 'reporting' configurado (REPORTING_DATABASE_URL sin definir),
+  - la sesión hizo un POST hace menos de REPLICA_RETRASO_MAX segundos (lee lo que acaba de escribir),
+  - el modelo es de sesiones (la sesión se escribe en el primario y se lee en el mismo request).
+
+Para probar en local con dos SQLite: `cp db.sqlite3 reporting.sqlite3` y
+REPORTING_DATABASE_URL=sqlite:///reporting.sqlite3.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+ALIAS_REPORTES = 'reporting'
+CLAVE_SESION = '_ultima_escritura'
+# Apps que siempre se leen del primario
+SOLO_PRIMARIO = {'sessions'}
+
+# ContextVar como en core/contexto.py: propia de cada request aunque compartan hilo (ASGI, vistas async)
+_alias = ContextVar('alias_lectura', default=None)
+
+
+def alias_lectura():
+    """Alias al que van las lecturas del request actual (None = el que decida Django, 'default')."""
+    return _alias.get()
+
+
+@contextmanager
+def leyendo_de(alias):
+    token = _alias.set(alias)
+    try:
+        yield
+    finally:
+        _alias.reset(token)
+
+
+def replica_disponible():
+    return ALIAS_REPORTES in settings.DATABASES
+
+
+def marcar_escritura(request):
+    """Anota en la sesión que este usuario acaba de escribir (ver ReplicaMiddleware)."""
+    request.session[CLAVE_SESION] = time.time()
+
+
+def alias_para(request):
+    """'reporting' si la vista puede leer de la réplica sin perder lo que el usuario acaba de escribir."""
+    if not replica_disponible():
+        return None
+    ultima = getattr(request, 'session', {}).get(CLAVE_SESION)
+    if ultima and time.time() - ultima < getattr(settings, 'REPLICA_RETRASO_MAX', 5):
+        return None
+    return ALIAS_REPORTES
+
+
+class RouterReplica:
+    """Lecturas al alias activo (solo dentro de @usar_replica); escrituras y migraciones, al primario."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in SOLO_PRIMARIO:
+            return 'default'
+        return alias_lectura()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Es la misma base replicada: un objeto leído de la réplica puede relacionarse con uno del primario
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # El esquema llega a la réplica por replicación (o copiando el archivo SQLite)
+        return db == 'default'
@@ -0,0 +1,192 @@
+# core/saldos.py
+"""
+Stock y valor del inventario a cualquier fecha.
+
+generar_saldos() guarda una foto mensual por producto (SaldoInventarioMensual) a partir del libro
+MovimientoStock. saldos_a_fecha() parte de la última foto anterior a la fecha y repite sobre ella los
+movimientos posteriores del libro con el costo que cada uno dejó anotado (inventario.aplicar_movimiento):
+el costo promedio sale igual que el que se fue calculando al registrar, sin releer compras ni fletes.
+Un movimiento fechado en un mes ya fotografiado borra esa foto y las siguientes (inventario.registrar_movimiento).
+recalcular_costos() repite el libro completo para corregir costo_promedio y valor_inventario de Producto,
+y valorizacion_almacen() arma el reporte del almacén, actual (desde Producto) o a una fecha.
+"""
+import datetime
+
+from . import costeo
+from .inventario import aplicar_movimiento
+from .models import MovimientoStock, Producto, SaldoInventarioMensual
+from .registros import rango_periodo
+
+CERO = costeo.CERO
+LOTE = 2000
+
+
+def periodos_entre(desde, hasta):
+    """['AAAA-MM', ...] de `desde` a `hasta` (ambos 'AAAA-MM', inclusive)."""
+    inicio, _ = rango_periodo(desde)
+    _, fin = rango_periodo(hasta)
+    periodos = []
+    while inicio <= fin:
+        periodos.append(f"{inicio:%Y-%m}")
+        inicio = (inicio + datetime.timedelta(days=32)).replace(day=1)
+    return periodos
+
+
+def _ultima_foto(emp_id, fecha):
+    """Fecha de corte de la última foto de la empresa <= `fecha` (None si no hay)."""
+    return (
+        SaldoInventarioMensual.objects.filter(empresa_id=emp_id, fecha_corte__lte=fecha)
+        .order_by('-fecha_corte').values_list('fecha_corte', flat=True).first()
+    )
+
+
+def _estados_foto(emp_id, corte):
+    """{producto_id: costeo.Estado} con cantidad, costo y valor de la foto (vacío sin corte)."""
+    if corte is None:
+        return {}
+    fotos = SaldoInventarioMensual.objects.filter(empresa_id=emp_id, fecha_corte=corte).values_list(
+        'producto_id', 'cantidad', 'costo_promedio', 'valor'
+    )
+    return {pid: costeo.Estado(cantidad, costo, valor) for pid, cantidad, costo, valor in fotos.iterator(chunk_size=LOTE)}
+
+
+def _movimientos(emp_id, desde, hasta):
+    """
+    Filas del libro en (desde, hasta] en el orden en que se aplican (fecha, id). `desde` None es el inicio,
+    `hasta` None el final y `emp_id` None todas las empresas.
+    """
+    movimientos = MovimientoStock.objects.all()
+    if emp_id:
+        movimientos = movimientos.filter(empresa_id=emp_id)
+    if hasta is not None:
+        movimientos = movimientos.filter(fecha__lte=hasta)
+    if desde is not None:
+        movimientos = movimientos.filter(fecha__gt=desde)
+    return movimientos.order_by('fecha', 'id').values_list(
+        'producto_id', 'fecha', 'origen', 'cantidad', 'costo_unitario'
+    ).iterator(chunk_size=LOTE)
+
+
+def _aplicar(estados, fila):
+    producto_id, _fecha, origen, cantidad, costo_unitario = fila
+    estado = estados.get(producto_id)
+    if estado is None:
+        estado = estados[producto_id] = costeo.Estado()
+    aplicar_movimiento(estado, origen, cantidad, costo_unitario)
+
+
+def generar_saldos(emp_id, desde, hasta):
+    """
+    Fotos de fin de mes de `desde` a `hasta` ('AAAA-MM'). Reemplaza las existentes de esos meses.
+
+    Parte de la última foto anterior a `desde` (o del inicio del libro) y recorre el libro una vez en
+    orden (fecha, id), aplicando cada fila con su costo anotado; al pasar cada fin de mes se guarda
+    cantidad, costo promedio y valor de los productos con existencias distintas de cero.
+    Devuelve el número de filas creadas.
+    """
+    periodos = periodos_entre(desde, hasta)
+    cortes = [rango_periodo(p)[1] for p in periodos]
+    dia_previo = rango_periodo(periodos[0])[0] - datetime.timedelta(days=1)
+    base = _ultima_foto(emp_id, dia_previo)
+    estados = _estados_foto(emp_id, base)
+
+    SaldoInventarioMensual.objects.filter(empresa_id=emp_id, fecha_corte__in=cortes).delete()
+    filas, total = [], 0
+
+    def fotografiar(periodo, corte):
+        nonlocal filas, total
+        for producto_id, estado in estados.items():
+            if not estado.stock_actual:
+                continue
+            filas.append(SaldoInventarioMensual(
+                empresa_id=emp_id, producto_id=producto_id, periodo=periodo, fecha_corte=corte,
+                cantidad=estado.stock_actual, costo_promedio=estado.costo_promedio, valor=estado.valor_inventario
+            ))
+            if len(filas) >= LOTE:
+                SaldoInventarioMensual.objects.bulk_create(filas)
+                total += len(filas)
+                filas = []
+
+    pendientes = list(zip(periodos, cortes))
+    for fila in _movimientos(emp_id, base, cortes[-1]):
+        while pendientes and fila[1] > pendientes[0][1]:
+            fotografiar(*pendientes.pop(0))
+        _aplicar(estados, fila)
+    for periodo, corte in pendientes:
+        fotografiar(periodo, corte)
+    SaldoInventarioMensual.objects.bulk_create(filas)
+    return total + len(filas)
+
+
+def saldos_a_fecha(emp_id, fecha):
+    """
+    Stock y valor de todo el catálogo al cierre de `fecha`: {'filas', 'total', 'corte'}.
+
+    Toma la última foto (<= fecha) y aplica encima los movimientos del libro en (corte, fecha] por el
+    índice (empresa, fecha); sin fotos, recorre el libro desde el inicio. Costo y valor son los del
+    promedio ponderado a esa fecha, no los de la foto ni los vigentes.
+    """
+    corte = _ultima_foto(emp_id, fecha)
+    estados = _estados_foto(emp_id, corte)
+    for fila in _movimientos(emp_id, corte, fecha):
+        _aplicar(estados, fila)
+
+    productos = Producto.objects.filter(pk__in=[pid for pid, e in estados.items() if e.stock_actual]).order_by(
+        'nombre_interno'
+    ).values_list('id', 'sku', 'nombre_interno')
+
+    filas = []
+    total = CERO
+    for pid, sku, nombre in productos:
+        estado = estados[pid]
+        filas.append({
+            'producto_id': pid, 'sku': sku, 'nombre': nombre,
+            'stock': estado.stock_actual, 'costo': estado.costo_promedio, 'valor': estado.valor_inventario,
+        })
+        total += estado.valor_inventario
+    return {'filas': filas, 'total': total, 'corte': corte}
+
+
+def recalcular_costos(emp_id=None, lote=1000):
+    """
+    Repite todo el libro y escribe en cada producto el costo promedio resultante, valorizando su
+    stock_actual a ese costo (el stock lo corrige conciliar_stock). Los productos sin movimientos no se
+    tocan. Devuelve los productos actualizados.
+    """
+    estados = {}
+    for fila in _movimientos(emp_id, None, None):
+        _aplicar(estados, fila)
+    productos = Producto.objects.filter(pk__in=list(estados))
+
+    cambios = []
+    total = 0
+    for producto in productos.only('id', 'stock_actual', 'costo_promedio', 'valor_inventario').iterator(chunk_size=lote):
+        producto.costo_promedio = estados[producto.id].costo_promedio
+        producto.valor_inventario = (max(producto.stock_actual, CERO) * producto.costo_promedio).quantize(costeo.CENTIMO)
+        cambios.append(producto)
+        if len(cambios) >= lote:
+            Producto.objects.bulk_update(cambios, ['costo_promedio', 'valor_inventario'])
+            total += len(cambios)
+            cambios = []
+    Producto.objects.bulk_update(cambios, ['costo_promedio', 'valor_inventario'])
+    return total + len(cambios)
+
+
+def valorizacion_almacen(emp_id, fecha=None):
+    """
+    Valorización de todo el almacén: {'filas': [...], 'total': S/}. Sin fecha lee los valores mantenidos
+    en Producto (una consulta); con fecha es saldos_a_fecha().
+    """
+    if fecha:
+        return saldos_a_fecha(emp_id, fecha)
+    productos = Producto.objects.filter(empresa_id=emp_id).order_by('nombre_interno').values_list(
+        'id', 'sku', 'nombre_interno', 'stock_actual', 'costo_promedio', 'valor_inventario'
+    )
+    filas = []
+    total = CERO
+    for pid, sku, nombre, stock, costo, valor in productos:
+        if not stock and not valor:
+            continue
+        filas.append({'producto_id': pid, 'sku': sku, 'nombre': nombre, 'stock': stock, 'costo': costo, 'valor': valor})
+        total += valor
+    return {'filas': filas, 'total': total}
@@ -1,6 +1,18 @@
 # core/services.py
 import logging
-from .models import Notificacion
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import Empresa, Notificacion
+
+# Campanita: {'total': no leídas, 'recientes': últimas 5 no leídas} por empresa, servido desde el cache
+CLAVE_NOTIFICACIONES = 'notificaciones:{}'
+N_RECIENTES = 5
+# Tope por si un cambio no pasa por las señales (update() masivo, otra app sobre la misma base)
+TTL_NOTIFICACIONES = 60
 
 
 def enviar_alerta_whatsapp(mensaje):
@@ -15,12 +27,55 @@ def enviar_alerta_whatsapp(mensaje):
 
 def crear_notificacion_interna(empresa, mensaje, tipo):
     """Guarda la alerta para que aparezca en la campanita y dashboard"""
-    Notificacion.objects.create(
+    # El contador y el cache los actualiza la señal post_save (notificacion_guardada)
+    return Notificacion.objects.create(
         empresa=empresa,
         mensaje=mensaje,
         tipo=tipo
     )
 
+
+def notificacion_guardada(notificacion, created=False, borrada=False):
+    """
+    Mantiene Empresa.notificaciones_no_leidas al crear, editar (admin) o borrar una notificación y
+    descarta la campanita cacheada; lo llaman las señales post_save/post_delete de Notificacion.
+    """
+    empresa = Empresa.objects.filter(pk=notificacion.empresa_id)
+    if created or borrada:
+        if not notificacion.leida:
+            paso = 1 if created else -1
+            empresa.update(notificaciones_no_leidas=Greatest(F('notificaciones_no_leidas') + paso, 0))
+    else:
+        # En una edición no se sabe si cambió `leida`: se vuelve a contar
+        no_leidas = Notificacion.objects.filter(empresa_id=notificacion.empresa_id, leida=False).count()
+        empresa.update(notificaciones_no_leidas=no_leidas)
+    # La campanita se vuelve a armar en el próximo request (después del commit, para no cachear algo revertido)
+    transaction.on_commit(lambda: cache.delete(CLAVE_NOTIFICACIONES.format(notificacion.empresa_id)))
+
+
+def marcar_leidas(emp_id):
+    """Marca todas las no leídas de la empresa y deja la campanita en cero."""
+    # update() no dispara señales: el contador y el cache se ajustan aquí
+    Notificacion.objects.filter(empresa_id=emp_id, leida=False).update(leida=True)
+    Empresa.objects.filter(pk=emp_id).update(notificaciones_no_leidas=0)
+    transaction.on_commit(lambda: cache.set(
+        CLAVE_NOTIFICACIONES.format(emp_id), {'total': 0, 'recientes': []}, TTL_NOTIFICACIONES
+    ))
+
+
+def resumen_notificaciones(emp_id):
+    """{'total', 'recientes'} de la campanita. Solo consulta la base si el cache no lo tiene."""
+    clave = CLAVE_NOTIFICACIONES.format(emp_id)
+    resumen = cache.get(clave)
+    if resumen is None:
+        resumen = {
+            'total': Empresa.objects.filter(pk=emp_id).values_list('notificaciones_no_leidas', flat=True).first() or 0,
+            'recientes': list(Notificacion.objects.filter(empresa_id=emp_id, leida=False)[:N_RECIENTES]),
+        }
+        # Las señales de Notificacion y marcar_leidas lo invalidan; el TTL cubre lo que no pasa por ellas
+        cache.set(clave, resumen, TTL_NOTIFICACIONES)
+    return resumen
+
 def verificar_variacion_precio(producto, nuevo_precio):
     precio_anterior = producto.precio_compra_referencial
     if precio_anterior > 0:
@@ -0,0 +1,56 @@
+# core/sesiones.py
+"""
+Motores de sesión con métricas.
+
+Cada SessionStore anota cuántos bytes y milisegundos tomó leer y escribir la sesión en el request;
+MetricasSesionMiddleware (core/middleware.py) las expone en la cabecera Server-Timing y avisa en el log
+cuando la sesión pasa de SESION_ALERTA_BYTES, indicando qué claves (normalmente temp_*) pesan más.
+Lectura y escritura se miden igual (JSON compacto del diccionario de la sesión), así el umbral vale para
+ambas; lo que se guarda ya viaja comprimido: SessionBase.encode firma con signing.dumps(compress=True).
+
+Las métricas están en MetricasSesionMixin y se aplican a los dos motores:
+  - core.sesiones: cached_db (lee del cache y solo va a django_session si no está). Requiere un cache
+    compartido (REDIS_URL) para que un logout o un cambio de empresa llegue a todos los workers.
+  - core.sesiones_db: solo django_session, el que se usa sin cache compartido.
+"""
+import json
+import time
+
+from django.contrib.sessions.backends import cached_db
+
+
+def tamano(valor):
+    """Bytes del valor serializado como en la sesión (JSON compacto)."""
+    return len(json.dumps(valor, separators=(',', ':'), default=str).encode())
+
+
+class MetricasSesionMixin:
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self.metricas = {'lectura_ms': 0.0, 'lectura_bytes': 0, 'escritura_ms': 0.0, 'escritura_bytes': 0}
+
+    def load(self):
+        t0 = time.perf_counter()
+        datos = super().load()
+        self.metricas['lectura_ms'] += (time.perf_counter() - t0) * 1000
+        self.metricas['lectura_bytes'] = tamano(datos)
+        return datos
+
+    def encode(self, session_dict):
+        self.metricas['escritura_bytes'] = tamano(session_dict)
+        return super().encode(session_dict)
+
+    def save(self, must_create=False):
+        t0 = time.perf_counter()
+        super().save(must_create=must_create)
+        self.metricas['escritura_ms'] += (time.perf_counter() - t0) * 1000
+
+    def tamanos_por_clave(self):
+        """{clave: bytes} de la sesión cargada, de mayor a menor."""
+        tamanos = {clave: tamano(valor) for clave, valor in self._get_session().items()}
+        return dict(sorted(tamanos.items(), key=lambda kv: kv[1], reverse=True))
+
+
+class SessionStore(MetricasSesionMixin, cached_db.SessionStore):
+    pass
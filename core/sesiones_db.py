@@ -0,0 +1,9 @@
+# core/sesiones_db.py
+"""Motor de sesiones solo en base de datos (sin cache compartido) con las métricas de core/sesiones.py."""
+from django.contrib.sessions.backends import db
+
+from .sesiones import MetricasSesionMixin
+
+
+class SessionStore(MetricasSesionMixin, db.SessionStore):
+    pass
@@ -1,5 +1,5 @@
 # core/signals.py
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import m2m_changed, post_save, post_delete
 from django.dispatch import receiver
 from django.forms.models import model_to_dict
 import json
@@ -7,9 +7,15 @@ import decimal
 from .models import (
     LogAuditoria, Comprobante, MovimientoFinanciero, 
     Producto, Entidad, Prestamo, CertificadoRetencion, CuentaEstado,
-    Cotizacion
+    Cotizacion, Empresa, Notificacion, Rol, Usuario
 )
-from .middleware import get_current_user
+from .contexto import get_current_empresa, get_current_user
+from . import auditoria
+from . import empresa_activa
+from . import permisos
+from . import busqueda
+from . import inventario
+from . import services
 from django.db.models.signals import pre_delete # Usamos pre_delete para actuar ANTES de que se borre
 
 # Lista de lo que vamos a vigilar
@@ -66,11 +72,11 @@ def monitor_guardado_global(sender, instance, created, **kwargs):
         if user and user.is_authenticated:
             if sender == LogAuditoria: return
             accion = 'INSERT' if created else 'UPDATE'
-            empresa = getattr(instance, 'empresa', None)
+            empresa = getattr(instance, 'empresa', None) or get_current_empresa()
             resumen = generar_resumen_humano(instance, sender.__name__, accion)
             if not created: resumen = f"[EDICIÓN] {resumen}"
 
-            LogAuditoria.objects.create(
+            auditoria.registrar(
                 usuario=user, empresa=empresa, accion=accion,
                 tabla_afectada=sender.__name__, referencia_id=instance.id,
                 motivo_cambio=resumen
@@ -82,11 +88,8 @@ def revertir_impacto_total_documento(sender, instance, **kwargs):
     """ RF-24: Antes de borrar la factura, devolvemos el stock al almacén """
     for det in instance.detalles.all():
         if det.producto:
-            if instance.operacion == 'Compra':
-                det.producto.stock_actual -= det.cantidad # Quitamos lo que compramos
-            else: 
-                det.producto.stock_actual += det.cantidad # Devolvemos lo que vendimos
-            det.producto.save()
+            # Compra: quitamos lo que compramos (a su costo). Venta: devolvemos lo vendido
+            inventario.registrar_comprobante(instance, det, revertir=True)
 
     # Al borrar el comprobante, buscamos sus pagos y los borramos también
     # Esto disparará el sensor #4 (abajo) para limpiar el banco.
@@ -116,4 +119,54 @@ def revertir_saldo_bancario_al_borrar(sender, instance, **kwargs):
             obj.saldo_actual -= monto
         else:
             obj.saldo_actual += monto
-        obj.save()
\ No newline at end of file
+        obj.save()
+
+# --- 5. SENSOR DEL ÍNDICE DE BÚSQUEDA GLOBAL ---
+@receiver(post_save)
+def actualizar_indice_busqueda(sender, instance, update_fields=None, **kwargs):
+    if sender in busqueda.CAMPOS_INDEXADOS:
+        busqueda.indexar(instance, update_fields=update_fields)
+
+@receiver(post_delete)
+def limpiar_indice_busqueda(sender, instance, **kwargs):
+    if sender in busqueda.CAMPOS_INDEXADOS:
+        busqueda.desindexar(instance)
+
+# --- 6. CACHE DE LA EMPRESA ACTIVA (request.empresa) Y DE PERMISOS ---
+@receiver(post_save, sender=Empresa)
+@receiver(post_delete, sender=Empresa)
+def invalidar_cache_empresa(sender, instance, **kwargs):
+    empresa_activa.invalidar_empresa(instance.pk)
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def invalidar_cache_usuario(sender, instance, **kwargs):
+    empresa_activa.invalidar_permitidas(instance.pk)
+    permisos.invalidar_usuario(instance.pk)
+
+@receiver(post_save, sender=Rol)
+@receiver(post_delete, sender=Rol)
+def invalidar_cache_roles(sender, instance, **kwargs):
+    permisos.invalidar_roles()
+
+@receiver(m2m_changed, sender=Usuario.empresas_permitidas.through)
+def invalidar_empresas_permitidas(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            empresa_activa.invalidar_permitidas(instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        # Cambio hecho desde la empresa (empresa.personal.add(...)): afecta a esos usuarios
+        for usuario_id in pk_set:
+            empresa_activa.invalidar_permitidas(usuario_id)
+    elif action == 'pre_clear':
+        for usuario_id in instance.personal.values_list('id', flat=True):
+            empresa_activa.invalidar_permitidas(usuario_id)
+
+# --- 7. CAMPANITA: CONTADOR DE NO LEÍDAS Y SU CACHE ---
+@receiver(post_save, sender=Notificacion)
+def contar_notificacion_guardada(sender, instance, created, **kwargs):
+    services.notificacion_guardada(instance, created=created)
+
+@receiver(post_delete, sender=Notificacion)
+def contar_notificacion_borrada(sender, instance, **kwargs):
+    services.notificacion_guardada(instance, borrada=True)
@@ -1,3 +1,1189 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import decimal
+import importlib
+import io
+import tempfile
+import warnings
+import zipfile
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import archivo_auditoria, auditoria, inventario, permisos
+from .amortizacion import (
+    calcular_cronogramas, programar_cuotas_cuenta, programar_cuotas_prestamo,
+    METODO_ALEMAN, METODO_BULLET, METODO_FRANCES, METODO_LINEAL
+)
+from .antiguedad import reporte_antiguedad
+from .contexto import actuando_como, get_current_empresa, get_current_user
+from .archivo_auditoria import cargar_periodo, inicio_zona_caliente
+from .busqueda import buscar, reindexar
+from .costeo import (
+    registrar_costo_adicional, registrar_entrada, registrar_salida
+)
+from .flujo_caja import proyectar_flujo_caja
+from .igv import resumen_mensual
+from .inventario import conciliar_stock, diferencias_stock, registrar_comprobante, registrar_movimiento
+from .kardex import Kardex
+from .paginacion import paginar_keyset
+from .permisos import Permisos, permisos_de
+from .registros import filas_registro
+from .ple import LIBRO_COMPRAS, LIBRO_VENTAS, lineas_ple
+from .replicas import ALIAS_REPORTES, CLAVE_SESION, RouterReplica, alias_para, leyendo_de, marcar_escritura
+from .saldos import generar_saldos, recalcular_costos, saldos_a_fecha, valorizacion_almacen
+from .services import crear_notificacion_interna
+from .cuotas import (
+    asignar_pago_cuotas, cuotas_pendientes, ESTRATEGIA_PRORRATA, ESTRATEGIA_INTERES_PRIMERO
+)
+from .models import (
+    AjusteStock, ArchivoAuditoria, Caja, Comprobante, ComprobanteDetalle, CuentaEstado, Cuota, Empresa, Entidad, IndiceBusqueda, LogAuditoria, MovimientoStock, Notificacion, Prestamo, Producto,
+    Rol, SaldoInventarioMensual, Usuario
+)
+
+D = decimal.Decimal
+
+
+class BaseContableTestCase(TestCase):
+    """Datos mínimos de una empresa con un cliente para los tests."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre='FG Test', ruc='20000000001')
+        cls.cliente = Entidad.objects.create(
+            empresa=cls.empresa, tipo_entidad='Cliente', tipo_documento='RUC',
+            numero_documento='20111111111', nombre_razon_social='CLIENTE TEST S.A.C.'
+        )
+
+    def crear_venta(self, total='1000.00', fecha=None, moneda='PEN', tc='1.000', numero='1', **kwargs):
+        total = D(total)
+        return Comprobante.objects.create(
+            empresa=self.empresa, entidad=self.cliente, tipo_documento='Factura',
+            operacion=kwargs.pop('operacion', 'Venta'), serie='F001', numero=numero,
+            fecha_emision=fecha or datetime.date(2026, 1, 15), moneda=moneda, tipo_cambio=D(tc),
+            subtotal=(total / D('1.18')).quantize(D('0.01')),
+            igv=total - (total / D('1.18')).quantize(D('0.01')), total=total, **kwargs
+        )
+
+    def iniciar_sesion(self, username='contador'):
+        usuario = Usuario.objects.create_user(username=username, password='x')
+        usuario.empresas_permitidas.add(self.empresa)
+        self.client.force_login(usuario)
+        # Tampoco el cache (empresa activa, campanita): los ids se repiten entre tests
+        cache.clear()
+        self.addCleanup(cache.clear)
+        session = self.client.session
+        session['empresa_id'] = self.empresa.id
+        session.save()
+        return usuario
+
+    def crear_cuenta(self, comprobante, saldo=None, vencimiento=None):
+        return CuentaEstado.objects.create(
+            comprobante=comprobante, monto_total=comprobante.total,
+            saldo_pendiente=comprobante.total if saldo is None else D(saldo),
+            fecha_vencimiento=vencimiento or comprobante.fecha_emision + datetime.timedelta(days=30)
+        )
+
+
+class AsignacionPagoCuotasTests(BaseContableTestCase):
+
+    def setUp(self):
+        self.cuenta = self.crear_cuenta(self.crear_venta(total='300.00'))
+        for i in range(1, 4):
+            Cuota.objects.create(
+                cuenta=self.cuenta, numero_cuota=i, monto=D('100.00'),
+                fecha_vencimiento=datetime.date(2026, 1, 1) + datetime.timedelta(days=30 * i)
+            )
+
+    def saldos(self, origen):
+        return list(origen.cuotas.order_by('numero_cuota').values_list('saldo_cuota', flat=True))
+
+    def test_antiguedad_cascada_con_una_sola_escritura(self):
+        with self.assertNumQueries(2):  # SELECT de pendientes + un UPDATE masivo
+            asignaciones, sobrante = asignar_pago_cuotas(D('150.00'), cuenta=self.cuenta)
+
+        self.assertEqual(sobrante, D('0'))
+        self.assertEqual(self.saldos(self.cuenta), [D('0.00'), D('50.00'), D('100.00')])
+        self.assertEqual([a['monto_aplicado'] for a in asignaciones], [D('100.00'), D('50.00')])
+        self.assertTrue(asignaciones[0]['pagada'])
+        self.assertIsNotNone(Cuota.objects.get(id=asignaciones[0]['cuota_id']).fecha_pago)
+
+    def test_sobrante_cuando_el_pago_excede_la_deuda(self):
+        _, sobrante = asignar_pago_cuotas(D('350.00'), cuenta=self.cuenta)
+        self.assertEqual(sobrante, D('50.00'))
+        self.assertFalse(self.cuenta.cuotas.filter(pagada=False).exists())
+
+    def test_prorrata_reparte_centimos_sin_perder_dinero(self):
+        asignaciones, sobrante = asignar_pago_cuotas(D('100.00'), cuenta=self.cuenta, estrategia=ESTRATEGIA_PRORRATA)
+        self.assertEqual(sobrante, D('0'))
+        self.assertEqual(sum(a['monto_aplicado'] for a in asignaciones), D('100.00'))
+        self.assertEqual([a['monto_aplicado'] for a in asignaciones], [D('33.34'), D('33.33'), D('33.33')])
+
+    def test_interes_primero_en_prestamos(self):
+        prestamo = Prestamo.objects.create(
+            empresa=self.empresa, prestamista='BCP', monto_capital=D('1000.00'),
+            porcentaje_interes=D('20.00'), fecha_prestamo=datetime.date(2026, 1, 1),
+            fecha_vencimiento=datetime.date(2026, 3, 1)
+        )
+        for i in (1, 2):
+            Cuota.objects.create(
+                prestamo=prestamo, numero_cuota=i, monto=D('600.00'),
+                fecha_vencimiento=datetime.date(2026, 1, 1) + datetime.timedelta(days=30 * i)
+            )
+        # Interés por cuota = 100.00; con 250 se cubren ambos intereses y 50 de capital de la primera
+        asignaciones, _ = asignar_pago_cuotas(D('250.00'), prestamo=prestamo, estrategia=ESTRATEGIA_INTERES_PRIMERO)
+        self.assertEqual([a['monto_aplicado'] for a in asignaciones], [D('150.00'), D('100.00')])
+        self.assertEqual(self.saldos(prestamo), [D('450.00'), D('500.00')])
+
+
+class CronogramaAmortizacionTests(BaseContableTestCase):
+
+    def setUp(self):
+        self.prestamo = Prestamo.objects.create(
+            empresa=self.empresa, prestamista='BBVA', monto_capital=D('12000.00'),
+            porcentaje_interes=D('12.00'), fecha_prestamo=datetime.date(2026, 1, 1),
+            fecha_vencimiento=datetime.date(2027, 1, 1)
+        )
+
+    def test_frances_cuota_fija_y_capital_exacto(self):
+        cuotas = programar_cuotas_prestamo(self.prestamo, 12, 30, metodo=METODO_FRANCES)
+        montos = {c.monto for c in cuotas[:-1]}
+        self.assertEqual(len(montos), 1)
+        self.assertEqual(sum(c.monto_capital for c in cuotas), D('12000.00'))
+        # El interés decrece a medida que baja el saldo
+        self.assertGreater(cuotas[0].monto_interes, cuotas[-1].monto_interes)
+
+    def test_aleman_y_bullet(self):
+        c = calcular_cronogramas([1200.0, 1200.0], [0.01, 0.01], [12, 6], METODO_ALEMAN)
+        self.assertAlmostEqual(c['capital'][0, 0], 100.0)
+        self.assertAlmostEqual(c['capital'][1, 5], 200.0)
+        self.assertEqual(c['cuota'][1, 6:].sum(), 0)  # Fuera del plazo del segundo préstamo
+
+        b = calcular_cronogramas(1000.0, 0.02, 4, METODO_BULLET)
+        self.assertEqual(list(b['capital'][0]), [0.0, 0.0, 0.0, 1000.0])
+        self.assertAlmostEqual(b['interes'][0].sum(), 80.0)
+
+    def test_lineal_respeta_interes_simple_del_prestamo_con_un_insert(self):
+        with self.assertNumQueries(2):  # DELETE previo + un INSERT masivo
+            programar_cuotas_prestamo(self.prestamo, 7, 30, metodo=METODO_LINEAL)
+        cuotas = list(self.prestamo.cuotas.all())
+        self.assertEqual(sum(c.monto for c in cuotas), self.prestamo.monto_capital + self.prestamo.monto_interes)
+        self.assertEqual(cuotas[0].fecha_vencimiento, datetime.date(2026, 1, 31))
+        self.assertTrue(all(c.saldo_cuota == c.monto for c in cuotas))
+
+    def test_metodo_con_tea_actualiza_la_deuda_del_prestamo(self):
+        cuotas = programar_cuotas_prestamo(self.prestamo, 12, 30, metodo=METODO_FRANCES)
+        self.prestamo.refresh_from_db()
+        self.assertEqual(self.prestamo.monto_interes, sum(c.monto_interes for c in cuotas))
+        self.assertLess(self.prestamo.monto_interes, D('1440.00'))  # Interés simple: 12% de 12000
+
+        # Marcarlo pagado no recalcula el interés simple
+        self.prestamo.estado = 'Pagado'
+        self.prestamo.save(update_fields=['estado'])
+        self.prestamo.refresh_from_db()
+        self.assertEqual(self.prestamo.monto_interes, sum(c.monto_interes for c in cuotas))
+
+        # Un save() completo (admin) sin cambiar capital ni tasa tampoco; cambiar la tasa sí
+        prestamo = Prestamo.objects.get(pk=self.prestamo.pk)
+        prestamo.prestamista = 'BBVA PERÚ'
+        prestamo.save()
+        prestamo.refresh_from_db()
+        self.assertEqual(prestamo.monto_interes, sum(c.monto_interes for c in cuotas))
+        prestamo.porcentaje_interes = D('10.00')
+        prestamo.save()
+        prestamo.refresh_from_db()
+        self.assertEqual(prestamo.monto_interes, D('1200.00'))
+
+        # Volver a lineal restituye el interés simple
+        self.prestamo.refresh_from_db()
+        programar_cuotas_prestamo(self.prestamo, 12, 30, metodo=METODO_LINEAL)
+        self.prestamo.refresh_from_db()
+        self.assertEqual(self.prestamo.monto_interes, D('1200.00'))
+
+    def test_formulario_valida_y_compara_con_lo_elegido(self):
+        self.iniciar_sesion()
+        url = reverse('configurar_cuotas_prestamo', args=[self.prestamo.id])
+        for datos in ({'num_cuotas': '0', 'frecuencia': '30'}, {'num_cuotas': '6', 'frecuencia': '30', 'tea': 'abc'}):
+            r = self.client.post(url, {**datos, 'metodo': METODO_FRANCES})
+            self.assertEqual(r.status_code, 200)
+            self.assertTrue(r.context['error'])
+        self.assertFalse(self.prestamo.cuotas.exists())
+
+        r = self.client.get(url, {'num_cuotas': '4', 'frecuencia': '90'})
+        self.assertEqual(r.context['metodo'], METODO_LINEAL)
+        bullet = next(m for m in r.context['comparativo'] if m['metodo'] == METODO_BULLET)
+        self.assertEqual(bullet['ultima_cuota'], round(12000 + bullet['total_interes'] / 4, 2))
+
+    def test_cuotas_de_factura_cuadran_al_centimo(self):
+        cuenta = self.crear_cuenta(self.crear_venta(total='100.00'))
+        cuotas = programar_cuotas_cuenta(cuenta, 3, 15, fecha_base=datetime.date(2026, 2, 1))
+        self.assertEqual([c.monto for c in cuotas], [D('33.33'), D('33.33'), D('33.34')])
+        self.assertEqual(cuotas[-1].fecha_vencimiento, datetime.date(2026, 3, 18))
+
+
+class FlujoCajaTests(BaseContableTestCase):
+
+    def test_proyeccion_por_moneda(self):
+        hoy = datetime.date(2026, 3, 1)
+        Caja.objects.create(empresa=self.empresa, nombre='Principal', moneda='PEN', saldo_actual=D('1000.00'))
+
+        # Cuenta por cobrar sin cuotas (vence en 10 días) y una vencida (cae hoy)
+        self.crear_cuenta(self.crear_venta(total='500.00', numero='1'), vencimiento=hoy + datetime.timedelta(days=10))
+        self.crear_cuenta(self.crear_venta(total='200.00', numero='2'), vencimiento=hoy - datetime.timedelta(days=5))
+        # Cuenta por pagar en USD con cuotas: solo cuentan las cuotas
+        compra = self.crear_cuenta(self.crear_venta(total='300.00', numero='3', operacion='Compra', moneda='USD'))
+        Cuota.objects.create(cuenta=compra, numero_cuota=1, monto=D('300.00'), fecha_vencimiento=hoy + datetime.timedelta(days=40))
+        # Préstamo sin cuotas: se paga todo al vencimiento
+        Prestamo.objects.create(
+            empresa=self.empresa, prestamista='BCP', monto_capital=D('400.00'), porcentaje_interes=D('10.00'),
+            fecha_prestamo=hoy, fecha_vencimiento=hoy + datetime.timedelta(days=20)
+        )
+
+        p = proyectar_flujo_caja(self.empresa.id, dias=30, hoy=hoy)
+        pen = p['PEN']
+        self.assertEqual(pen['saldo'][0], 1200.0)          # 1000 + cobro vencido
+        self.assertEqual(pen['saldo'][10], 1700.0)
+        self.assertEqual(pen['saldo_final'], 1260.0)       # - 440 del préstamo
+        self.assertEqual(pen['cortes'], [{'dias': 30, 'saldo': 1260.0}])
+        self.assertNotIn('USD', p)                         # La cuota de 40 días queda fuera del horizonte
+
+        self.assertEqual(proyectar_flujo_caja(self.empresa.id, dias=60, hoy=hoy)['USD']['saldo_final'], -300.0)
+
+
+class AntiguedadSaldosTests(BaseContableTestCase):
+
+    def test_tramos_en_soles_en_una_consulta(self):
+        hoy = datetime.date(2026, 6, 30)
+        dias = lambda n: hoy - datetime.timedelta(days=n)
+        self.crear_cuenta(self.crear_venta(total='100.00', numero='1'), vencimiento=hoy)           # por vencer
+        self.crear_cuenta(self.crear_venta(total='200.00', numero='2'), vencimiento=dias(30))      # 1-30
+        self.crear_cuenta(self.crear_venta(total='50.00', numero='3', moneda='USD', tc='3.800'),
+                          vencimiento=dias(45))                                                   # 31-60 (190 PEN)
+        self.crear_cuenta(self.crear_venta(total='80.00', numero='4'), saldo='30.00', vencimiento=dias(200))
+        self.crear_cuenta(self.crear_venta(total='70.00', numero='5'), saldo='0', vencimiento=dias(10))  # cancelada
+        self.crear_cuenta(self.crear_venta(total='999.00', numero='6', operacion='Compra'), vencimiento=dias(5))
+
+        with self.assertNumQueries(1):
+            r = reporte_antiguedad(self.empresa.id, 'Venta', hoy=hoy)
+
+        self.assertEqual(len(r['filas']), 1)
+        fila = r['filas'][0]
+        self.assertEqual(fila['entidad_id'], self.cliente.id)
+        self.assertEqual(fila['documentos'], 4)
+        self.assertEqual(fila['tramos'], [D('100.00'), D('200.00'), D('190.00'), D('0.00'), D('30.00')])
+        self.assertEqual(r['total']['total'], D('520.00'))
+
+        self.assertEqual(reporte_antiguedad(self.empresa.id, 'Compra', hoy=hoy)['total']['d1_30'], D('999.00'))
+
+
+class CronogramaVencimientosTests(BaseContableTestCase):
+
+    def setUp(self):
+        hoy = datetime.date(2026, 5, 1)
+        for n in range(3):
+            cuenta = self.crear_cuenta(self.crear_venta(total='100.00', numero=str(n)))
+            for i in range(1, 3):
+                Cuota.objects.create(cuenta=cuenta, numero_cuota=i, monto=D('50.00'),
+                                     fecha_vencimiento=hoy + datetime.timedelta(days=10 * i + n))
+        prestamo = Prestamo.objects.create(
+            empresa=self.empresa, prestamista='BCP', monto_capital=D('100.00'), porcentaje_interes=D('0'),
+            fecha_prestamo=hoy, fecha_vencimiento=hoy + datetime.timedelta(days=60)
+        )
+        Cuota.objects.create(prestamo=prestamo, numero_cuota=1, monto=D('100.00'), fecha_vencimiento=hoy)
+        Cuota.objects.create(prestamo=prestamo, numero_cuota=2, monto=D('1.00'), fecha_vencimiento=hoy, pagada=True)
+
+    def test_una_consulta_ordenada_sin_n_mas_1(self):
+        with self.assertNumQueries(1):
+            cuotas = list(cuotas_pendientes(self.empresa.id))
+            origenes = [c.cuenta.comprobante.entidad.nombre_razon_social if c.cuenta else c.prestamo.prestamista for c in cuotas]
+
+        self.assertEqual(len(cuotas), 7)
+        self.assertEqual(origenes[0], 'BCP')
+        fechas = [c.fecha_vencimiento for c in cuotas]
+        self.assertEqual(fechas, sorted(fechas))
+
+    def test_ventana_de_fechas(self):
+        cuotas = cuotas_pendientes(self.empresa.id, desde=datetime.date(2026, 5, 11), hasta=datetime.date(2026, 5, 13))
+        self.assertEqual(cuotas.count(), 3)
+
+    def test_vista_pagina_y_filtra(self):
+        self.iniciar_sesion()
+        r = self.client.get(reverse('cronograma_vencimientos'), {'desde': '2026-05-21'})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(len(r.context['cuotas']), 3)
+
+
+class PaginacionKeysetTests(BaseContableTestCase):
+
+    def setUp(self):
+        Notificacion.objects.bulk_create([
+            Notificacion(empresa=self.empresa, mensaje=f"Aviso {i}", tipo='VENTA') for i in range(7)
+        ])
+        # Fechas repetidas a propósito: el desempate por id debe mantener el orden estable
+        for i, n in enumerate(Notificacion.objects.order_by('id')):
+            Notificacion.objects.filter(id=n.id).update(fecha=datetime.datetime(2026, 1, 1 + i // 2, tzinfo=datetime.timezone.utc))
+        self.qs = Notificacion.objects.filter(empresa=self.empresa)
+        self.esperado = list(self.qs.order_by('-fecha', '-id').values_list('id', flat=True))
+
+    def ids(self, pagina):
+        return [n.id for n in pagina]
+
+    def test_recorrido_hacia_adelante_y_atras(self):
+        p1 = paginar_keyset(self.qs, 'fecha', por_pagina=3)
+        self.assertIsNone(p1.anterior)
+        with self.assertNumQueries(1):
+            p2 = paginar_keyset(self.qs, 'fecha', despues=p1.siguiente, por_pagina=3)
+        p3 = paginar_keyset(self.qs, 'fecha', despues=p2.siguiente, por_pagina=3)
+
+        self.assertEqual(self.ids(p1) + self.ids(p2) + self.ids(p3), self.esperado)
+        self.assertIsNone(p3.siguiente)
+
+        atras = paginar_keyset(self.qs, 'fecha', antes=p3.anterior, por_pagina=3)
+        self.assertEqual(self.ids(atras), self.ids(p2))
+        primera = paginar_keyset(self.qs, 'fecha', antes=atras.anterior, por_pagina=3)
+        self.assertEqual(self.ids(primera), self.ids(p1))
+        self.assertIsNone(primera.anterior)
+
+    def test_listado_muestra_enlace_a_la_siguiente_pagina(self):
+        self.iniciar_sesion()
+        for i in range(60):
+            self.crear_venta(total='10.00', numero=str(i))
+        r = self.client.get(reverse('lista_comprobantes'), {'tipo': 'Venta'})
+        self.assertEqual(len(r.context['comprobantes']), 50)
+        self.assertContains(r, 'tipo=Venta&amp;despues=')
+
+    def test_listados_paginados_renderizan(self):
+        self.iniciar_sesion()
+        for vista in ('lista_movimientos', 'lista_gastos', 'lista_notificaciones', 'lista_cotizaciones'):
+            self.assertEqual(self.client.get(reverse(vista)).status_code, 200, vista)
+
+    def test_token_invalido_vuelve_al_inicio(self):
+        self.assertEqual(self.ids(paginar_keyset(self.qs, 'fecha', despues='basura!!', por_pagina=3)), self.esperado[:3])
+
+
+class ListaComprobantesTests(BaseContableTestCase):
+
+    def consultas_para(self, filas):
+        for i in range(filas):
+            comprobante = self.crear_venta(total='118.00', numero=f"{filas}-{i}")
+            if i % 2:
+                self.crear_cuenta(comprobante, saldo='18.00')
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get(reverse('lista_comprobantes'))
+        self.assertEqual(len(r.context['comprobantes']), filas)
+        return len(ctx.captured_queries), r
+
+    def test_consultas_constantes_con_mas_filas(self):
+        self.iniciar_sesion()
+        self.client.get(reverse('lista_comprobantes'))  # la empresa activa queda en cache
+        pocas, _ = self.consultas_para(2)
+        Comprobante.objects.all().delete()
+        muchas, r = self.consultas_para(20)
+        self.assertEqual(pocas, muchas)
+        con_cuenta = [c for c in r.context['comprobantes'] if c.cuenta_id]
+        self.assertEqual(len(con_cuenta), 10)
+        self.assertEqual(con_cuenta[0].saldo_pendiente, D('18.00'))
+        self.assertEqual(con_cuenta[0].estado_cuenta, 'Pendiente')
+
+
+class BusquedaGlobalTests(BaseContableTestCase):
+
+    def titulos(self, consulta, emp_id=None):
+        return [r['titulo'] for r in buscar(emp_id or self.empresa.id, consulta)]
+
+    def test_indice_sincronizado_por_senales(self):
+        venta = self.crear_venta(numero='4521')
+        producto = Producto.objects.create(
+            empresa=self.empresa, sku='LAP-001', nombre_interno='Laptop Lenovo',
+            nombres_alternativos=['PORTÁTIL THINKPAD']
+        )
+        self.assertEqual(self.titulos('F001-4521'), ['F001-4521'])
+        self.assertEqual(self.titulos('cliente test'), ['CLIENTE TEST S.A.C.', 'F001-4521'])
+        self.assertEqual(self.titulos('portatil'), ['Laptop Lenovo'])   # Alias y sin tildes
+        self.assertEqual(self.titulos('lap'), ['Laptop Lenovo'])        # Prefijo
+
+        producto.nombre_interno = 'Notebook Lenovo'
+        producto.save()
+        self.assertEqual(self.titulos('notebook'), ['Notebook Lenovo'])
+        self.assertEqual(self.titulos('laptop'), [])
+
+        venta.delete()
+        self.assertEqual(self.titulos('4521'), [])
+
+    def test_aislado_por_empresa_y_consulta_segura(self):
+        otra = Empresa.objects.create(nombre='Otra', ruc='20000000002')
+        Entidad.objects.create(empresa=otra, tipo_entidad='Cliente', tipo_documento='RUC',
+                               numero_documento='20999999999', nombre_razon_social='CLIENTE AJENO')
+        self.assertEqual(self.titulos('cliente'), ['CLIENTE TEST S.A.C.'])
+        self.assertEqual(self.titulos('cliente', emp_id=otra.id), ['CLIENTE AJENO'])
+        self.assertEqual(self.titulos('" OR * NEAR('), [])
+
+    def test_reindexar_tras_carga_masiva(self):
+        Entidad.objects.bulk_create([
+            Entidad(empresa=self.empresa, tipo_entidad='Proveedor', tipo_documento='RUC',
+                    numero_documento=f"2055{i:07d}", nombre_razon_social=f"PROVEEDOR MASIVO {i}")
+            for i in range(5)
+        ])
+        self.assertEqual(self.titulos('masivo'), [])
+        reindexar(self.empresa.id)
+        self.assertEqual(len(self.titulos('masivo')), 5)
+        self.assertEqual(IndiceBusqueda.objects.filter(empresa=self.empresa).count(), 6)
+
+    def test_renombrar_entidad_reindexa_sus_comprobantes(self):
+        self.crear_venta(numero='77')
+        self.cliente.nombre_razon_social = 'NUEVO NOMBRE S.A.'
+        self.cliente.save()
+        self.assertEqual(self.titulos('nuevo nombre'), ['NUEVO NOMBRE S.A.', 'F001-77'])
+        self.assertEqual(self.titulos('cliente test'), [])
+
+    def test_migracion_indexa_lo_existente(self):
+        poblar_indice = importlib.import_module('core.migrations.0039_poblar_indice_busqueda').poblar_indice
+        self.crear_venta(numero='88')
+        IndiceBusqueda.objects.filter(tipo='comprobante').delete()
+        poblar_indice(django_apps, None)
+        self.assertEqual(self.titulos('F001-88'), ['F001-88'])
+        self.assertEqual(IndiceBusqueda.objects.filter(tipo='entidad').count(), 1)  # Sin duplicar lo indexado
+
+    def test_vista(self):
+        self.iniciar_sesion()
+        r = self.client.get(reverse('busqueda_global'), {'q': '20111111111'})
+        self.assertContains(r, 'CLIENTE TEST S.A.C.')
+
+
+class RegistroComprasVentasTests(BaseContableTestCase):
+
+    def setUp(self):
+        self.crear_venta(total='118.00', numero='1', fecha=datetime.date(2026, 2, 3))
+        self.crear_venta(total='100.00', numero='2', fecha=datetime.date(2026, 2, 20), moneda='USD', tc='3.750')
+        self.crear_venta(total='50.00', numero='3', fecha=datetime.date(2026, 3, 1))
+        self.crear_venta(total='70.00', numero='4', fecha=datetime.date(2026, 2, 5), operacion='Compra')
+
+    def test_filas_del_periodo_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            filas = list(filas_registro(self.empresa.id, 'Venta', datetime.date(2026, 2, 1), datetime.date(2026, 2, 28)))
+        self.assertEqual([f[3] for f in filas], ['1', '2'])
+        self.assertEqual(filas[1][4], '20111111111')
+        self.assertEqual(filas[1][10], '100.00')
+        self.assertEqual(filas[1][14], '375.00')   # Total PEN
+
+    def test_descarga_csv_y_xlsx(self):
+        self.iniciar_sesion()
+        url = reverse('exportar_registro')
+        r = self.client.get(url, {'operacion': 'Venta', 'periodo': '2026-02', 'formato': 'csv'})
+        self.assertTrue(r.streaming)
+        lineas = list(csv.reader(io.StringIO(b''.join(r.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual(len(lineas), 3)
+        self.assertEqual(lineas[0][0], 'Fecha Emisión')
+
+        r = self.client.get(url, {'operacion': 'Compra', 'periodo': '2026-02', 'formato': 'xlsx'})
+        with zipfile.ZipFile(io.BytesIO(b''.join(r.streaming_content))) as libro:
+            hoja = libro.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(hoja.count('<row>'), 2)
+        self.assertIn('<v>70.00</v>', hoja)
+
+        self.assertEqual(self.client.get(url, {'operacion': 'Venta', 'periodo': '2026-13'}).status_code, 400)
+
+    def test_libros_ple(self):
+        febrero = (datetime.date(2026, 2, 1), datetime.date(2026, 2, 28))
+        ventas = list(lineas_ple(self.empresa.id, LIBRO_VENTAS, *febrero))
+        compras = list(lineas_ple(self.empresa.id, LIBRO_COMPRAS, *febrero))
+        self.assertEqual(len(ventas), 2)
+        self.assertEqual(len(compras), 1)
+
+        campos = ventas[1].rstrip('\r\n').split('|')
+        self.assertEqual(len(campos) - 1, 35)  # 35 campos + '|' final
+        self.assertEqual(campos[:3], ['20260200', campos[1], 'M2'])
+        self.assertEqual((campos[5], campos[9], campos[10]), ('01', '6', '20111111111'))
+        self.assertEqual((campos[24], campos[25], campos[26]), ('375.00', 'USD', '3.750'))  # Total en soles
+        self.assertEqual(len(compras[0].rstrip('\r\n').split('|')) - 1, 42)
+
+        self.iniciar_sesion()
+        r = self.client.get(reverse('descargar_ple'), {'periodo': '2026-02'})
+        with zipfile.ZipFile(io.BytesIO(b''.join(r.streaming_content))) as zf:
+            self.assertEqual(sorted(zf.namelist()), [
+                'LE2000000000120260200080100001111.txt', 'LE2000000000120260200140100001111.txt'
+            ])
+
+
+class KardexTests(BaseContableTestCase):
+
+    def setUp(self):
+        self.producto = Producto.objects.create(empresa=self.empresa, sku='K-1', nombre_interno='PRODUCTO KARDEX')
+        compra = self.crear_venta(total='118.00', numero='10', fecha=datetime.date(2026, 1, 10), operacion='Compra')
+        venta = self.crear_venta(total='59.00', numero='11', fecha=datetime.date(2026, 1, 15))
+        for comprobante, cantidad in ((compra, '10'), (venta, '3')):
+            detalle = ComprobanteDetalle.objects.create(
+                comprobante=comprobante, producto=self.producto, cantidad=D(cantidad),
+                precio_unitario=D('10.00'), subtotal_linea=D(cantidad) * 10
+            )
+            registrar_comprobante(comprobante, detalle)
+
+    def test_saldo_acumulado_en_sql_sobre_el_libro(self):
+        usuario = self.iniciar_sesion()
+        ajuste = AjusteStock.objects.create(
+            empresa=self.empresa, producto=self.producto, tipo='Salida', cantidad=D('2'),
+            motivo='Merma', usuario=usuario
+        )
+        registrar_movimiento(self.producto, D('-2'), 'AJUSTE', fecha='2026-01-12', ajuste=ajuste, referencia='Merma')
+        registrar_movimiento(self.producto, D('1'), 'DEVOLUCION', fecha='2026-01-20', referencia='Devolución por S/ 10')
+
+        kardex = Kardex(self.producto.id, self.empresa.id)
+        self.assertEqual(kardex.count(), 4)
+        with self.assertNumQueries(1):  # página con ventana, documento, entidad y usuario en la misma consulta
+            filas = kardex[0:4]
+        # Lo más reciente primero, el saldo se acumula en orden cronológico
+        self.assertEqual([f['documento'] for f in filas], ['DEVOLUCIÓN DE CLIENTE', 'F001-11', 'AJUSTE MANUAL', 'F001-10'])
+        self.assertEqual([f['saldo_despues'] for f in filas], [D('6.00'), D('5.00'), D('8.00'), D('10.00')])
+        self.assertEqual(filas[2]['entidad'], 'Usuario: contador')
+        self.assertEqual(filas[2]['fecha'], datetime.date(2026, 1, 12))
+        self.assertEqual(kardex[3:4][0]['saldo_despues'], D('10.00'))  # la ventana corre antes del LIMIT
+        # El saldo del kardex es el stock del producto
+        self.producto.refresh_from_db()
+        self.assertEqual(filas[0]['saldo_despues'], self.producto.stock_actual)
+
+    def test_vista_paginada(self):
+        self.iniciar_sesion()
+        r = self.client.get(reverse('producto_kardex', args=[self.producto.id]))
+        self.assertEqual(r.status_code, 200)
+        pagina = r.context['movimientos']
+        self.assertEqual(pagina.paginator.count, 2)
+        self.assertEqual([m['tipo'] for m in pagina], ['Salida', 'Entrada'])
+
+
+class CostoPromedioTests(BaseContableTestCase):
+
+    def setUp(self):
+        self.producto = Producto.objects.create(empresa=self.empresa, sku='C-1', nombre_interno='PRODUCTO COSTEO')
+
+    def comprar(self, cantidad, precio, fecha, moneda='PEN', tc='1.000', operacion='Compra'):
+        comprobante = self.crear_venta(
+            total='100.00', numero=f"{fecha:%m%d}{operacion[0]}", fecha=fecha, moneda=moneda, tc=tc, operacion=operacion
+        )
+        detalle = ComprobanteDetalle.objects.create(
+            comprobante=comprobante, producto=self.producto, cantidad=D(cantidad),
+            precio_unitario=D(precio), subtotal_linea=D(cantidad) * D(precio)
+        )
+        registrar_comprobante(comprobante, detalle)
+        return comprobante
+
+    def test_promedio_incremental(self):
+        p = self.producto
+        registrar_entrada(p, D('10'), D('10'))
+        registrar_entrada(p, D('10'), D('20'))
+        self.assertEqual((p.stock_actual, p.costo_promedio, p.valor_inventario), (D('20'), D('15.0000'), D('300.00')))
+        self.assertEqual(registrar_salida(p, D('5')), D('75.00'))
+        self.assertEqual((p.costo_promedio, p.valor_inventario), (D('15.0000'), D('225.00')))
+        registrar_costo_adicional(p, D('15'))  # flete sobre 15 unidades
+        self.assertEqual(p.costo_promedio, D('16.0000'))
+
+    def test_reconstruccion_y_valorizacion_a_fecha(self):
+        self.comprar('10', '10.00', datetime.date(2026, 1, 5))
+        self.comprar('10', '5.00', datetime.date(2026, 1, 10), moneda='USD', tc='4.000')   # S/ 20 por unidad
+        self.comprar('5', '99.00', datetime.date(2026, 1, 20), operacion='Venta')
+        # Costo corrompido (ej. un save() con datos viejos): se recupera del libro
+        Producto.objects.filter(id=self.producto.id).update(costo_promedio=D('20'), valor_inventario=D('400'))
+
+        self.assertEqual(recalcular_costos(self.empresa.id), 1)
+        self.producto.refresh_from_db()
+        self.assertEqual((self.producto.costo_promedio, self.producto.valor_inventario), (D('15.0000'), D('225.00')))
+
+        al_6 = valorizacion_almacen(self.empresa.id, fecha=datetime.date(2026, 1, 6))
+        self.assertEqual((al_6['filas'][0]['stock'], al_6['total']), (D('10.00'), D('100.00')))
+        self.assertEqual(valorizacion_almacen(self.empresa.id)['total'], D('225.00'))
+
+    def test_recalcular_respeta_movimientos_sin_documento(self):
+        registrar_movimiento(self.producto, D('10'), 'SALDO_INICIAL', fecha='2026-01-02', costo_unitario=D('10'))
+        registrar_movimiento(self.producto, D('2'), 'DEVOLUCION', fecha='2026-01-08')
+        self.producto.refresh_from_db()
+        antes = (self.producto.costo_promedio, self.producto.valor_inventario)
+
+        recalcular_costos(self.empresa.id)
+        self.producto.refresh_from_db()
+        self.assertEqual((self.producto.costo_promedio, self.producto.valor_inventario), antes)
+        self.assertEqual(antes, (D('10.0000'), D('120.00')))
+
+    def test_ajuste_y_reporte_por_vista(self):
+        self.iniciar_sesion()
+        registrar_entrada(self.producto, D('4'), D('12.50'))
+        self.producto.save()
+        self.client.post(reverse('ajustar_stock', args=[self.producto.id]), {'tipo': 'Egreso', 'cantidad': '1', 'motivo': 'Merma'})
+        self.producto.refresh_from_db()
+        self.assertEqual((self.producto.stock_actual, self.producto.valor_inventario), (D('3.00'), D('37.50')))
+
+        r = self.client.get(reverse('valorizacion_inventario'))
+        self.assertEqual(r.context['reporte']['total'], D('37.50'))
+
+
+class LibroStockTests(BaseContableTestCase):
+
+    def setUp(self):
+        self.producto = Producto.objects.create(empresa=self.empresa, sku='L-1', nombre_interno='PRODUCTO LIBRO')
+
+    def test_movimiento_actualiza_stock_con_expresion_f(self):
+        otra_copia = Producto.objects.get(id=self.producto.id)
+        registrar_movimiento(self.producto, D('10'), 'COMPRA', fecha='2026-01-05', costo_unitario=D('4.00'))
+        # Una instancia vieja no pisa el stock: el UPDATE suma sobre el valor de la base
+        registrar_movimiento(otra_copia, D('-3'), 'VENTA', fecha=datetime.date(2026, 1, 6))
+        self.producto.refresh_from_db()
+        self.assertEqual((self.producto.stock_actual, self.producto.valor_inventario), (D('7.00'), D('28.00')))
+
+        movimiento = MovimientoStock.objects.filter(producto=self.producto).latest('id')
+        self.assertEqual((movimiento.cantidad, movimiento.costo_unitario), (D('-3.00'), D('4.0000')))
+        with self.assertRaises(ValueError):
+            movimiento.save()
+        with self.assertRaises(ValueError):
+            movimiento.delete()
+
+    def test_borrar_comprobante_revierte_en_el_libro(self):
+        compra = self.crear_venta(total='50.00', numero='20', operacion='Compra')
+        detalle = ComprobanteDetalle.objects.create(
+            comprobante=compra, producto=self.producto, cantidad=D('5'), precio_unitario=D('10.00'), subtotal_linea=D('50.00')
+        )
+        registrar_comprobante(compra, detalle)
+        compra.delete()
+
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, D('0.00'))
+        self.assertEqual(
+            list(MovimientoStock.objects.filter(producto=self.producto).order_by('id').values_list('origen', 'cantidad', 'comprobante')),
+            [('COMPRA', D('5.00'), None), ('ANULA_COMPRA', D('-5.00'), None)]
+        )
+
+    def test_flete_con_la_fila_bloqueada_y_movimientos_auditados(self):
+        usuario = Usuario.objects.create_user(username='almacen', password='x')
+        with actuando_como(usuario):
+            registrar_movimiento(self.producto, D('10'), 'COMPRA', costo_unitario=D('4.00'), referencia='F001-1')
+            # Instancia vieja: el flete se aplica sobre el valor de la base, no sobre el de la instancia
+            viejo = Producto.objects.get(id=self.producto.id)
+            registrar_movimiento(self.producto, D('10'), 'COMPRA', costo_unitario=D('6.00'))
+            inventario.registrar_costo_adicional(viejo, D('20.00'), costo_referencial=D('1.00'))
+        self.producto.refresh_from_db()
+        self.assertEqual(
+            (self.producto.stock_actual, self.producto.valor_inventario, self.producto.costo_promedio),
+            (D('20.00'), D('120.00'), D('6.0000'))
+        )
+        self.assertEqual(self.producto.precio_compra_referencial, D('1.00'))
+        motivos = list(LogAuditoria.objects.filter(tabla_afectada='Producto').order_by('id_log').values_list('motivo_cambio', flat=True))
+        self.assertEqual(len(motivos), 3)
+        self.assertIn('stock 0.00 a 10.00 (F001-1)', motivos[0])
+        self.assertIn('Costo adicional S/ 20.00', motivos[2])
+
+    def test_conciliacion_desde_el_libro(self):
+        registrar_movimiento(self.producto, D('8'), 'COMPRA', costo_unitario=D('2.50'))
+        Producto.objects.filter(id=self.producto.id).update(stock_actual=D('99'))
+        self.assertEqual(diferencias_stock(self.empresa.id), [(self.producto.id, D('99.00'), D('8.00'))])
+
+        self.assertEqual(len(conciliar_stock(self.empresa.id)), 1)
+        self.producto.refresh_from_db()
+        self.assertEqual((self.producto.stock_actual, self.producto.valor_inventario), (D('8.00'), D('20.00')))
+        self.assertEqual(diferencias_stock(self.empresa.id), [])
+
+
+class SaldosInventarioTests(BaseContableTestCase):
+
+    def setUp(self):
+        self.producto = Producto.objects.create(empresa=self.empresa, sku='S-1', nombre_interno='PRODUCTO SALDOS')
+
+    def mover(self, cantidad, precio, fecha, operacion='Compra'):
+        comprobante = self.crear_venta(total='100.00', numero=f"{fecha:%m%d}{operacion[0]}", fecha=fecha, operacion=operacion)
+        detalle = ComprobanteDetalle.objects.create(
+            comprobante=comprobante, producto=self.producto, cantidad=D(cantidad),
+            precio_unitario=D(precio), subtotal_linea=D(cantidad) * D(precio)
+        )
+        registrar_comprobante(comprobante, detalle)
+
+    def test_fotos_mensuales_y_stock_a_fecha(self):
+        self.mover('10', '10.00', datetime.date(2026, 1, 5))
+        self.mover('4', '50.00', datetime.date(2026, 1, 20), operacion='Venta')
+        self.mover('10', '16.00', datetime.date(2026, 2, 3))
+        self.mover('2', '50.00', datetime.date(2026, 3, 8), operacion='Venta')
+
+        self.assertEqual(generar_saldos(self.empresa.id, '2026-01', '2026-02'), 2)
+        self.assertEqual(
+            list(SaldoInventarioMensual.objects.filter(producto=self.producto).order_by('fecha_corte')
+                 .values_list('periodo', 'cantidad', 'costo_promedio', 'valor')),
+            [('2026-01', D('6.00'), D('10.0000'), D('60.00')), ('2026-02', D('16.00'), D('13.7500'), D('220.00'))]
+        )
+
+        # Foto de febrero + venta del 8 de marzo: corte, foto, libro del rango y nombres, sin consultas por producto
+        with CaptureQueriesContext(connection) as ctx:
+            reporte = saldos_a_fecha(self.empresa.id, datetime.date(2026, 3, 31))
+        self.assertEqual(len(ctx.captured_queries), 4)
+        self.assertEqual(reporte['corte'], datetime.date(2026, 2, 28))
+        self.assertEqual((reporte['filas'][0]['stock'], reporte['total']), (D('14.00'), D('192.50')))
+
+        # Antes de la primera foto: solo el libro
+        al_10 = saldos_a_fecha(self.empresa.id, datetime.date(2026, 1, 10))
+        self.assertIsNone(al_10['corte'])
+        self.assertEqual(al_10['filas'][0]['stock'], D('10.00'))
+
+    def test_costo_a_fecha_sigue_el_promedio_despues_de_la_foto(self):
+        self.mover('10', '10.00', datetime.date(2026, 1, 5))
+        generar_saldos(self.empresa.id, '2026-01', '2026-01')
+        self.mover('10', '20.00', datetime.date(2026, 2, 10))
+
+        al_15 = saldos_a_fecha(self.empresa.id, datetime.date(2026, 2, 15))
+        self.assertEqual(al_15['corte'], datetime.date(2026, 1, 31))
+        self.assertEqual((al_15['filas'][0]['costo'], al_15['total']), (D('15.0000'), D('300.00')))
+
+        # Sin fotos: el costo de esa fecha, no el vigente
+        SaldoInventarioMensual.objects.all().delete()
+        al_31 = saldos_a_fecha(self.empresa.id, datetime.date(2026, 1, 31))
+        self.assertEqual((al_31['filas'][0]['costo'], al_31['total']), (D('10.0000'), D('100.00')))
+
+    def test_movimiento_atrasado_invalida_las_fotos(self):
+        self.mover('10', '10.00', datetime.date(2026, 1, 5))
+        generar_saldos(self.empresa.id, '2026-01', '2026-02')
+        self.assertEqual(SaldoInventarioMensual.objects.count(), 2)
+
+        # Venta registrada hoy con fecha de enero: las fotos de enero en adelante ya no valen
+        self.mover('4', '50.00', datetime.date(2026, 1, 20), operacion='Venta')
+        self.assertFalse(SaldoInventarioMensual.objects.exists())
+        reporte = saldos_a_fecha(self.empresa.id, datetime.date(2026, 2, 15))
+        self.assertEqual((reporte['corte'], reporte['filas'][0]['stock']), (None, D('6.00')))
+
+        # Uno posterior a la última foto no la toca
+        generar_saldos(self.empresa.id, '2026-01', '2026-01')
+        self.mover('1', '50.00', datetime.date(2026, 2, 3), operacion='Venta')
+        self.assertEqual(SaldoInventarioMensual.objects.count(), 1)
+        self.assertEqual(saldos_a_fecha(self.empresa.id, datetime.date(2026, 2, 15))['filas'][0]['stock'], D('5.00'))
+
+    def test_fotos_con_saldo_inicial_devolucion_y_flete(self):
+        registrar_movimiento(self.producto, D('5'), 'SALDO_INICIAL', fecha='2026-01-02', costo_unitario=D('8.00'))
+        self.mover('5', '12.00', datetime.date(2026, 1, 5))
+        registrar_movimiento(self.producto, D('2'), 'DEVOLUCION', fecha='2026-01-20')
+        inventario.registrar_costo_adicional(self.producto, D('24.00'), fecha='2026-01-25')
+
+        generar_saldos(self.empresa.id, '2026-01', '2026-01')
+        foto = SaldoInventarioMensual.objects.get(producto=self.producto)
+        self.producto.refresh_from_db()
+        # 5@8 + 5@12 + 2 al promedio (10) + 24 de flete = 144 / 12; la foto coincide con lo registrado
+        self.assertEqual((foto.cantidad, foto.costo_promedio, foto.valor), (D('12.00'), D('12.0000'), D('144.00')))
+        self.assertEqual((self.producto.costo_promedio, self.producto.valor_inventario), (foto.costo_promedio, foto.valor))
+        # El flete no aparece como movimiento en el kardex
+        self.assertEqual(Kardex(self.producto.id, self.empresa.id).count(), 3)
+
+    def test_migracion_completa_costos_y_fletes_del_libro(self):
+        completar_costos = importlib.import_module('core.migrations.0040_libro_costos').completar_costos
+        self.mover('10', '10.00', datetime.date(2026, 1, 5))
+        compra = Comprobante.objects.get(operacion='Compra')
+        Comprobante.objects.filter(pk=compra.pk).update(subtotal=D('100.00'))
+        self.crear_venta(total='23.60', numero='F1', fecha=datetime.date(2026, 1, 6), operacion='Compra',
+                         es_flete=True, comprobante_asociado=compra)
+        self.mover('4', '50.00', datetime.date(2026, 1, 20), operacion='Venta')
+        # Como lo dejó 0035: filas sin costo y sin el flete
+        MovimientoStock.objects.update(costo_unitario=0)
+
+        completar_costos(django_apps, None)
+        self.assertEqual(
+            list(MovimientoStock.objects.order_by('fecha', 'id').values_list('origen', 'costo_unitario')),
+            [('COMPRA', D('10.0000')), ('COSTO_ADICIONAL', D('20.0000')), ('VENTA', D('12.0000'))]
+        )
+        self.assertEqual(saldos_a_fecha(self.empresa.id, datetime.date(2026, 1, 31))['total'], D('72.00'))
+
+    def test_regenerar_reemplaza_y_vista_usa_las_fotos(self):
+        self.mover('5', '8.00', datetime.date(2026, 1, 5))
+        generar_saldos(self.empresa.id, '2026-01', '2026-01')
+        generar_saldos(self.empresa.id, '2026-01', '2026-01')
+        self.assertEqual(SaldoInventarioMensual.objects.filter(empresa=self.empresa).count(), 1)
+
+        self.iniciar_sesion()
+        r = self.client.get(reverse('valorizacion_inventario'), {'fecha': '2026-02-15'})
+        self.assertEqual(r.context['reporte']['total'], D('40.00'))
+
+
+class TrazabilidadIgvTests(BaseContableTestCase):
+
+    def test_resumen_mensual_en_soles(self):
+        self.crear_venta(total='118.00', fecha=datetime.date(2026, 1, 10), numero='1')                          # IGV 18.00
+        self.crear_venta(total='11.80', fecha=datetime.date(2026, 1, 20), numero='2', moneda='USD', tc='3.755')  # IGV 1.80 -> 6.76
+        self.crear_venta(total='59.00', fecha=datetime.date(2026, 1, 25), numero='3', operacion='Compra')         # IGV 9.00
+        self.crear_venta(total='236.00', fecha=datetime.date(2026, 2, 3), numero='4')                           # IGV 36.00
+        self.crear_venta(total='500.00', fecha=datetime.date(2026, 2, 4), numero='5', estado_sunat='INTERNO')
+
+        resumen = resumen_mensual(self.empresa.id)
+        self.assertEqual(
+            [(m['mes'], m['debito'], m['credito'], m['neto']) for m in resumen['meses']],
+            [(datetime.date(2026, 2, 1), D('36.00'), D('0.00'), D('36.00')),
+             (datetime.date(2026, 1, 1), D('24.76'), D('9.00'), D('15.76'))]
+        )
+        self.assertEqual((resumen['debito'], resumen['credito'], resumen['neto']), (D('60.76'), D('9.00'), D('51.76')))
+
+    def test_vista_paginada_sin_consultas_por_fila(self):
+        for n in range(60):
+            self.crear_venta(total='118.00', fecha=datetime.date(2026, 3, 1) + datetime.timedelta(days=n % 28), numero=str(n))
+        self.iniciar_sesion()
+
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get(reverse('trazabilidad_igv'), {'periodo': '2026-03'})
+        self.assertEqual(len(r.context['reporte']), 50)
+        self.assertEqual(r.context['total_debito'], D('1080.00'))
+        self.assertIsNotNone(r.context['pagina'].siguiente)
+        # Sesión, usuario, resumen agrupado y página de detalle (más el contexto global de la plantilla)
+        self.assertLess(len(ctx.captured_queries), 15)
+        self.assertFalse([q for q in ctx.captured_queries if 'core_entidad' in q['sql'] and 'JOIN' not in q['sql']])
+
+
+class PerfilBaseDatosTests(TestCase):
+
+    def test_conexiones_persistentes_con_verificacion(self):
+        self.assertTrue(settings.DATABASES['default']['CONN_HEALTH_CHECKS'])
+        self.assertGreaterEqual(settings.DATABASES['default']['CONN_MAX_AGE'], 0)
+
+    def test_sonda_de_salud(self):
+        r = self.client.get(reverse('salud'))
+        self.assertEqual(r.json(), {'estado': 'ok', 'bd': connection.vendor})
+
+
+class ReplicaReportesTests(BaseContableTestCase):
+
+    def test_router_lee_de_la_replica_solo_dentro_de_la_vista(self):
+        router = RouterReplica()
+        self.assertIsNone(router.db_for_read(Producto))
+        with leyendo_de(ALIAS_REPORTES):
+            self.assertEqual(router.db_for_read(Producto), ALIAS_REPORTES)
+            self.assertEqual(router.db_for_read(Session), 'default')
+            self.assertEqual(router.db_for_write(Producto), 'default')
+        self.assertIsNone(router.db_for_read(Producto))
+        self.assertFalse(router.allow_migrate(ALIAS_REPORTES, 'core'))
+
+    def test_alias_propio_de_cada_tarea(self):
+        router = RouterReplica()
+
+        async def leer(alias, espera):
+            with leyendo_de(alias):
+                await asyncio.sleep(espera)
+                return router.db_for_read(Producto)
+
+        async def ambas():
+            return await asyncio.gather(leer(ALIAS_REPORTES, 0.02), leer(None, 0.01))
+
+        # Dos requests en el mismo hilo no se pisan el alias
+        self.assertEqual(asyncio.run(ambas()), [ALIAS_REPORTES, None])
+        self.assertIsNone(router.db_for_read(Producto))
+
+    def test_lee_del_primario_tras_escribir(self):
+        request = RequestFactory().get('/')
+        request.session = {}
+        replica = {**settings.DATABASES, ALIAS_REPORTES: settings.DATABASES['default']}
+        with warnings.catch_warnings(), override_settings(DATABASES=replica, REPLICA_RETRASO_MAX=5):
+            warnings.simplefilter('ignore')
+            self.assertEqual(alias_para(request), ALIAS_REPORTES)
+            marcar_escritura(request)
+            self.assertIsNone(alias_para(request))
+            request.session[CLAVE_SESION] -= 10
+            self.assertEqual(alias_para(request), ALIAS_REPORTES)
+
+    def test_vista_marcada_sin_replica_usa_el_primario(self):
+        self.iniciar_sesion()
+        r = self.client.get(reverse('trazabilidad_igv'))
+        self.assertEqual(r.status_code, 200)
+
+
+class EmpresaActivaTests(BaseContableTestCase):
+
+    def consultas_a_empresa(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get(url)
+        return r, [q for q in ctx.captured_queries if 'FROM "core_empresa"' in q['sql']]
+
+    def test_empresa_del_request_sale_del_cache(self):
+        self.iniciar_sesion()
+        self.client.get(reverse('valorizacion_inventario'))
+        r, consultas = self.consultas_a_empresa(reverse('valorizacion_inventario'))
+        self.assertEqual(r.wsgi_request.empresa, self.empresa)
+        self.assertEqual(consultas, [])
+
+        # Guardar la empresa invalida el cache
+        self.empresa.nombre = 'FG Renombrada'
+        self.empresa.save()
+        r, consultas = self.consultas_a_empresa(reverse('valorizacion_inventario'))
+        self.assertEqual(r.wsgi_request.empresa.nombre, 'FG Renombrada')
+        self.assertEqual(len(consultas), 1)
+
+    def test_empresa_no_permitida_vuelve_a_seleccionar(self):
+        usuario = self.iniciar_sesion()
+        usuario.empresas_permitidas.remove(self.empresa)
+
+        r = self.client.get(reverse('valorizacion_inventario'))
+        self.assertRedirects(r, reverse('seleccionar_empresa'), fetch_redirect_response=False)
+        self.assertNotIn('empresa_id', self.client.session)
+        # Tampoco se puede elegir por POST
+        r = self.client.post(reverse('seleccionar_empresa'), {'empresa_id': self.empresa.id})
+        self.assertEqual(r.status_code, 404)
+
+
+class CampanitaNotificacionesTests(BaseContableTestCase):
+
+    def consultas_notificacion(self):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get(reverse('valorizacion_inventario'))
+        self.assertContains(r, 'Notificaciones')
+        return r, [q for q in ctx.captured_queries if 'core_notificacion' in q['sql'] or 'notificaciones_no_leidas' in q['sql']]
+
+    def test_contador_y_recientes_desde_el_cache(self):
+        self.iniciar_sesion()
+        self.consultas_notificacion()
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(7):
+                crear_notificacion_interna(self.empresa, f"Alerta {i}", 'VENTA')
+        self.empresa.refresh_from_db()
+        self.assertEqual(self.empresa.notificaciones_no_leidas, 7)
+
+        r, consultas = self.consultas_notificacion()
+        self.assertEqual(len(consultas), 2)
+        self.assertEqual(r.context['n_count'](), 7)
+        self.assertEqual(len(r.context['n_alertas']()), 5)
+        _, consultas = self.consultas_notificacion()
+        self.assertEqual(consultas, [])
+
+    def test_marcar_leidas_deja_la_campanita_en_cero(self):
+        self.iniciar_sesion()
+        crear_notificacion_interna(self.empresa, "Alerta", 'PRECIO')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('marcar_notificaciones_leidas'))
+        self.assertFalse(Notificacion.objects.filter(leida=False).exists())
+
+        r, consultas = self.consultas_notificacion()
+        self.assertEqual(consultas, [])
+        self.assertEqual(r.context['n_count'](), 0)
+
+
+    def test_edicion_y_borrado_fuera_de_los_servicios(self):
+        self.iniciar_sesion()
+        with self.captureOnCommitCallbacks(execute=True):
+            primera = crear_notificacion_interna(self.empresa, "Alerta 1", 'VENTA')
+            crear_notificacion_interna(self.empresa, "Alerta 2", 'VENTA')
+        self.assertEqual(self.consultas_notificacion()[0].context['n_count'](), 2)
+
+        # Como desde el admin: save() y delete() de la instancia
+        with self.captureOnCommitCallbacks(execute=True):
+            primera.leida = True
+            primera.save()
+        self.assertEqual(self.consultas_notificacion()[0].context['n_count'](), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Notificacion.objects.get(leida=False).delete()
+            primera.delete()
+        self.empresa.refresh_from_db()
+        self.assertEqual(self.empresa.notificaciones_no_leidas, 0)
+        self.assertEqual(self.consultas_notificacion()[0].context['n_count'](), 0)
+
+
+@override_settings(SESSION_ENGINE='core.sesiones')
+class SesionesTests(BaseContableTestCase):
+
+    def test_sesion_desde_el_cache_con_metricas(self):
+        self.iniciar_sesion()
+        self.client.get(reverse('valorizacion_inventario'))
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get(reverse('valorizacion_inventario'))
+        self.assertFalse([q for q in ctx.captured_queries if 'django_session' in q['sql']])
+        self.assertIn('sesion-lectura;dur=', r.headers['Server-Timing'])
+
+    def test_aviso_de_sesion_pesada_por_clave(self):
+        self.iniciar_sesion()
+        session = self.client.session
+        session['temp_venta'] = {'items': ['x' * 100] * 300}
+        session.save()
+        self.assertEqual(next(iter(session.tamanos_por_clave())), 'temp_venta')
+
+        with self.assertLogs('core.middleware', level='WARNING') as logs:
+            self.client.get(reverse('valorizacion_inventario'))
+        self.assertIn('temp_venta', logs.output[0])
+
+    @override_settings(SESSION_ENGINE='core.sesiones_db')
+    def test_metricas_sin_cache_compartido_en_la_misma_unidad(self):
+        self.iniciar_sesion()
+        session = self.client.session
+        session['temp_venta'] = {'items': ['x' * 100] * 300}
+        session.save()
+        escritos = session.metricas['escritura_bytes']
+
+        with self.assertLogs('core.middleware', level='WARNING'):
+            r = self.client.get(reverse('valorizacion_inventario'))
+        self.assertIn('sesion-lectura;dur=', r.headers['Server-Timing'])
+        # Lo leído y lo escrito se miden igual: la misma sesión pesa lo mismo en ambos sentidos
+        self.assertIn(f'desc="{escritos} B"', r.headers['Server-Timing'].split(',')[0])
+
+
+class PermisosTests(BaseContableTestCase):
+
+    def setUp(self):
+        self.rol = Rol.objects.create(nombre='Admin', permisos={'ver_utilidad': True})
+
+    def test_objeto_inmutable_y_chequeos(self):
+        permisos = Permisos(1, 'Vendedor', {'ver_utilidad': True})
+        self.assertTrue(permisos.tiene('ver_utilidad'))
+        self.assertTrue(permisos.ver_utilidad)
+        self.assertFalse(permisos.has_perm('eliminar'))
+        self.assertFalse(permisos.es_admin)
+        with self.assertRaises(AttributeError):
+            permisos.es_admin = True
+        with self.assertRaises(TypeError):
+            permisos.permisos['eliminar'] = True
+
+    def test_version_descartada_por_el_cache_no_revive_permisos_viejos(self):
+        usuario = self.iniciar_sesion()
+        usuario.rol = self.rol
+        usuario.save()
+        self.assertTrue(permisos_de(Usuario.objects.get(pk=usuario.pk)).es_admin)
+        self.rol.nombre = 'Vendedor'
+        self.rol.save()
+        # Como si el cache hubiera descartado las versiones (culling de LocMem, LRU de Redis)
+        cache.delete_many([permisos.VERSION_ROLES, permisos._version_usuario(usuario.pk)])
+        self.assertFalse(permisos_de(Usuario.objects.get(pk=usuario.pk)).es_admin)
+
+    def test_admin_required_sin_consultar_el_rol_y_con_invalidacion(self):
+        usuario = self.iniciar_sesion()
+        usuario.rol = self.rol
+        usuario.save()
+
+        self.assertEqual(self.client.get(reverse('lista_auditoria')).status_code, 200)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(reverse('lista_auditoria')).status_code, 200)
+        self.assertFalse([q for q in ctx.captured_queries if 'core_rol' in q['sql']])
+
+        # Cambiar el rol sube la versión: el cache viejo deja de usarse
+        self.rol.nombre = 'Vendedor'
+        self.rol.save()
+        self.assertEqual(self.client.get(reverse('lista_auditoria')).status_code, 403)
+
+
+class AuditoriaBufferTests(BaseContableTestCase):
+
+    def setUp(self):
+        self.usuario = self.iniciar_sesion()
+        self.enterContext(actuando_como(self.usuario))
+
+    def inserts_log(self, ctx):
+        return [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "core_logauditoria"')]
+
+    def test_un_solo_insert_y_sin_lo_revertido(self):
+        with CaptureQueriesContext(connection) as ctx:
+            with auditoria.agrupando():
+                with self.captureOnCommitCallbacks(execute=True):
+                    for i in range(3):
+                        self.crear_venta(numero=str(i))
+                    with self.assertRaises(ValueError), transaction.atomic():
+                        self.crear_venta(numero='revertido')
+                        raise ValueError
+                self.assertFalse(LogAuditoria.objects.exists())
+
+        self.assertEqual(len(self.inserts_log(ctx)), 1)
+        self.assertEqual(
+            sorted(LogAuditoria.objects.values_list('accion', 'tabla_afectada')),
+            [('INSERT', 'Comprobante')] * 3
+        )
+
+    def test_fuera_de_un_request_se_guarda_al_momento(self):
+        self.crear_venta()
+        self.assertEqual(LogAuditoria.objects.count(), 1)
+
+
+class ArchivoAuditoriaTests(BaseContableTestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.usuario = self.iniciar_sesion()
+        self.usuario.rol = Rol.objects.create(nombre='Admin')
+        self.usuario.save()
+
+    def log(self, motivo, fecha):
+        log = LogAuditoria.objects.create(
+            usuario=self.usuario, empresa=self.empresa, accion='UPDATE',
+            tabla_afectada='Comprobante', referencia_id=1, motivo_cambio=motivo
+        )
+        LogAuditoria.objects.filter(pk=log.pk).update(fecha_hora=fecha)
+
+    def test_inicio_zona_caliente(self):
+        self.assertEqual(inicio_zona_caliente(1, datetime.date(2026, 3, 20)), datetime.date(2026, 3, 1))
+        self.assertEqual(inicio_zona_caliente(3, datetime.date(2026, 2, 5)), datetime.date(2025, 12, 1))
+
+    def test_archiva_meses_cerrados_y_se_siguen_consultando(self):
+        enero = timezone.make_aware(datetime.datetime(2025, 1, 15, 10))
+        self.log('Monto: 100 -> 200', enero)
+        self.log('Entidad: A -> B', enero + datetime.timedelta(hours=1))
+        self.log('Reciente', timezone.now())
+
+        call_command('archivar_auditoria', meses=1, stdout=io.StringIO())
+        self.assertEqual(list(LogAuditoria.objects.values_list('motivo_cambio', flat=True)), ['Reciente'])
+        archivo = ArchivoAuditoria.objects.get(empresa=self.empresa, periodo='2025-01')
+        self.assertEqual(archivo.filas, 2)
+
+        logs = cargar_periodo(archivo)
+        self.assertEqual([log.motivo_cambio for log in logs], ['Entidad: A -> B', 'Monto: 100 -> 200'])
+        self.assertEqual(logs[0].usuario, self.usuario)
+        self.assertEqual(logs[1].fecha_hora, enero)
+        self.assertEqual([log.motivo_cambio for log in archivo_auditoria.buscar(self.empresa.id, 'monto')], ['Monto: 100 -> 200'])
+
+        r = self.client.get(reverse('lista_auditoria'), {'periodo': '2025-01', 'q': 'entidad'})
+        self.assertEqual([log.motivo_cambio for log in r.context['logs']], ['Entidad: A -> B'])
+        r = self.client.get(reverse('lista_auditoria'))
+        self.assertEqual([log.motivo_cambio for log in r.context['logs']], ['Reciente'])
+        # Buscar sin elegir mes: primero la tabla y luego los archivos
+        self.log('Monto: 5 -> 6', timezone.now())
+        r = self.client.get(reverse('lista_auditoria'), {'q': 'monto'})
+        self.assertEqual([log.motivo_cambio for log in r.context['logs']], ['Monto: 5 -> 6', 'Monto: 100 -> 200'])
+
+        # Los registros sin empresa también salen de la tabla
+        LogAuditoria.objects.create(
+            usuario=self.usuario, accion='UPDATE', tabla_afectada='Usuario', referencia_id=1, motivo_cambio='Sin empresa'
+        )
+        LogAuditoria.objects.filter(empresa__isnull=True).update(fecha_hora=enero)
+        call_command('archivar_auditoria', meses=1, stdout=io.StringIO())
+        self.assertFalse(LogAuditoria.objects.filter(empresa__isnull=True).exists())
+        self.assertEqual(ArchivoAuditoria.objects.get(empresa__isnull=True).filas, 1)
+
+        # Un registro tardío del mes se agrega al mismo archivo
+        self.log('Tardío', enero - datetime.timedelta(days=1))
+        call_command('archivar_auditoria', meses=1, stdout=io.StringIO())
+        archivo.refresh_from_db()
+        self.assertEqual(archivo.filas, 3)
+        self.assertEqual(cargar_periodo(archivo)[-1].motivo_cambio, 'Tardío')
+
+
+class ContextoUsuarioTests(BaseContableTestCase):
+
+    def test_actuando_como_restaura_al_salir(self):
+        usuario = Usuario.objects.create_user(username='proceso', password='x')
+        with actuando_como(usuario, self.empresa):
+            self.assertEqual((get_current_user(), get_current_empresa()), (usuario, self.empresa))
+            with actuando_como(None):
+                self.assertIsNone(get_current_user())
+            self.assertEqual(get_current_user(), usuario)
+            # Sin empresa propia (CuentaEstado), el log queda con la empresa actual
+            self.crear_cuenta(self.crear_venta())
+        self.assertEqual((get_current_user(), get_current_empresa()), (None, None))
+        self.assertEqual(
+            set(LogAuditoria.objects.values_list('tabla_afectada', 'empresa')),
+            {('Comprobante', self.empresa.id), ('CuentaEstado', self.empresa.id)}
+        )
+
+    def test_el_request_no_deja_al_usuario_pegado(self):
+        self.iniciar_sesion()
+        self.client.get(reverse('valorizacion_inventario'))
+        self.assertIsNone(get_current_user())
+
+    def test_cada_tarea_async_ve_su_usuario(self):
+        async def tarea(nombre):
+            with actuando_como(nombre):
+                await asyncio.sleep(0)
+                return get_current_user()
+
+        async def ambas():
+            return await asyncio.gather(tarea('ana'), tarea('luis'))
+
+        self.assertEqual(asyncio.run(ambas()), ['ana', 'luis'])
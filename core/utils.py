@@ -61,7 +61,7 @@ def sincronizar_tipo_cambio():
     return tc
 
 def registrar_auditoria_update(usuario, instancia_vieja, instancia_nueva, motivo):
-    from .models import LogAuditoria
+    from . import auditoria
     cambios = []
     
     # Comprobación de seguridad para el campo TOTAL
@@ -74,7 +74,7 @@ def registrar_auditoria_update(usuario, instancia_vieja, instancia_nueva, motivo
 
     if cambios:
         resumen = " | ".join(cambios)
-        LogAuditoria.objects.create(
+        auditoria.registrar(
             usuario=usuario,
             empresa=instancia_nueva.empresa,
             accion='UPDATE',
@@ -297,35 +297,3 @@ def procesar_pdf_impuestos(archivo_pdf):
             datos['nro_orden'] = match_op.group(1) if match_op else None
 
     return datos
-
-def aplicar_pago_en_cascada(monto_a_pagar, cuenta=None, prestamo=None):
-    """
-    Reparte el dinero entre las cuotas pendientes de forma cronológica.
-    Funciona para Facturas (cuenta) o para Préstamos (prestamo).
-    """
-    monto_restante = decimal.Decimal(str(monto_a_pagar))
-    
-    # 1. Buscamos las cuotas pendientes ordenadas por fecha
-    if cuenta:
-        cuotas_pendientes = cuenta.cuotas.filter(pagada=False).order_by('fecha_vencimiento')
-    else:
-        cuotas_pendientes = prestamo.cuotas.filter(pagada=False).order_by('fecha_vencimiento')
-
-    # 2. Empezamos el reparto (Efecto Dominó)
-    for cuota in cuotas_pendientes:
-        if monto_restante <= 0:
-            break
-        
-        if monto_restante >= cuota.saldo_cuota:
-            # El dinero alcanza para matar esta cuota completa
-            monto_restante -= cuota.saldo_cuota
-            cuota.saldo_cuota = 0
-            cuota.pagada = True
-            cuota.save()
-        else:
-            # El dinero solo alcanza para un abono parcial de la cuota
-            cuota.saldo_cuota -= monto_restante
-            monto_restante = 0
-            cuota.save()
-            
-    return monto_restante # Devuelve si sobró dinero por algún motivo
\ No newline at end of file
@@ -2,13 +2,15 @@ from datetime import datetime
 import decimal
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect, get_object_or_404
-from .models import AjusteStock, Caja, CategoriaGasto, CategoriaProducto, CertificadoRetencion, Cotizacion, CotizacionDetalle, Cuenta_Bancaria, CuentaEstado, Cuota, DeclaracionMensual, Empresa, Entidad, GastoOperativo, LogAuditoria, MovimientoFinanciero, Notificacion, PagoImpuesto, Prestamo, Producto, Comprobante, ComprobanteDetalle, RetencionDetalle, TipoCambioDia
+from .models import AjusteStock, Caja, CategoriaGasto, CategoriaProducto, CertificadoRetencion, Cotizacion, CotizacionDetalle, Cuenta_Bancaria, CuentaEstado, Cuota, DeclaracionMensual, Entidad, GastoOperativo, LogAuditoria, MovimientoFinanciero, Notificacion, PagoImpuesto, Prestamo, Producto, Comprobante, ComprobanteDetalle, RetencionDetalle, TipoCambioDia
 from .utils import consultar_validez_sunat, procesar_pdf_sunat, procesar_xml_sunat
 import uuid
-from django.db import transaction
-from django.db.models import Sum
-from .services import verificar_variacion_precio
-from .decorators import admin_required
+from django.db import connection, transaction
+from django.db.models import OuterRef, Q, Subquery, Sum
+from .services import marcar_leidas, verificar_variacion_precio
+from .decorators import admin_required, usar_replica
+from .permisos import permisos_de
+from . import auditoria
 from core import models
 from .utils import registrar_auditoria_update
 import copy
@@ -16,12 +18,29 @@ import datetime
 from django.db.models import F
 from .utils import procesar_xml_retencion
 from .utils import procesar_pdf_impuestos
-from .models import CierreMensual
+from .models import ArchivoAuditoria, CierreMensual
+from .archivo_auditoria import buscar as buscar_en_archivo, cargar_periodo, coincide
 from django.contrib.auth import logout as auth_logout
+from django.core.paginator import Paginator
+from django.http import FileResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+import tempfile
+from django.utils.dateparse import parse_date
+from django.utils import timezone
 import re
 from itertools import chain
 from operator import attrgetter
-from .utils import aplicar_pago_en_cascada
+from .amortizacion import comparar_metodos, programar_cuotas_cuenta, programar_cuotas_prestamo, METODOS, METODO_LINEAL
+from .flujo_caja import filas_con_movimiento, proyectar_flujo_caja, HORIZONTES
+from .antiguedad import reporte_antiguedad
+from .paginacion import paginar_request
+from .busqueda import buscar
+from .registros import escribir_xlsx, filas_registro, rango_periodo, stream_csv
+from .ple import escribir_zip_ple
+from .kardex import Kardex, POR_PAGINA as KARDEX_POR_PAGINA
+from .igv import detalle_igv, resumen_mensual
+from .inventario import registrar_comprobante, registrar_costo_adicional, registrar_movimiento
+from .saldos import valorizacion_almacen
+from .cuotas import asignar_pago_cuotas, cuotas_pendientes, resumen_asignacion, ESTRATEGIAS, ESTRATEGIA_ANTIGUEDAD, ESTRATEGIA_INTERES_PRIMERO
 
 @login_required
 def seleccionar_empresa(request):
@@ -30,7 +49,8 @@ def seleccionar_empresa(request):
     
     if request.method == 'POST':
         empresa_id = request.POST.get('empresa_id')
-        empresa = Empresa.objects.get(id=empresa_id)
+        # Solo una de las empresas permitidas (EmpresaContextMiddleware lo vuelve a validar en cada request)
+        empresa = get_object_or_404(empresas, id=empresa_id)
         # Guardamos en la sesión la empresa seleccionada para filtrar todo el sistema (RF-03)
         request.session['empresa_id'] = empresa.id
         request.session['empresa_nombre'] = empresa.nombre
@@ -41,7 +61,7 @@ def seleccionar_empresa(request):
 @login_required
 def cargar_compra(request):
     empresa_id = request.session.get('empresa_id')
-    empresa = get_object_or_404(Empresa, id=empresa_id)
+    empresa = request.empresa
     datos = None 
 
     if request.method == 'POST' and request.FILES.get('documento'):
@@ -153,7 +173,7 @@ def guardar_compra(request):
         if not temp_data:
             return redirect('cargar_compra')
 
-        empresa = Empresa.objects.get(id=request.session['empresa_id'])
+        empresa = request.empresa
         datos_xml = temp_data['datos_xml']
         proveedor = Entidad.objects.get(id=temp_data['proveedor_id'])
         tc_manual = decimal.Decimal(request.POST.get('tipo_cambio', '1.000'))
@@ -250,14 +270,16 @@ def guardar_compra(request):
                     
                     producto.precio_compra_referencial = p_unit_pen
                     producto.precio_venta_referencial = p_venta_sugerido
-                    producto.stock_actual += cant
-                    producto.save()
 
-                    ComprobanteDetalle.objects.create(
+                    detalle = ComprobanteDetalle.objects.create(
                         comprobante=comprobante, producto=producto,
                         cantidad=cant, precio_unitario=p_unit_real_moneda,
                         subtotal_linea=cant * p_unit_real_moneda
                     )
+                    registrar_comprobante(comprobante, detalle)  # Stock + costo promedio ponderado
+                    # El stock no se guarda aquí (lo mueve el libro con una expresión F); se guarda después
+                    # del movimiento para que el log de auditoría del producto muestre el stock ya actualizado
+                    producto.save(update_fields=['nombres_alternativos', 'precio_compra_referencial', 'precio_venta_referencial'])
 
                 elif destino == 'gasto':
                     cat_gasto, _ = CategoriaGasto.objects.get_or_create(nombre="General")
@@ -300,7 +322,7 @@ def guardar_compra(request):
 @transaction.atomic # Garantiza que si falla el movimiento, no se guarde el préstamo
 def registrar_prestamo(request):
     emp_id = request.session.get('empresa_id')
-    empresa = get_object_or_404(Empresa, id=emp_id)
+    empresa = request.empresa
 
     if request.method == 'POST':
         # 1. Captura y Conversión Segura de Montos
@@ -422,9 +444,12 @@ def registrar_flete(request):
                 flete_por_unidad = parte_proporcional_flete / detalle.cantidad
                 producto = detalle.producto
                 if producto:
-                    # Sumamos el flete al costo base para tener el "Landed Cost" real
-                    producto.precio_compra_referencial += flete_por_unidad 
-                    producto.save()
+                    # Sumamos el flete al costo base para tener el "Landed Cost" real.
+                    # Al valor del inventario va la base imponible: el IGV del flete es crédito fiscal
+                    registrar_costo_adicional(
+                        producto, subtotal * porcentaje_del_valor, costo_referencial=flete_por_unidad,
+                        fecha=flete.fecha_emision, comprobante=flete, referencia=f"Flete {flete.serie}-{flete.numero}"
+                    )
             
         return redirect('dashboard')
 
@@ -438,7 +463,7 @@ def registrar_flete(request):
 @login_required
 def cargar_venta(request):
     empresa_id = request.session.get('empresa_id')
-    empresa = get_object_or_404(Empresa, id=empresa_id)
+    empresa = request.empresa
 
     if request.method == 'POST' and request.FILES.get('documento'):
         archivo = request.FILES['documento']
@@ -516,7 +541,7 @@ def guardar_venta(request):
         if not temp_data:
             return redirect('cargar_venta')
 
-        empresa = Empresa.objects.get(id=request.session['empresa_id'])
+        empresa = request.empresa
         tc_manual = decimal.Decimal(request.POST.get('tipo_cambio', '1.000'))
         datos_doc = temp_data['datos_doc']
         cliente = Entidad.objects.get(id=temp_data['cliente_id'])
@@ -552,7 +577,7 @@ def guardar_venta(request):
                 # APRENDIZAJE: Si no conoce este nombre, lo guarda
                 if nombre_largo_pdf not in producto.nombres_alternativos:
                     producto.nombres_alternativos.append(nombre_largo_pdf)
-                    producto.save()
+                    producto.save(update_fields=['nombres_alternativos'])
                     
                 ComprobanteDetalle.objects.create(
                     comprobante=venta,
@@ -561,8 +586,10 @@ def guardar_venta(request):
                     precio_unitario=item['precio_unitario'],
                     subtotal_linea=decimal.Decimal(str(item['cantidad'])) * decimal.Decimal(str(item['precio_unitario']))
                 )
-                producto.stock_actual -= decimal.Decimal(str(item['cantidad']))
-                producto.save()
+                registrar_movimiento(
+                    producto, -decimal.Decimal(str(item['cantidad'])), 'VENTA',
+                    fecha=venta.fecha_emision, comprobante=venta, referencia=venta.codigo_factura
+                )
 
         # 3. Crear Cuenta por Cobrar
         CuentaEstado.objects.create(
@@ -602,6 +629,7 @@ def registrar_cobranza(request, cuenta_id):
     return render(request, 'core/registrar_cobranza.html', {'cuenta': cuenta})
 
 @login_required
+@usar_replica
 def dashboard_analitico(request):
     emp_id = request.session.get('empresa_id')
     if not emp_id:
@@ -708,7 +736,7 @@ def dashboard_analitico(request):
 @login_required
 @admin_required
 def eliminar_comprobante(request, pk):
-    if request.user.rol.nombre != 'Admin':
+    if not permisos_de(request.user).es_admin:
         return redirect('dashboard') # Solo Admins (RF-24)
 
     comprobante = get_object_or_404(Comprobante, id=pk, empresa_id=request.session['empresa_id'])
@@ -725,7 +753,7 @@ def eliminar_comprobante(request, pk):
         motivo = request.POST.get('motivo')
         
         # Auditoría
-        LogAuditoria.objects.create(
+        auditoria.registrar(
             usuario=request.user,
             empresa_id=request.session['empresa_id'],
             accion='DELETE',
@@ -753,9 +781,8 @@ def registrar_devolucion(request):
         cantidad = decimal.Decimal(request.POST.get('cantidad'))
         monto_reembolso = decimal.Decimal(request.POST.get('monto_reembolso'))
 
-        # 1. Ajustar Inventario
-        producto.stock_actual += cantidad
-        producto.save()
+        # 1. Ajustar Inventario (vuelve al costo promedio vigente)
+        registrar_movimiento(producto, cantidad, 'DEVOLUCION', referencia=f"Devolución por S/ {monto_reembolso}")
 
         # 2. Registrar Ingreso a Caja (Módulo 7)
         MovimientoFinanciero.objects.create(
@@ -838,15 +865,74 @@ def lista_comprobantes(request):
     emp_id = request.session.get('empresa_id')
     tipo = request.GET.get('tipo') # Puede ser 'Compra' o 'Venta'
     
-    comprobantes = Comprobante.objects.filter(empresa_id=emp_id)
+    # Estado de la cuenta por cobrar/pagar anotado con Subquery: sin consultas extra por fila
+    cuenta = CuentaEstado.objects.filter(comprobante=OuterRef('pk')).order_by('id')
+    comprobantes = Comprobante.objects.filter(empresa_id=emp_id).select_related('entidad').annotate(
+        cuenta_id=Subquery(cuenta.values('id')[:1]),
+        saldo_pendiente=Subquery(cuenta.values('saldo_pendiente')[:1]),
+        estado_cuenta=Subquery(cuenta.values('estado')[:1]),
+        fecha_vencimiento=Subquery(cuenta.values('fecha_vencimiento')[:1]),
+    )
     if tipo:
         comprobantes = comprobantes.filter(operacion=tipo)
-        
+    pagina = paginar_request(request, comprobantes, 'fecha_emision')
+
     return render(request, 'core/lista_comprobantes.html', {
-        'comprobantes': comprobantes,
+        'comprobantes': pagina,
+        'pagina': pagina,
+        'tipo': tipo,
+        'periodo_actual': datetime.date.today().strftime('%Y-%m'),
         'titulo': f"Listado de {tipo}s" if tipo else "Todos los Comprobantes"
     })
 
+@login_required
+@usar_replica
+def exportar_registro(request):
+    """Registro de Compras/Ventas del periodo (?operacion=Venta&periodo=AAAA-MM&formato=csv|xlsx)."""
+    emp_id = request.session.get('empresa_id')
+    operacion = request.GET.get('operacion')
+    formato = request.GET.get('formato', 'csv')
+    try:
+        desde, hasta = rango_periodo(request.GET.get('periodo', ''))
+    except ValueError:
+        return HttpResponseBadRequest("Periodo inválido (use AAAA-MM).")
+    if operacion not in ('Compra', 'Venta') or formato not in ('csv', 'xlsx'):
+        return HttpResponseBadRequest("Operación o formato inválido.")
+
+    nombre = f"Registro_{'Compras' if operacion == 'Compra' else 'Ventas'}_{desde:%Y%m}"
+    filas = filas_registro(emp_id, operacion, desde, hasta)
+
+    if formato == 'csv':
+        # Se envía mientras se lee de la BD: memoria plana aunque el año tenga cientos de miles de filas
+        response = StreamingHttpResponse(stream_csv(filas), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{nombre}.csv"'
+        return response
+
+    # El XLSX es un zip: se arma en un temporal (fila a fila) y se envía por bloques
+    archivo = tempfile.TemporaryFile()
+    escribir_xlsx(filas, archivo)
+    archivo.seek(0)
+    return FileResponse(
+        archivo, as_attachment=True, filename=f"{nombre}.xlsx",
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
+@login_required
+@usar_replica
+def descargar_ple(request):
+    """Libros electrónicos PLE 8.1 y 14.1 del periodo (?periodo=AAAA-MM) en un zip."""
+    emp_id = request.session.get('empresa_id')
+    try:
+        desde, hasta = rango_periodo(request.GET.get('periodo', ''))
+    except ValueError:
+        return HttpResponseBadRequest("Periodo inválido (use AAAA-MM).")
+
+    # Los .txt se escriben línea a línea dentro del zip temporal y se envía por bloques
+    archivo = tempfile.TemporaryFile()
+    escribir_zip_ple(emp_id, desde, hasta, archivo)
+    archivo.seek(0)
+    return FileResponse(archivo, as_attachment=True, filename=f"PLE_{desde:%Y%m}.zip", content_type='application/zip')
+
 @login_required
 @transaction.atomic
 def configurar_cuotas(request, cuenta_id):
@@ -854,23 +940,11 @@ def configurar_cuotas(request, cuenta_id):
     
     if request.method == 'POST':
         num_cuotas = int(request.POST.get('num_cuotas'))
-        monto_cuota = cuenta.monto_total / num_cuotas
         frecuencia_dias = int(request.POST.get('frecuencia')) # Ej: cada 30 días
         
-        # Borrar cuotas previas si existen (por si el usuario se equivoca y reintenta)
-        cuenta.cuotas.all().delete()
-        
-        fecha_base = datetime.date.today()
-        
-        for i in range(1, num_cuotas + 1):
-            fecha_venc = fecha_base + datetime.timedelta(days=frecuencia_dias * i)
-            Cuota.objects.create(
-                cuenta=cuenta,
-                numero_cuota=i,
-                monto=monto_cuota,
-                saldo_cuota=monto_cuota,
-                fecha_vencimiento=fecha_venc
-            )
+        # Borra cuotas previas (por si el usuario se equivoca y reintenta) y crea todas de una vez
+        cuotas = programar_cuotas_cuenta(cuenta, num_cuotas, frecuencia_dias)
+        fecha_venc = cuotas[-1].fecha_vencimiento
         
         # Actualizamos la fecha de vencimiento de la cuenta al de la última cuota
         cuenta.fecha_vencimiento = fecha_venc
@@ -885,31 +959,40 @@ def configurar_cuotas(request, cuenta_id):
 @transaction.atomic
 def configurar_cuotas_prestamo(request, prestamo_id):
     prestamo = get_object_or_404(Prestamo, id=prestamo_id, empresa_id=request.session['empresa_id'])
-    
-    if request.method == 'POST':
-        num_cuotas = int(request.POST.get('num_cuotas'))
-        # La deuda total del préstamo es Capital + Interés
-        monto_total = prestamo.monto_capital + prestamo.monto_interes
-        monto_cuota = monto_total / num_cuotas
-        frecuencia_dias = int(request.POST.get('frecuencia'))
-        
-        # Limpiar programaciones anteriores
-        prestamo.cuotas.all().delete()
-        
-        fecha_base = prestamo.fecha_prestamo
-        for i in range(1, num_cuotas + 1):
-            fecha_venc = fecha_base + datetime.timedelta(days=frecuencia_dias * i)
-            Cuota.objects.create(
-                prestamo=prestamo,
-                numero_cuota=i,
-                monto=monto_cuota,
-                saldo_cuota=monto_cuota,
-                fecha_vencimiento=fecha_venc
-            )
-        
+    datos = request.POST if request.method == 'POST' else request.GET
+    metodo = datos.get('metodo', METODO_LINEAL)
+    if metodo not in dict(METODOS):
+        metodo = METODO_LINEAL
+    error = None
+    try:
+        num_cuotas = int(datos.get('num_cuotas') or 12)
+        frecuencia_dias = int(datos.get('frecuencia') or 30)
+        tea = decimal.Decimal(datos['tea']) if datos.get('tea') else prestamo.porcentaje_interes
+    except (ValueError, decimal.InvalidOperation):
+        num_cuotas, frecuencia_dias, tea = 12, 30, prestamo.porcentaje_interes
+        error = "Revise el número de cuotas, la frecuencia y la TEA: deben ser números."
+    else:
+        if num_cuotas < 1 or frecuencia_dias < 1:
+            num_cuotas, frecuencia_dias = max(num_cuotas, 1), max(frecuencia_dias, 1)
+            error = "El cronograma necesita al menos una cuota con una frecuencia de al menos un día."
+
+    if request.method == 'POST' and not error:
+        # Limpia programaciones anteriores y genera el cronograma (capital + interés por cuota)
+        programar_cuotas_prestamo(prestamo, num_cuotas, frecuencia_dias, metodo=metodo, tea=tea)
         return redirect('lista_prestamos')
 
-    return render(request, 'core/configurar_cuotas_prestamo.html', {'prestamo': prestamo})
+    # Comparativo what-if de métodos con las cuotas, frecuencia y TEA del formulario
+    comparativo = comparar_metodos(
+        prestamo.monto_capital, tea, num_cuotas, frecuencia_dias,
+        porcentaje_simple=prestamo.porcentaje_interes
+    )
+    return render(request, 'core/configurar_cuotas_prestamo.html', {
+        'prestamo': prestamo,
+        'metodos': METODOS,
+        'comparativo': comparativo,
+        'metodo': metodo, 'num_cuotas': num_cuotas, 'frecuencia': frecuencia_dias, 'tea': tea,
+        'error': error,
+    })
 
 @login_required
 @transaction.atomic
@@ -933,11 +1016,8 @@ def editar_comprobante(request, pk):
         # 2. REVERTIR STOCK (Deshacer lo que hizo la versión vieja)
         for det in comprobante.detalles.all():
             if det.producto:
-                if comprobante.operacion == 'Compra':
-                    det.producto.stock_actual -= det.cantidad
-                else: # Venta
-                    det.producto.stock_actual += det.cantidad
-                det.producto.save() # Guardamos la reversión
+                # Compra: sale lo comprado a su costo. Venta: vuelve lo vendido al costo promedio
+                registrar_comprobante(comprobante, det, revertir=True)
 
         # 3. ACTUALIZAR CABECERA
         entidad, _ = Entidad.objects.get_or_create(
@@ -972,7 +1052,7 @@ def editar_comprobante(request, pk):
             
             producto = Producto.objects.filter(id=prod_ids[i]).first() if i < len(prod_ids) and prod_ids[i] else None
             
-            ComprobanteDetalle.objects.create(
+            detalle = ComprobanteDetalle.objects.create(
                 comprobante=comprobante, producto=producto,
                 descripcion_libre=descs[i], cantidad=c, 
                 precio_unitario=p, subtotal_linea=sub
@@ -980,18 +1060,16 @@ def editar_comprobante(request, pk):
             
             # APLICAR NUEVO STOCK (Reflejo inmediato en Control de Inventario)
             if producto:
+                registrar_comprobante(comprobante, detalle)
                 if comprobante.operacion == 'Compra':
-                    producto.stock_actual += c
                     producto.precio_compra_referencial = p * tc_nuevo
+                    producto.save(update_fields=['precio_compra_referencial'])
                 else: # Venta
-                    producto.stock_actual -= c
-                    
                     if comprobante.moneda == 'PEN':
                         producto.precio_venta_referencial = p
                     else:
                         producto.precio_venta_referencial = p * tc_nuevo
-                
-                producto.save()
+                    producto.save(update_fields=['precio_venta_referencial'])
 
         # 5. LÓGICA DE IGV INTELIGENTE (Solución a tu observación 2)
         comprobante.total = nuevo_total
@@ -1160,15 +1238,15 @@ def eliminar_categoria(request, pk):
 @login_required
 def lista_movimientos(request):
     emp_id = request.session.get('empresa_id')
-    movimientos = MovimientoFinanciero.objects.filter(empresa_id=emp_id).order_by('-fecha')
-    return render(request, 'core/movimientos_list.html', {'movimientos': movimientos})
+    movimientos = paginar_request(request, MovimientoFinanciero.objects.filter(empresa_id=emp_id), 'fecha')
+    return render(request, 'core/movimientos_list.html', {'movimientos': movimientos, 'pagina': movimientos})
 
 # --- MÓDULO DE GASTOS ---
 @login_required
 def lista_gastos(request):
     emp_id = request.session.get('empresa_id')
-    gastos = GastoOperativo.objects.filter(empresa_id=emp_id).order_by('-fecha')
-    return render(request, 'core/gastos_list.html', {'gastos': gastos})
+    gastos = paginar_request(request, GastoOperativo.objects.filter(empresa_id=emp_id), 'fecha')
+    return render(request, 'core/gastos_list.html', {'gastos': gastos, 'pagina': gastos})
 
 # --- MÓDULO DE TIPO DE CAMBIO ---
 @login_required
@@ -1179,16 +1257,34 @@ def lista_tipo_cambio(request):
 # --- MÓDULO DE AUDITORÍA (Solo para Admin - RNF-02) ---
 @login_required
 @admin_required # Solo el admin ve la caja negra
+@usar_replica
 def lista_auditoria(request):
     # Forzamos a que el ID sea un entero para el filtro
     emp_id = int(request.session.get('empresa_id'))
     
-    # Traemos los logs de esta empresa
-    logs = LogAuditoria.objects.filter(empresa_id=emp_id).order_by('-fecha_hora')
-    
-    print(f"DEBUG: Buscando logs para empresa {emp_id}. Encontrados: {logs.count()}") # Mira tu terminal
-    
-    return render(request, 'core/auditoria_list.html', {'logs': logs})
+    # ?periodo=AAAA-MM de un mes archivado se lee de su archivo; sin periodo, la tabla (meses recientes).
+    # Una búsqueda sin periodo sigue en los meses archivados, después de los recientes (son más antiguos)
+    archivados = {a.periodo: a for a in ArchivoAuditoria.objects.filter(empresa_id=emp_id)}
+    periodo = request.GET.get('periodo', '')
+    q = request.GET.get('q', '').strip()
+    if periodo in archivados:
+        logs = cargar_periodo(archivados[periodo])
+        if q:
+            logs = [log for log in logs if coincide(log, q)]
+    else:
+        periodo = ''
+        logs = LogAuditoria.objects.filter(empresa_id=emp_id).select_related('usuario')
+        if q:
+            logs = logs.filter(Q(motivo_cambio__icontains=q) | Q(tabla_afectada__icontains=q))
+            if archivados:
+                logs = list(logs.order_by('-fecha_hora', '-id_log')) + list(buscar_en_archivo(emp_id, q))
+
+    # Una página a la vez (la tabla crece con cada guardado)
+    logs = paginar_request(request, logs, 'fecha_hora')
+
+    return render(request, 'core/auditoria_list.html', {
+        'logs': logs, 'pagina': logs, 'periodo': periodo, 'q': q, 'archivados': archivados,
+    })
 
 # core/views.py
 
@@ -1255,17 +1351,8 @@ def registrar_pago_comprobante(request, pk):
             cuenta_bancaria_id=banco_id if banco_id else None
         )
 
-        # 4. REGISTRAR EN LOG DE AUDITORÍA (RNF-02)
-        LogAuditoria.objects.create(
-            usuario=request.user,
-            empresa_id=int(request.session['empresa_id']),
-            accion='INSERT',
-            tabla_afectada='Pago/Cobranza',
-            referencia_id=comprobante.id,
-            motivo_cambio=f"Registro de {mov.tipo} por {comprobante.moneda} {monto_pago}. Ref: {referencia}. Dif. Cambio: S/ {diff_cambio_soles}"
-        )
-
-        # 5. ACTUALIZAR DEUDA (RF-16)
+        # 4. ACTUALIZAR DEUDA (RF-16)
+        asignaciones = []
         if cuenta:
             cuenta.saldo_pendiente -= monto_pago
             if cuenta.saldo_pendiente <= 0:
@@ -1277,10 +1364,25 @@ def registrar_pago_comprobante(request, pk):
 
             # --- LA MEJORA MAESTRA (Sincronización con Cronograma) ---
             # Si la factura tiene cuotas programadas, repartimos el pago
-            if cuenta.cuotas.exists():
-                aplicar_pago_en_cascada(monto_pago, cuenta=cuenta)
+            estrategia = request.POST.get('estrategia_reparto', ESTRATEGIA_ANTIGUEDAD)
+            if estrategia not in ESTRATEGIAS:
+                estrategia = ESTRATEGIA_ANTIGUEDAD
+            asignaciones, _ = asignar_pago_cuotas(monto_pago, cuenta=cuenta, estrategia=estrategia)
             # ---------------------------------------------------------
 
+        # 5. REGISTRAR EN LOG DE AUDITORÍA (RNF-02)
+        motivo = f"Registro de {mov.tipo} por {comprobante.moneda} {monto_pago}. Ref: {referencia}. Dif. Cambio: S/ {diff_cambio_soles}"
+        if asignaciones:
+            motivo += f". Reparto: {resumen_asignacion(asignaciones)}"
+        auditoria.registrar(
+            usuario=request.user,
+            empresa_id=int(request.session['empresa_id']),
+            accion='INSERT',
+            tabla_afectada='Pago/Cobranza',
+            referencia_id=comprobante.id,
+            motivo_cambio=motivo
+        )
+
         return redirect('lista_comprobantes')
 
     return render(request, 'core/registrar_pago.html', {
@@ -1314,7 +1416,7 @@ def ver_comprobante_detalle(request, pk): # <--- Nombre Universal
 @login_required
 def cargar_retencion(request):
     empresa_id = request.session.get('empresa_id')
-    empresa = get_object_or_404(Empresa, id=empresa_id)
+    empresa = request.empresa
 
     if request.method == 'POST' and request.FILES.get('xml_retencion'):
         archivo = request.FILES['xml_retencion']
@@ -1390,7 +1492,7 @@ def guardar_retencion(request):
         temp = request.session.get('temp_retencion')
         if not temp: return redirect('cargar_retencion')
 
-        empresa = Empresa.objects.get(id=request.session['empresa_id'])
+        empresa = request.empresa
         
         # 1. Crear Cabecera del Certificado
         agente, _ = Entidad.objects.get_or_create(
@@ -1440,7 +1542,7 @@ def guardar_retencion(request):
 @transaction.atomic
 def registrar_compra_manual(request):
     emp_id = request.session.get('empresa_id')
-    empresa = get_object_or_404(Empresa, id=emp_id)
+    empresa = request.empresa
     
     if request.method == 'POST':
         # 1. Datos de Cabecera
@@ -1500,16 +1602,16 @@ def registrar_compra_manual(request):
                 )
             # ---------------------------------------------------------------
 
-            # ASIGNAR PRECIO DE VENTA Y SUMAR STOCK (UNA SOLA VEZ)
+            # ASIGNAR PRECIO DE VENTA
             producto.precio_venta_referencial = p_v_sug
-            producto.stock_actual += cant # <--- SOLO ESTA LÍNEA
-            producto.save()   
+            producto.save(update_fields=['precio_venta_referencial'])
             
-            # Crear detalle
-            ComprobanteDetalle.objects.create(
+            # Crear detalle y SUMAR STOCK (UNA SOLA VEZ, por el libro de stock)
+            detalle = ComprobanteDetalle.objects.create(
                 comprobante=comprobante, producto=producto,
                 cantidad=cant, precio_unitario=prec_unit, subtotal_linea=subtotal_fila
             )
+            registrar_comprobante(comprobante, detalle)
 
         # 5. Finalizar montos
         comprobante.subtotal = monto_total
@@ -1563,7 +1665,7 @@ def ajustar_stock(request, pk):
         motivo = request.POST.get('motivo')
 
         # 1. Registrar el Ajuste
-        AjusteStock.objects.create(
+        ajuste = AjusteStock.objects.create(
             empresa_id=request.session['empresa_id'],
             producto=producto,
             tipo=tipo,
@@ -1572,86 +1674,49 @@ def ajustar_stock(request, pk):
             usuario=request.user
         )
 
-        # 2. Actualizar el Stock Real
-        if tipo == 'Ingreso':
-            producto.stock_actual += cant
-        else:
-            producto.stock_actual -= cant
-        
-        producto.save()
+        # 2. Actualizar el Stock Real (los ingresos entran al costo promedio vigente)
+        registrar_movimiento(
+            producto, cant if tipo == 'Ingreso' else -cant, 'AJUSTE',
+            fecha=timezone.localdate(ajuste.fecha), ajuste=ajuste, referencia=motivo or ''
+        )
         return redirect('lista_productos')
 
     return render(request, 'core/producto_ajuste_form.html', {'p': producto})
 
 @login_required
+@usar_replica
 def producto_kardex(request, pk):
     emp_id = request.session.get('empresa_id')
-    producto = get_object_or_404(Producto, id=pk, empresa_id=emp_id)
-
-    # 1. Obtener movimientos desde Facturas/Boletas (Detalles)
-    # Filtramos los detalles de este producto para la empresa actual
-    mov_comprobantes = ComprobanteDetalle.objects.filter(
-        producto=producto, 
-        comprobante__empresa_id=emp_id
-    ).select_related('comprobante', 'comprobante__entidad')
-
-    # 2. Obtener movimientos desde Ajustes Manuales
-    mov_ajustes = AjusteStock.objects.filter(producto=producto)
-
-    # 3. Estandarizar y Unificar los datos para el reporte
-    historial_sucio = []
-
-    for d in mov_comprobantes:
-        # Si es compra, es entrada. Si es venta, es salida.
-        tipo_mov = 'Entrada' if d.comprobante.operacion == 'Compra' else 'Salida'
-        historial_sucio.append({
-            'fecha': d.comprobante.fecha_emision,
-            'documento': d.comprobante.codigo_factura,
-            'entidad': d.comprobante.entidad.nombre_razon_social,
-            'tipo': tipo_mov,
-            'cantidad': float(d.cantidad),
-            'precio': float(d.precio_unitario),
-        })
+    producto = get_object_or_404(Producto.objects.select_related('categoria'), id=pk, empresa_id=emp_id)
 
-    for a in mov_ajustes:
-        tipo_mov = 'Entrada' if a.tipo == 'Ingreso' else 'Salida'
-        historial_sucio.append({
-            'fecha': a.fecha.date(),
-            'documento': 'AJUSTE MANUAL',
-            'entidad': f"Usuario: {a.usuario.username}",
-            'tipo': tipo_mov,
-            'cantidad': float(a.cantidad),
-            'precio': 0.0,
-            'motivo': a.motivo
-        })
+    # Libro de movimientos con saldo acumulado por ventana; solo se lee la página pedida
+    movimientos = Paginator(Kardex(producto.id, emp_id), KARDEX_POR_PAGINA).get_page(request.GET.get('page'))
 
-    # 4. Ordenar por fecha y calcular Saldo Acumulado
-    historial_ordenado = sorted(historial_sucio, key=lambda x: x['fecha'])
-    
-    saldo_acumulado = 0
-    kardex_final = []
+    return render(request, 'core/producto_kardex.html', {
+        'p': producto,
+        'movimientos': movimientos
+    })
 
-    for mov in historial_ordenado:
-        if mov['tipo'] == 'Entrada':
-            saldo_acumulado += mov['cantidad']
-        else:
-            saldo_acumulado -= mov['cantidad']
-        
-        mov['saldo_despues'] = saldo_acumulado
-        kardex_final.append(mov)
+@login_required
+def valorizacion_inventario(request):
+    emp_id = request.session.get('empresa_id')
+    try:
+        fecha = parse_date(request.GET.get('fecha', ''))
+    except ValueError:
+        fecha = None
 
-    # Invertimos para ver lo más reciente arriba
-    kardex_final.reverse()
+    # Sin fecha: costo y valor mantenidos en Producto. Con fecha: última foto mensual + movimientos del libro
+    reporte = valorizacion_almacen(emp_id, fecha)
 
-    return render(request, 'core/producto_kardex.html', {
-        'p': producto,
-        'movimientos': kardex_final
+    return render(request, 'core/valorizacion_inventario.html', {
+        'reporte': reporte,
+        'fecha': fecha
     })
 
 @login_required
 def registrar_venta_manual(request):
     emp_id = request.session.get('empresa_id')
-    empresa = get_object_or_404(Empresa, id=emp_id)
+    empresa = request.empresa
 
     if request.method == 'POST':
         # 1. Captura básica de cabecera
@@ -1767,7 +1832,7 @@ def registrar_venta_manual(request):
 def preview_venta_manual(request):
     datos = request.session.get('temp_venta_manual')
     if not datos: return redirect('registrar_venta_manual')
-    empresa = get_object_or_404(Empresa, id=request.session['empresa_id'])
+    empresa = request.empresa
     bancos = Cuenta_Bancaria.objects.filter(empresa=empresa)
     return render(request, 'core/venta_manual_preview.html', {'c': datos, 'empresa': empresa, 'bancos': bancos})
 
@@ -1781,7 +1846,7 @@ def guardar_venta_manual_final(request):
     if not datos or request.method != 'POST': 
         return redirect('registrar_venta_manual')
     
-    empresa = get_object_or_404(Empresa, id=request.session['empresa_id'])
+    empresa = request.empresa
     
     # --- CORRECCIÓN DE FECHA (Evita el IntegrityError) ---
     # Si 'fecha' no existe en la sesión, usamos la fecha de hoy
@@ -1841,8 +1906,10 @@ def guardar_venta_manual_final(request):
         )
         # Descontar stock real
         if producto:
-            producto.stock_actual -= decimal.Decimal(str(item['cantidad']))
-            producto.save()
+            registrar_movimiento(
+                producto, -decimal.Decimal(str(item['cantidad'])), 'VENTA',
+                fecha=venta.fecha_emision, comprobante=venta, referencia=venta.codigo_factura
+            )
 
     # 5. Crear Deuda y manejar el Pago
     cuenta = CuentaEstado.objects.create(
@@ -1903,14 +1970,12 @@ def pagar_prestamo(request, pk):
         )
 
         # 2. Marcar el Préstamo como Pagado
-        if prestamo.cuotas.exists():
-            # Si pagas el total, matamos todas las cuotas en cascada
-            monto_total_devolucion = prestamo.monto_capital + prestamo.monto_interes
-            aplicar_pago_en_cascada(monto_total_devolucion, prestamo=prestamo)
+        # Si pagas el total, matamos todas las cuotas pendientes en cascada (un solo UPDATE masivo)
+        asignar_pago_cuotas(monto_total_devolucion, prestamo=prestamo, estrategia=ESTRATEGIA_INTERES_PRIMERO)
         # ---------------------------------------------------------
 
         prestamo.estado = 'Pagado'
-        prestamo.save()
+        prestamo.save(update_fields=['estado'])
         return redirect('lista_prestamos')
 
     cajas = Caja.objects.filter(empresa=empresa, moneda=prestamo.moneda)
@@ -1927,35 +1992,72 @@ def pagar_prestamo(request, pk):
 def cronograma_vencimientos(request):
     emp_id = request.session.get('empresa_id')
     hoy = datetime.date.today()
-    
-    # 1. Obtenemos todas las cuotas de Facturas (Cuentas por Cobrar/Pagar)
-    cuotas_facturas = Cuota.objects.filter(
-        cuenta__comprobante__empresa_id=emp_id, 
-        pagada=False
-    )
-    
-    # 2. Obtenemos todas las cuotas de Préstamos
-    cuotas_prestamos = Cuota.objects.filter(
-        prestamo__empresa_id=emp_id, 
-        pagada=False
-    )
-    
-    # 3. Mezclamos y ordenamos por fecha (el modelo ya ordena por fecha)
-    # Combinamos ambas listas para el template
-    todas_las_cuotas = list(cuotas_facturas) + list(cuotas_prestamos)
-    todas_las_cuotas.sort(key=lambda x: x.fecha_vencimiento)
+
+    # Ventana de fechas opcional (?desde=AAAA-MM-DD&hasta=AAAA-MM-DD)
+    try:
+        desde = parse_date(request.GET.get('desde', ''))
+        hasta = parse_date(request.GET.get('hasta', ''))
+    except ValueError:
+        desde = hasta = None
+
+    # Cuotas de Facturas y de Préstamos en una sola consulta ordenada (con select_related para el template)
+    cuotas = cuotas_pendientes(emp_id, desde=desde, hasta=hasta)
+    pagina = Paginator(cuotas, 50).get_page(request.GET.get('page'))
 
     return render(request, 'core/cronograma_general.html', {
-        'cuotas': todas_las_cuotas,
+        'cuotas': pagina,
+        'pagina': pagina,
+        'desde': desde,
+        'hasta': hasta,
         'hoy': hoy
     })
 
 
+@login_required
+def flujo_caja_proyectado(request):
+    emp_id = request.session.get('empresa_id')
+    try:
+        dias = int(request.GET.get('dias', 90))
+    except ValueError:
+        dias = 90
+    if dias not in HORIZONTES:
+        dias = 90
+
+    # Proyección por moneda: saldo de hoy + cobros - pagos esperados (cuotas, cuentas y préstamos)
+    proyeccion = proyectar_flujo_caja(emp_id, dias=dias)
+    monedas = []
+    for p in proyeccion.values():
+        p['filas'] = filas_con_movimiento(p)
+        monedas.append(p)
+
+    return render(request, 'core/flujo_caja.html', {
+        'monedas': monedas,
+        'dias': dias,
+        'horizontes': HORIZONTES,
+        'hoy': datetime.date.today()
+    })
+
+@login_required
+def antiguedad_saldos(request):
+    emp_id = request.session.get('empresa_id')
+    operacion = request.GET.get('operacion', 'Venta')
+    if operacion not in ('Venta', 'Compra'):
+        operacion = 'Venta'
+
+    # Tramos por entidad y total en soles, en una sola consulta agrupada
+    reporte = reporte_antiguedad(emp_id, operacion=operacion)
+
+    return render(request, 'core/antiguedad_saldos.html', {
+        'reporte': reporte,
+        'operacion': operacion,
+        'hoy': datetime.date.today()
+    })
+
 @login_required
 @transaction.atomic
 def registrar_pago_cuota(request, cuota_id):
     cuota = get_object_or_404(Cuota, id=cuota_id)
-    empresa = Empresa.objects.get(id=request.session['empresa_id'])
+    empresa = request.empresa
     
     # Determinamos moneda y origen
     moneda = cuota.cuenta.comprobante.moneda if cuota.cuenta else cuota.prestamo.moneda
@@ -1998,7 +2100,7 @@ def registrar_pago_cuota(request, cuota_id):
             # Si después de pagar esta cuota no quedan más pendientes, el préstamo muere
             if not prestamo.cuotas.exclude(id=cuota.id).filter(pagada=False).exists():
                 prestamo.estado = 'Pagado'
-                prestamo.save()
+                prestamo.save(update_fields=['estado'])
 
         # 4. Marcar Cuota como TOTALMENTE PAGADA
         cuota.saldo_cuota = 0
@@ -2023,7 +2125,7 @@ def registrar_pago_cuota(request, cuota_id):
 @transaction.atomic
 def registrar_gasto_manual(request):
     emp_id = request.session.get('empresa_id')
-    empresa = get_object_or_404(Empresa, id=emp_id)
+    empresa = request.empresa
 
     if request.method == 'POST':
         categoria_id = request.POST.get('categoria_id')
@@ -2070,55 +2172,35 @@ def registrar_gasto_manual(request):
     })
 
 @login_required
+@usar_replica
 def trazabilidad_igv(request):
     emp_id = int(request.session.get('empresa_id'))
-    
-    # Traemos todos los comprobantes que tienen IGV (Ventas y Compras)
-    comprobantes = Comprobante.objects.filter(
-        empresa_id=emp_id
-    ).exclude(
-        tipo_documento='Recibo'
-    ).exclude(
-        estado_sunat='INTERNO'
-    ).order_by('-fecha_emision')
-    
-    reporte = []
-    total_debito = 0  # IGV Ventas
-    total_credito = 0 # IGV Compras
 
-    for c in comprobantes:
-        # Calculamos el IGV en soles usando el TC de la factura
-        igv_pen = float(c.igv * c.tipo_cambio)
-        
-        if c.operacion == 'Venta':
-            total_debito += igv_pen
-        else:
-            total_credito += igv_pen
-            
-        reporte.append({
-            'id': c.id,
-            'fecha': c.fecha_emision,
-            'documento': c.codigo_factura,
-            'entidad': c.entidad.nombre_razon_social,
-            'tipo': c.operacion,
-            'moneda': c.moneda,
-            'igv_original': float(c.igv),
-            'tc': float(c.tipo_cambio),
-            'igv_pen': igv_pen,
-            'es_escudo': c.es_escudo_tributario
-        })
+    # ?periodo=AAAA-MM limita el reporte a un mes; sin periodo (o inválido) se ve todo el historial
+    periodo = request.GET.get('periodo', '')
+    try:
+        desde, hasta = rango_periodo(periodo)
+    except ValueError:
+        periodo, desde, hasta = '', None, None
+
+    # Totales por mes en una consulta agrupada; el detalle se pagina por cursor (sin cargar todo)
+    resumen = resumen_mensual(emp_id, desde, hasta)
+    pagina = paginar_request(request, detalle_igv(emp_id, desde, hasta), 'fecha_emision')
 
     return render(request, 'core/trazabilidad_igv.html', {
-        'reporte': reporte,
-        'total_debito': total_debito,
-        'total_credito': total_credito,
-        'igv_neto': total_debito - total_credito
+        'reporte': pagina,
+        'pagina': pagina,
+        'meses': resumen['meses'],
+        'periodo': periodo,
+        'total_debito': resumen['debito'],
+        'total_credito': resumen['credito'],
+        'igv_neto': resumen['neto']
     })
 
 @login_required
 def cargar_documento_sunat(request):
     empresa_id = request.session.get('empresa_id')
-    empresa = get_object_or_404(Empresa, id=empresa_id)
+    empresa = request.empresa
     
     if request.method == 'POST' and request.FILES.get('documento'):
         archivo = request.FILES['documento']
@@ -2166,7 +2248,7 @@ def cargar_documento_sunat(request):
 def guardar_documento_sunat(request):
     if request.method == 'POST':
         datos = request.session.get('temp_impuesto')
-        empresa = Empresa.objects.get(id=request.session['empresa_id'])
+        empresa = request.empresa
         
         if datos['tipo'] == 'PDT_0621':
             # Guardamos cada tributo declarado (IGV y Renta)
@@ -2248,6 +2330,7 @@ def cerrar_mes_tributario(request):
     })
 
 @login_required
+@usar_replica
 def trazabilidad_retenciones(request):
     emp_id = int(request.session.get('empresa_id'))
     
@@ -2289,14 +2372,22 @@ def lista_pagos_sunat(request):
 @login_required
 def lista_notificaciones(request):
     emp_id = request.session.get('empresa_id')
-    notificaciones = Notificacion.objects.filter(empresa_id=emp_id).order_by('-fecha')
-    return render(request, 'core/notificaciones_list.html', {'notificaciones': notificaciones})
+    notificaciones = paginar_request(request, Notificacion.objects.filter(empresa_id=emp_id), 'fecha')
+    return render(request, 'core/notificaciones_list.html', {'notificaciones': notificaciones, 'pagina': notificaciones})
+
+@login_required
+def busqueda_global(request):
+    emp_id = request.session.get('empresa_id')
+    consulta = request.GET.get('q', '').strip()
+    # Índice de texto completo (FTS5 / tsvector), rankeado y filtrado por empresa
+    resultados = buscar(emp_id, consulta) if consulta else []
+    return render(request, 'core/busqueda_resultados.html', {'consulta': consulta, 'resultados': resultados})
 
 @login_required
 def marcar_notificaciones_leidas(request):
     emp_id = request.session.get('empresa_id')
-    # Actualizamos todas las no leídas a leídas
-    Notificacion.objects.filter(empresa_id=emp_id, leida=False).update(leida=True)
+    # Actualizamos todas las no leídas a leídas (y el contador de la campanita)
+    marcar_leidas(emp_id)
     return redirect(request.META.get('HTTP_REFERER', 'dashboard'))
 
 # core/views.py
@@ -2312,7 +2403,7 @@ def registrar_cotizacion(request):
     # ----------------------------------------------------------
 
     emp_id = request.session.get('empresa_id')
-    empresa = get_object_or_404(Empresa, id=emp_id)
+    empresa = request.empresa
 
     # 1. Recuperar datos si venimos de "Editar" (Si se borró arriba, esto será {})
     temp_cot = request.session.get('temp_cotizacion', {})
@@ -2400,7 +2491,7 @@ def preview_antes_de_guardar(request):
 
     # 2. Obtenemos la empresa y bancos para mostrar en el PDF/Vista previa
     emp_id = request.session.get('empresa_id')
-    empresa = get_object_or_404(Empresa, id=emp_id)
+    empresa = request.empresa
     bancos = Cuenta_Bancaria.objects.filter(empresa=empresa)
 
     # 3. Preparamos el contexto usando las llaves que guardaste en la sesión
@@ -2424,7 +2515,7 @@ def guardar_cotizacion_final(request):
     if not datos or request.method != 'POST': 
         return redirect('registrar_cotizacion')
 
-    empresa = get_object_or_404(Empresa, id=request.session['empresa_id'])
+    empresa = request.empresa
     
     # AHORA SÍ GUARDAMOS EN LA BASE DE DATOS
     cot = Cotizacion.objects.create(
@@ -2457,8 +2548,8 @@ def guardar_cotizacion_final(request):
 @login_required
 def lista_cotizaciones(request):
     emp_id = request.session.get('empresa_id')
-    cotizaciones = Cotizacion.objects.filter(empresa_id=emp_id).order_by('-id')
-    return render(request, 'core/cotizaciones_list.html', {'cotizaciones': cotizaciones})
+    cotizaciones = paginar_request(request, Cotizacion.objects.filter(empresa_id=emp_id), 'fecha')
+    return render(request, 'core/cotizaciones_list.html', {'cotizaciones': cotizaciones, 'pagina': cotizaciones})
 
 @login_required
 def ver_cotizacion_guardada(request, pk):
@@ -2539,4 +2630,11 @@ def salir(request):
         return redirect('login') # Redirige al login
     
     # Si entra por GET (hace clic en el menú), muestra la confirmación
-    return render(request, 'core/confirmar_salida.html')
\ No newline at end of file
+    return render(request, 'core/confirmar_salida.html')
+
+
+def salud(request):
+    """Sonda de salud (balanceador, benchmark_conexiones): una consulta mínima a la base de datos."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    return JsonResponse({'estado': 'ok', 'bd': connection.vendor})